@@ -0,0 +1,87 @@
+"""Perfil de importación de la app (arranque en frío de un worker).
+
+Importa `main` en un intérprete nuevo con `-X importtime`, varias veces, y
+reporta el tiempo total de importación, los módulos más caros y si se
+cargaron las dependencias de la ingesta (pandas, openpyxl), que deberían
+importarse recién con la primera carga de Excel. No necesita MongoDB: el
+cliente se crea en el arranque de la app, no al importar.
+
+    python -m benchmarks.bench_arranque --repeticiones 5 --salida arranque.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que un worker que solo sirve el dashboard no debería importar
+MODULOS_DIFERIDOS = ("pandas", "openpyxl", "numpy", "utils.exel_procesador")
+
+CODIGO = """
+import time
+inicio = time.perf_counter()
+import {modulo}
+print(time.perf_counter() - inicio)
+"""
+
+def importar(modulo):
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO.format(modulo=modulo)],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        error = [linea for linea in proceso.stderr.splitlines() if not linea.startswith("import time:")]
+        raise SystemExit(f"Error importando {modulo}:\n" + "\n".join(error[-5:]))
+    # Líneas "import time: self [us] | cumulative | imported package"
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "imported package" in linea:
+            continue
+        _, propio, acumulado, nombre = [parte.strip() for parte in linea.replace("import time:", "|", 1).split("|")]
+        modulos[nombre.strip()] = {"propio_us": int(propio), "acumulado_us": int(acumulado)}
+    return float(proceso.stdout.strip().splitlines()[-1]), modulos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulo", default="main", help="Módulo a importar (por defecto la app)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Cantidad de módulos más caros a reportar")
+    parser.add_argument("--salida", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    tiempos, modulos = [], {}
+    for _ in range(args.repeticiones):
+        segundos, modulos = importar(args.modulo)
+        tiempos.append(segundos)
+
+    # Los módulos del último intérprete (con el cache de bytecode ya caliente)
+    mas_caros = sorted(modulos.items(), key=lambda item: item[1]["propio_us"], reverse=True)[:args.top]
+    reporte = {
+        "fecha": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "modulo": args.modulo,
+        "repeticiones": args.repeticiones,
+        "segundos": {
+            "primera": round(tiempos[0], 4),
+            "mediana": round(statistics.median(tiempos), 4),
+            "min": round(min(tiempos), 4),
+            "max": round(max(tiempos), 4)
+        },
+        "modulos_importados": len(modulos),
+        "diferidos_importados": [nombre for nombre in MODULOS_DIFERIDOS if nombre in modulos],
+        "mas_caros": [{"modulo": nombre, **tiempos_modulo} for nombre, tiempos_modulo in mas_caros]
+    }
+    salida = json.dumps(reporte, indent=2)
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            archivo.write(salida)
+    else:
+        print(salida)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark de concurrencia para los endpoints del dashboard.
+
+Lanza N clientes concurrentes contra una instancia de la API ya levantada y
+reporta latencias p50/p99 por endpoint. Para comparar antes/después, correr el
+mismo comando contra cada versión del servidor:
+
+    uvicorn main:app --port 8000
+    python benchmarks/bench_concurrencia.py --url http://localhost:8000 --clientes 50
+
+Requiere `httpx` (solo para benchmarks, no es dependencia de la API).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+ENDPOINTS = [
+    "/api/dashboard/overview",
+    "/api/dashboard/revenue-weekly",
+    "/api/dashboard/services-popular",
+    "/api/dashboard/alerts",
+    "/api/dashboard/revenue?periodo=mes",
+    "/api/dashboard/services?periodo=mes",
+    "/api/finanzas/mensual",
+    "/api/finanzas/gastos-distribucion",
+    "/api/servicios/evolucion-trimestral",
+    "/analytics/resumen-mensual",
+    "/analytics/top-dias",
+]
+
+def percentil(valores, p):
+    if not valores:
+        return 0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+async def cliente(http, endpoint, repeticiones, latencias, errores):
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        try:
+            respuesta = await http.get(endpoint)
+            respuesta.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except httpx.HTTPError:
+            errores.append(endpoint)
+
+async def medir_endpoint(http, endpoint, clientes, repeticiones):
+    latencias, errores = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        cliente(http, endpoint, repeticiones, latencias, errores)
+        for _ in range(clientes)
+    ])
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "endpoint": endpoint,
+        "clientes": clientes,
+        "peticiones": len(latencias),
+        "errores": len(errores),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "media_ms": round(statistics.fmean(latencias), 2) if latencias else 0,
+        "peticiones_por_segundo": round(len(latencias) / duracion, 2) if duracion > 0 else 0
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--endpoint", action="append", help="Endpoint a medir (repetible)")
+    args = parser.parse_args()
+
+    resultados = []
+    limites = httpx.Limits(max_connections=args.clientes, max_keepalive_connections=args.clientes)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=60) as http:
+        for endpoint in args.endpoint or ENDPOINTS:
+            resultados.append(await medir_endpoint(http, endpoint, args.clientes, args.repeticiones))
+
+    print(json.dumps({"url": args.url, "resultados": resultados}, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
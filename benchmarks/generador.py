@@ -0,0 +1,88 @@
+"""Generador de datos sintéticos de lavadero con el formato de la planilla.
+
+Produce filas con las mismas columnas que espera ExcelProcessor: estacionalidad
+semanal, días cerrados, tres tipos de servicio y cuatro líneas de costo.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+# Servicios promedio por día de la semana (lunes a domingo)
+DEMANDA_SEMANAL = np.array([8, 9, 10, 11, 14, 18, 12])
+PRECIOS = {"normal": 15000, "premium": 25000, "full_premium": 35000}
+MEZCLA = np.array([0.6, 0.3, 0.1])
+
+ESCALAS = {
+    "1_anio": {"dias": 365, "sucursales": 1},
+    "10_anios": {"dias": 3650, "sucursales": 1},
+    "100_sucursales": {"dias": 365, "sucursales": 100}
+}
+
+def generar_filas(dias: int = 365, sucursales: int = 1, fin: date = None, semilla: int = 42):
+    """DataFrame con `dias` filas por sucursal terminando en `fin` (hoy por defecto)."""
+    rng = np.random.default_rng(semilla)
+    fin = fin or date.today()
+    fechas = pd.date_range(end=pd.Timestamp(fin), periods=dias, freq="D")
+
+    partes = []
+    for numero in range(sucursales):
+        n = len(fechas)
+        dia_semana = fechas.dayofweek.to_numpy()
+        # Cada sucursal tiene su propio tamaño relativo
+        escala = rng.uniform(0.5, 2.0)
+        cerrado = rng.random(n) < 0.03
+
+        atendidos = rng.poisson(DEMANDA_SEMANAL[dia_semana] * escala)
+        atendidos[cerrado] = 0
+        por_tipo = np.array([rng.multinomial(total, MEZCLA) for total in atendidos])
+
+        ingresos = {tipo: por_tipo[:, i] * precio for i, (tipo, precio) in enumerate(PRECIOS.items())}
+        ingresos_totales = sum(ingresos.values())
+
+        materia_prima = np.where(cerrado, 0, atendidos * rng.uniform(1500, 2500, n)).round()
+        insumos = np.where(cerrado, 0, rng.uniform(8000, 15000, n)).round()
+        sueldos = np.where(cerrado, 0, 60000 * escala).round()
+        arriendo = np.where(fechas.day == 1, 900000 * escala, 0).round()
+        costos = materia_prima + insumos + sueldos + arriendo
+
+        partes.append(pd.DataFrame({
+            "sucursal": f"sucursal_{numero + 1:03d}",
+            "fecha": fechas,
+            "dia_semana": [DIAS_SEMANA[d] for d in dia_semana],
+            "hora_apertura": np.where(cerrado, "Cerrado", "09:00"),
+            "hora_cierre": np.where(cerrado, "Cerrado", "19:00"),
+            "servicios_atendidos": atendidos,
+            "servicios_normal": por_tipo[:, 0],
+            "servicios_premium": por_tipo[:, 1],
+            "servicios_full_premium": por_tipo[:, 2],
+            "ingresos_normal": ingresos["normal"],
+            "ingresos_premium": ingresos["premium"],
+            "ingresos_full_premium": ingresos["full_premium"],
+            "ingresos_servicios": ingresos_totales,
+            "costo_materia_prima": materia_prima,
+            "insumos_basicos": insumos,
+            "costo_sueldos": sueldos,
+            "arriendo_pagado": arriendo,
+            "ganancia_neta": ingresos_totales - costos
+        }))
+
+    return pd.concat(partes, ignore_index=True)
+
+def modificar_filas(df, fraccion: float = 0.01, semilla: int = 7):
+    """Copia de `df` con una fracción de filas corregidas (simula una recarga)."""
+    rng = np.random.default_rng(semilla)
+    df = df.copy()
+    indices = rng.choice(len(df), size=max(1, int(len(df) * fraccion)), replace=False)
+    df.loc[indices, "insumos_basicos"] += 1000
+    df.loc[indices, "ganancia_neta"] -= 1000
+    return df
+
+def escribir_planilla(df, ruta: str):
+    """Escribe la planilla como .csv o .xlsx según la extensión."""
+    if ruta.endswith(".csv"):
+        df.to_csv(ruta, index=False)
+    else:
+        df.to_excel(ruta, index=False)
+    return ruta
@@ -0,0 +1,157 @@
+"""Suite de benchmarks de ingesta y endpoints, sin red.
+
+Genera una planilla sintética a la escala pedida, mide el throughput de
+ExcelProcessor.procesar_excel y luego la latencia de cada endpoint de /api y
+/analytics bajo concurrencia, llamando a la app en proceso (ASGI, sin HTTP).
+El resultado es JSON para comparar entre versiones:
+
+    python -m benchmarks.run --escala 1_anio --backend mongod --salida bench.json
+    python -m benchmarks.run --escala 10_anios --backend inmemory
+
+Backends:
+  mongod    mongod local (por defecto mongodb://localhost:27017)
+  inmemory  mongod efímero levantado por pymongo_inmemory (dbpath temporal)
+
+La base usada se borra al comenzar, por eso su nombre debe empezar con "bench".
+Dependencias extra en benchmarks/requirements.txt.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.generador import ESCALAS, escribir_planilla, generar_filas, modificar_filas
+
+ENDPOINTS_BENCH = [
+    "/api/dashboard/overview",
+    "/api/dashboard/revenue-weekly",
+    "/api/dashboard/services-popular",
+    "/api/dashboard/alerts",
+    "/api/dashboard/revenue?periodo=hoy",
+    "/api/dashboard/revenue?periodo=semana",
+    "/api/dashboard/revenue?periodo=mes",
+    "/api/dashboard/services?periodo=semana",
+    "/api/dashboard/services?periodo=mes",
+    "/api/servicios/evolucion-trimestral",
+    "/api/finanzas/mensual",
+    "/api/finanzas/gastos-distribucion",
+    "/api/pronostico?dias=14",
+    "/analytics/resumen-mensual",
+    "/analytics/top-dias",
+    "/api/cadena/revenue?periodo=mes",
+    "/api/cadena/services?periodo=mes",
+]
+
+def preparar_backend(pila, backend, uri, base):
+    if not base.startswith("bench"):
+        raise SystemExit("La base de benchmarks debe empezar con 'bench' (se borra al comenzar)")
+    if backend == "inmemory":
+        from pymongo_inmemory import Mongod
+        mongod = pila.enter_context(Mongod())
+        uri = mongod.connection_string
+
+    # models.database lee estas variables al importarse
+    os.environ["MONGODB_URI"] = uri
+    os.environ["DATABASE_NAME"] = base
+
+    from models.database import mongodb
+    from models.indices import asegurar_indices
+    mongodb.client.drop_database(base)
+    asegurar_indices(mongodb.db)
+
+def medir_carga(ruta, modo):
+    from utils.exel_procesador import ExcelProcessor
+
+    processor = ExcelProcessor()
+    inicio = time.perf_counter()
+    resultados = processor.procesar_excel(ruta, modo)
+    duracion = time.perf_counter() - inicio
+    return {
+        "archivo": os.path.basename(ruta),
+        "modo": modo,
+        "filas": processor.filas_procesadas,
+        "segundos": round(duracion, 3),
+        "filas_por_segundo": round(processor.filas_procesadas / duracion, 2) if duracion > 0 else 0,
+        "resultados": resultados
+    }
+
+def medir_ingesta(df, formato, directorio):
+    # La columna sucursal de la planilla separa las filas de cada sucursal
+    ruta = escribir_planilla(df, os.path.join(directorio, f"carga_inicial.{formato}"))
+    carga_inicial = medir_carga(ruta, "upsert")
+
+    # Recarga con 1% de filas corregidas: solo esas deberían escribirse
+    ruta = escribir_planilla(modificar_filas(df), os.path.join(directorio, f"recarga.{formato}"))
+    recarga = medir_carga(ruta, "upsert")
+
+    return {"carga_inicial": carga_inicial, "recarga_1pct": recarga}
+
+async def medir_endpoints(app, endpoints, clientes, repeticiones):
+    import httpx
+    from benchmarks.bench_concurrencia import medir_endpoint
+
+    resultados = []
+    # ASGITransport no corre el lifespan: sin él no se arman el índice de
+    # sumas prefijas, las líneas base de alertas ni el pronóstico, y se
+    # mediría un camino que en producción no se usa
+    async with app.router.lifespan_context(app):
+        await asyncio.gather(*app.state.tareas_inicio)
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as http:
+            for endpoint in endpoints:
+                resultados.append(await medir_endpoint(http, endpoint, clientes, repeticiones))
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=ESCALAS, default="1_anio")
+    parser.add_argument("--backend", choices=("mongod", "inmemory"), default="mongod")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--base", default="bench_carwash")
+    parser.add_argument("--formato", choices=("xlsx", "csv"), default="xlsx")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--sin-cache", action="store_true", help="Medir las agregaciones sin el cache de respuestas")
+    parser.add_argument("--salida", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    if args.sin_cache:
+        os.environ["CACHE_MAX_ENTRADAS"] = "0"
+
+    escala = ESCALAS[args.escala]
+    with contextlib.ExitStack() as pila:
+        preparar_backend(pila, args.backend, args.uri, args.base)
+        # Importar la app antes de la carga, como en producción: así el índice,
+        # las alertas y el pronóstico quedan suscritos a la ingesta
+        from main import app
+
+        df = generar_filas(dias=escala["dias"], sucursales=escala["sucursales"])
+        with tempfile.TemporaryDirectory() as directorio:
+            ingesta = medir_ingesta(df, args.formato, directorio)
+
+        endpoints = asyncio.run(medir_endpoints(app, ENDPOINTS_BENCH, args.clientes, args.repeticiones))
+
+    reporte = {
+        "fecha": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "escala": {"nombre": args.escala, **escala, "filas": len(df)},
+        "backend": args.backend,
+        "formato": args.formato,
+        "cache": not args.sin_cache,
+        "ingesta": ingesta,
+        "endpoints": endpoints
+    }
+    salida = json.dumps(reporte, indent=2, default=str)
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            archivo.write(salida)
+    else:
+        print(salida)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,123 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routes import upload_router, analytics_router, dashboard_router
+from models.database import mongodb
+from models.indices import asegurar_indices
+from models.repositorio import repositorio
+from models.sucursales import asignar_sucursal_por_defecto
+from utils.agregados_transacciones import inicializar_agregados
+from utils.alertas import motor_alertas
+from utils.buffer_transacciones import buffer_transacciones
+from utils.compresion import CompresionMiddleware
+from utils.difusion import difusor
+from utils.indice_prefijo import indice_prefijo
+from utils.motor_columnar import motor_columnar
+from utils.pronostico import pronostico
+from utils.metricas import duracion_peticiones, exponer_metricas, pool_conexiones
+from utils.respuestas import RespuestaRapida
+from utils.rollups import inicializar_rollups
+from utils.trabajos import cola_trabajos
+from utils.version_datos import version_datos
+from routes import upload_router, analytics_router, dashboard_router, admin_router, transacciones_router, cadena_router, tiempo_real_router
+
+async def en_segundo_plano(funcion, mensaje_ok, mensaje_error):
+    inicio = time.perf_counter()
+    try:
+        await repositorio.ejecutar(funcion, mongodb.db)
+        print(f"✅ {mensaje_ok} ({time.perf_counter() - inicio:.2f} s)")
+    except Exception as e:
+        print(f"❌ Error {mensaje_error}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abrir las primeras conexiones antes de recibir peticiones
+    try:
+        minimo = await repositorio.ejecutar(mongodb.calentar)
+        print(f"✅ Conectado a MongoDB (pool mínimo: {minimo})")
+    except Exception as e:
+        print(f"❌ Error conectando a MongoDB: {e}")
+
+    # Asegurar índices al arrancar
+    try:
+        await repositorio.ejecutar(asegurar_indices, mongodb.db)
+        print("✅ Índices asegurados")
+    except Exception as e:
+        print(f"❌ Error asegurando índices: {e}")
+
+    # Datos cargados antes de la dimensión de sucursal
+    try:
+        actualizados = await repositorio.ejecutar(asignar_sucursal_por_defecto, mongodb.db)
+        if any(actualizados.values()):
+            print(f"✅ Sucursal por defecto asignada: {actualizados}")
+    except Exception as e:
+        print(f"❌ Error asignando sucursal por defecto: {e}")
+
+    # Construir rollups si la base tiene datos previos a su existencia (o sin sucursal)
+    try:
+        if await repositorio.ejecutar(inicializar_rollups, mongodb.db):
+            print("✅ Rollups construidos")
+    except Exception as e:
+        print(f"❌ Error inicializando rollups: {e}")
+
+    # El índice de sumas prefijas y la instantánea columnar se arman después
+    # de abrir el puerto: mientras tanto los endpoints consultan MongoDB
+    tareas = []
+    if indice_prefijo.activo:
+        tareas.append(asyncio.create_task(en_segundo_plano(
+            indice_prefijo.construir, "Índice de sumas prefijas construido", "construyendo índice de sumas prefijas"
+        )))
+    # Líneas base de alertas de una base con datos previos al motor de alertas
+    tareas.append(asyncio.create_task(en_segundo_plano(
+        motor_alertas.inicializar, "Líneas base de alertas verificadas", "inicializando alertas"
+    )))
+    # Agregados por hora y por cliente de transacciones previas a ellos
+    tareas.append(asyncio.create_task(en_segundo_plano(
+        inicializar_agregados, "Agregados de transacciones verificados", "inicializando agregados de transacciones"
+    )))
+    # Modelos de pronóstico (si no terminan, la primera consulta los ajusta)
+    tareas.append(asyncio.create_task(en_segundo_plano(
+        pronostico.construir, "Modelos de pronóstico ajustados", "ajustando modelos de pronóstico"
+    )))
+    if motor_columnar.activo:
+        tareas.append(asyncio.create_task(en_segundo_plano(
+            motor_columnar.cargar, "Motor columnar cargado", "cargando motor columnar"
+        )))
+
+    # Quien necesite todo armado (los benchmarks) puede esperarlas
+    app.state.tareas_inicio = tareas
+
+    # Versión de los datos para los ETag (sin ella, los GET no son condicionales)
+    try:
+        await repositorio.ejecutar(version_datos.cargar, mongodb.db)
+        print("✅ Versión de datos cargada")
+    except Exception as e:
+        print(f"❌ Error cargando versión de datos: {e}")
+    version_datos.iniciar()
+
+    # Difusión de cambios de versión a las conexiones en tiempo real
+    difusor.iniciar()
+
+    # Vaciado periódico de las transacciones recibidas
+    buffer_transacciones.iniciar()
+    yield
+    difusor.cerrar()
+    for tarea in tareas:
+        tarea.cancel()
+    await buffer_transacciones.detener()
+    cola_trabajos.cerrar()
+    version_datos.detener()
+    mongodb.cerrar()
 
 app = FastAPI(
     title="Car Wash Analytics API",
     description="API para gestión y análisis de lavadero de autos",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=RespuestaRapida,
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -21,11 +133,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir respuestas grandes (brotli si está instalado, si no gzip)
+app.add_middleware(CompresionMiddleware, minimo_bytes=int(os.getenv("COMPRESION_MINIMO_BYTES", "1024")))
+
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    inicio = time.perf_counter()
+    response = await call_next(request)
+    # Etiquetar por plantilla de ruta (/upload/trabajos/{trabajo_id}), no por URL
+    ruta = request.scope.get("route")
+    duracion_peticiones.observar(
+        time.perf_counter() - inicio,
+        metodo=request.method,
+        ruta=ruta.path if ruta else "sin_ruta",
+        estado=response.status_code
+    )
+    return response
 
 # Incluir rutas
 app.include_router(upload_router)
 app.include_router(analytics_router)
 app.include_router(dashboard_router)
+app.include_router(admin_router)
+app.include_router(transacciones_router)
+app.include_router(cadena_router)
+app.include_router(tiempo_real_router)
 
 @app.get("/")
 async def root():
@@ -33,7 +165,22 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    pool = mongodb.estadisticas_pool()
+    try:
+        inicio = time.perf_counter()
+        await repositorio.ejecutar(mongodb.client.admin.command, "ping")
+        latencia_ms = round((time.perf_counter() - inicio) * 1000, 2)
+        return {"status": "healthy", "database": "connected", "ping_ms": latencia_ms, "pool": pool}
+    except Exception as e:
+        return {"status": "unhealthy", "database": f"error: {e}", "ping_ms": None, "pool": pool}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    pool = mongodb.estadisticas_pool()
+    pool_conexiones.fijar(pool["abiertas"], estado="abiertas")
+    pool_conexiones.fijar(pool["en_uso"], estado="en_uso")
+    pool_conexiones.fijar(pool["max_pool_size"], estado="max")
+    return PlainTextResponse(exponer_metricas(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,28 +1,186 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+PREFERENCIAS_LECTURA = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+
+class MonitorPool(monitoring.ConnectionPoolListener):
+    """Cuenta conexiones abiertas y en uso a partir de los eventos del pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.abiertas = 0
+        self.en_uso = 0
+
+    def _sumar(self, campo, valor):
+        with self._lock:
+            setattr(self, campo, max(0, getattr(self, campo) + valor))
+
+    def connection_created(self, event):
+        self._sumar("abiertas", 1)
+
+    def connection_closed(self, event):
+        self._sumar("abiertas", -1)
+
+    def connection_checked_out(self, event):
+        self._sumar("en_uso", 1)
+
+    def connection_checked_in(self, event):
+        self._sumar("en_uso", -1)
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.en_uso = 0
+
+    # Eventos sin efecto en los contadores
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
 class MongoDB:
+    """Cliente de MongoDB con el pool configurado por variables de entorno.
+
+    Importar el módulo no crea el cliente (con una URI mongodb+srv, crearlo
+    ya resuelve DNS): se crea al primer uso de `client`, `db` o `db_lectura`,
+    normalmente en `calentar`, que el arranque de la app llama para hacer el
+    primer round-trip (y el TLS) antes de la primera petición del dashboard.
+    Las escrituras, los rollups y los $merge usan `db` (siempre el primario);
+    las agregaciones de los endpoints usan `db_lectura`, que puede ir a los
+    secundarios con MONGO_PREFERENCIA_LECTURA=secondaryPreferred. Un
+    secundario puede ir atrasado respecto de la última carga, por eso el
+    valor por defecto sigue siendo el primario.
+    """
+
     def __init__(self):
-        self.client = None
-        self.db = None
-        self.connect()
-    
+        self._client = None
+        self._db = None
+        self._db_lectura = None
+        self._lock = threading.Lock()
+        self.monitor_pool = MonitorPool()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self.connect()
+        return self._client
+
+    @property
+    def db(self):
+        if self._client is None:
+            self.connect()
+        return self._db
+
+    @property
+    def db_lectura(self):
+        if self._client is None:
+            self.connect()
+        return self._db_lectura
+
+    @staticmethod
+    def opciones_pool():
+        return {
+            "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "32")),
+            "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "4")),
+            "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+            "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+            "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+        }
+
+    @staticmethod
+    def preferencia_lectura():
+        modo = os.getenv("MONGO_PREFERENCIA_LECTURA", "primary")
+        if modo not in PREFERENCIAS_LECTURA:
+            raise ValueError(f"Preferencia de lectura inválida: {modo}")
+        if modo == "primary":
+            return Primary()
+        # Descartar secundarios más atrasados que esto (mínimo 90 s)
+        return PREFERENCIAS_LECTURA[modo](max_staleness=int(os.getenv("MONGO_MAX_ATRASO_SEGUNDOS", "-1")))
+
     def connect(self):
-        try:
-            self.client = MongoClient(os.getenv("MONGODB_URI"))
-            self.db = self.client[os.getenv("DATABASE_NAME")]
-            print("✅ Conectado a MongoDB Atlas")
-        except Exception as e:
-            print(f"❌ Error conectando a MongoDB: {e}")
-    
-    def get_collections(self):
+        with self._lock:
+            # Varios hilos del pool pueden pedir el cliente a la vez
+            if self._client is not None:
+                return
+            try:
+                preferencia = self.preferencia_lectura()
+                client = MongoClient(
+                    os.getenv("MONGODB_URI"),
+                    event_listeners=[self.monitor_pool],
+                    **self.opciones_pool()
+                )
+                nombre = os.getenv("DATABASE_NAME")
+                self._db = client[nombre]
+                self._db_lectura = client.get_database(nombre, read_preference=preferencia)
+                self._client = client
+            except Exception as e:
+                print(f"❌ Error configurando cliente de MongoDB: {e}")
+
+    def calentar(self):
+        """Abre las primeras conexiones con un ping al primario y a la lectura."""
+        self.client.admin.command("ping")
+        if self.db_lectura.read_preference != Primary():
+            self.db_lectura.command("ping", read_preference=self.db_lectura.read_preference)
+        # minPoolSize completa el resto de las conexiones en segundo plano
+        return self.client.options.pool_options.min_pool_size
+
+    def cerrar(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def estadisticas_pool(self):
+        # Sin crear el cliente si todavía no se usó
+        max_pool = self._client.options.pool_options.max_pool_size if self._client else 0
+        return {
+            "abiertas": self.monitor_pool.abiertas,
+            "en_uso": self.monitor_pool.en_uso,
+            "max_pool_size": max_pool,
+            "min_pool_size": self._client.options.pool_options.min_pool_size if self._client else 0,
+            "saturacion": round(self.monitor_pool.en_uso / max_pool, 4) if max_pool else 0
+        }
+
+    def get_collections(self, lectura: bool = False):
+        db = self.db_lectura if lectura else self.db
         return {
-            "dias_operacion": self.db.dias_operacion,
-            "servicios": self.db.servicios,
-            "costos": self.db.costos
+            "dias_operacion": db.dias_operacion,
+            "servicios": db.servicios,
+            "costos": db.costos,
+            "archivos_cargados": db.archivos_cargados,
+            "rollup_diario": db.rollup_diario,
+            "rollup_semanal": db.rollup_semanal,
+            "rollup_mensual": db.rollup_mensual,
+            "transacciones": db.transacciones,
+            "transacciones_hora": db.transacciones_hora,
+            "clientes_visitas": db.clientes_visitas,
+            "alertas": db.alertas,
+            "lineas_base": db.lineas_base
         }
 
 # Instancia global de la base de datos
@@ -0,0 +1,151 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from models.sucursales import SUCURSAL_POR_DEFECTO
+from utils.rollups import reconstruir_rollups
+
+# Colecciones de series de tiempo: deben existir antes de crear sus índices,
+# si no create_indexes las crearía como colecciones normales
+SERIES_TIEMPO = {
+    # Una transacción por auto lavado; meta agrupa los buckets por sucursal y tipo
+    "transacciones": {"timeField": "timestamp", "metaField": "meta", "granularity": "minutes"}
+}
+
+# Registro declarativo de índices por colección.
+# Cada índice corresponde a una forma de consulta usada en los routers.
+INDICES = {
+    "dias_operacion": [
+        # $match por rango de fecha de toda la cadena
+        IndexModel([("fecha", ASCENDING)], name="fecha"),
+        # Rango de fecha de una sucursal (dashboard, analytics, upsert por sucursal + fecha).
+        # Único: dos cargas simultáneas del mismo día no pueden guardarlo dos veces
+        IndexModel([("sucursal", ASCENDING), ("fecha", ASCENDING)], name="sucursal_fecha", unique=True),
+        # /analytics/top-dias: estado = abierto ordenado por ingresos
+        IndexModel([("estado", ASCENDING), ("ingresos_totales", DESCENDING)], name="estado_ingresos_totales"),
+        IndexModel(
+            [("sucursal", ASCENDING), ("estado", ASCENDING), ("ingresos_totales", DESCENDING)],
+            name="sucursal_estado_ingresos_totales"
+        )
+    ],
+    "servicios": [
+        # Rango de fecha agrupado por tipo de servicio
+        IndexModel([("fecha", ASCENDING), ("tipo_servicio", ASCENDING)], name="fecha_tipo_servicio"),
+        IndexModel(
+            [("sucursal", ASCENDING), ("fecha", ASCENDING), ("tipo_servicio", ASCENDING)],
+            name="sucursal_fecha_tipo_servicio"
+        ),
+        IndexModel([("dia_id", ASCENDING)], name="dia_id")
+    ],
+    "costos": [
+        IndexModel([("fecha", ASCENDING), ("tipo_costo", ASCENDING)], name="fecha_tipo_costo"),
+        IndexModel(
+            [("sucursal", ASCENDING), ("fecha", ASCENDING), ("tipo_costo", ASCENDING)],
+            name="sucursal_fecha_tipo_costo"
+        ),
+        # /finanzas/gastos-distribucion: monto > 0 agrupado por tipo
+        IndexModel([("tipo_costo", ASCENDING), ("monto", ASCENDING)], name="tipo_costo_monto"),
+        IndexModel([("dia_id", ASCENDING)], name="dia_id")
+    ],
+    "transacciones": [
+        # Demanda horaria de una sucursal
+        IndexModel([("meta.sucursal", ASCENDING), ("timestamp", ASCENDING)], name="sucursal_timestamp"),
+        # Clientes nuevos vs recurrentes: primera visita por cliente
+        IndexModel([("cliente_id", ASCENDING), ("timestamp", ASCENDING)], name="cliente_id_timestamp")
+    ],
+    # Agregados de transacciones (utils/agregados_transacciones)
+    "transacciones_hora": [
+        IndexModel([("sucursal", ASCENDING), ("hora", ASCENDING)], name="sucursal_hora"),
+        IndexModel([("hora", ASCENDING)], name="hora")
+    ],
+    # Clientes con visitas en una ventana, por sucursal (None es la cadena)
+    "clientes_visitas": [
+        IndexModel([("sucursal", ASCENDING), ("ultima", ASCENDING)], name="sucursal_ultima")
+    ],
+    # Rollups: un documento por sucursal y período
+    "rollup_diario": [
+        IndexModel([("periodo", ASCENDING)], name="periodo"),
+        IndexModel([("sucursal", ASCENDING), ("periodo", ASCENDING)], name="sucursal_periodo")
+    ],
+    "rollup_semanal": [
+        IndexModel([("periodo", ASCENDING)], name="periodo"),
+        IndexModel([("sucursal", ASCENDING), ("periodo", ASCENDING)], name="sucursal_periodo")
+    ],
+    "rollup_mensual": [
+        IndexModel([("periodo", ASCENDING)], name="periodo"),
+        IndexModel([("sucursal", ASCENDING), ("periodo", ASCENDING)], name="sucursal_periodo")
+    ],
+    # Estado de las cargas en segundo plano: /upload/trabajos lista los últimos
+    "trabajos": [
+        IndexModel([("creado", DESCENDING)], name="creado")
+    ],
+    "alertas": [
+        # /api/dashboard/alerts: últimas alertas de la cadena o de una sucursal
+        IndexModel([("fecha", DESCENDING)], name="fecha"),
+        IndexModel([("sucursal", ASCENDING), ("fecha", DESCENDING)], name="sucursal_fecha")
+    ]
+}
+
+def deduplicar_dias(db):
+    """Deja un solo día por (sucursal, fecha), el último escrito, con sus hijos.
+
+    Devuelve la cantidad de días borrados.
+    """
+    grupos = db.dias_operacion.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            # Los días sin sucursal van a quedar en la sucursal por defecto
+            "_id": {"sucursal": {"$ifNull": ["$sucursal", SUCURSAL_POR_DEFECTO]}, "fecha": "$fecha"},
+            "ids": {"$push": "$_id"}
+        }},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ], allowDiskUse=True)
+    sobrantes = [dia_id for grupo in grupos for dia_id in grupo["ids"][:-1]]
+    for inicio in range(0, len(sobrantes), 1000):
+        lote = sobrantes[inicio:inicio + 1000]
+        db.dias_operacion.delete_many({"_id": {"$in": lote}})
+        for coleccion in ("servicios", "costos"):
+            db[coleccion].delete_many({"dia_id": {"$in": [str(dia_id) for dia_id in lote]}})
+    return len(sobrantes)
+
+def _migrar_sucursal_fecha_unico(db):
+    """Reemplaza el índice sucursal_fecha no único de versiones anteriores."""
+    actual = db.dias_operacion.index_information().get("sucursal_fecha")
+    if actual is None or actual.get("unique"):
+        return
+    if deduplicar_dias(db):
+        # Los rollups sumaban los días repetidos
+        reconstruir_rollups(db)
+    try:
+        db.dias_operacion.drop_index("sucursal_fecha")
+    except OperationFailure:
+        # Otro worker lo reemplazó primero
+        pass
+
+def asegurar_indices(db):
+    """Crea los índices del registro que falten (create_indexes es idempotente)."""
+    existentes = set(db.list_collection_names())
+    for coleccion, opciones in SERIES_TIEMPO.items():
+        if coleccion not in existentes:
+            db.create_collection(coleccion, timeseries=opciones)
+    _migrar_sucursal_fecha_unico(db)
+
+    creados = {}
+    for coleccion, indices in INDICES.items():
+        creados[coleccion] = db[coleccion].create_indexes(indices)
+    return creados
+
+def estadisticas_indices(db):
+    """Uso de cada índice según $indexStats, marcando los que están en el registro."""
+    estadisticas = {}
+    for coleccion, indices in INDICES.items():
+        registrados = {indice.document["name"] for indice in indices}
+        estadisticas[coleccion] = [
+            {
+                "nombre": item["name"],
+                "campos": dict(item["key"]),
+                "usos": item["accesses"]["ops"],
+                "desde": item["accesses"]["since"],
+                "en_registro": item["name"] in registrados
+            }
+            for item in db[coleccion].aggregate([{"$indexStats": {}}])
+        ]
+    return estadisticas
@@ -0,0 +1,34 @@
+"""Migración entre los modelos de datos "separado" y "embebido".
+
+Pasar a embebido con --eliminar-origen borra las colecciones servicios y
+costos, por eso corre desde la consola y no por HTTP:
+
+    python -m models.migracion --destino embebido
+    python -m models.migracion --destino separado
+
+Después hay que reiniciar la API con MODELO_DATOS=<destino>. La versión de
+datos sube al terminar, así los workers en marcha descartan lo cacheado.
+"""
+import argparse
+from models.database import mongodb
+from models.modelo_datos import MODELO_DATOS, MODELOS_DATOS, migrar_a_embebido, migrar_a_separado
+from utils.version_datos import version_datos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", choices=MODELOS_DATOS, required=True)
+    parser.add_argument("--eliminar-origen", action="store_true", help="Borrar servicios y costos al pasar a embebido")
+    args = parser.parse_args()
+
+    try:
+        if args.destino == "embebido":
+            migrar_a_embebido(mongodb.db, args.eliminar_origen)
+        else:
+            migrar_a_separado(mongodb.db)
+        version_datos.incrementar(mongodb.db)
+        print(f"✅ Datos migrados al modelo {args.destino} (modelo actual: {MODELO_DATOS}); reiniciar con MODELO_DATOS={args.destino}")
+    finally:
+        mongodb.cerrar()
+
+if __name__ == "__main__":
+    main()
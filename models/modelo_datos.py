@@ -0,0 +1,76 @@
+"""Disposición de almacenamiento de servicios y costos.
+
+- "separado" (por defecto): colecciones `servicios` y `costos` enlazadas al
+  día por `dia_id`.
+- "embebido": arreglos `servicios` y `costos` dentro de cada documento de
+  `dias_operacion`; un solo rango sobre `fecha` responde ingresos, mezcla de
+  servicios y costos.
+
+Se elige con la variable de entorno MODELO_DATOS. Los routers siguen
+escribiendo sus pipelines contra `servicios`/`costos`; `pipeline_para` los
+traduce al modelo embebido.
+"""
+import os
+
+MODELOS_DATOS = ("separado", "embebido")
+MODELO_DATOS = os.getenv("MODELO_DATOS", "separado")
+
+COLECCIONES_HIJAS = ("servicios", "costos")
+# Campos del día que se pueden filtrar antes de desplegar los arreglos
+CAMPOS_DIA = {"fecha", "sucursal"}
+
+def es_embebido():
+    return MODELO_DATOS == "embebido"
+
+def vista_hijos(coleccion):
+    """Etapas que convierten días con arreglos en documentos de `coleccion`."""
+    return [
+        {"$unwind": f"${coleccion}"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": [
+            f"${coleccion}",
+            {"fecha": "$fecha", "sucursal": "$sucursal", "dia_id": {"$toString": "$_id"}}
+        ]}}}
+    ]
+
+def pipeline_para(coleccion, pipeline):
+    """Devuelve (colección, pipeline) a ejecutar según el modelo de datos."""
+    if not es_embebido() or coleccion not in COLECCIONES_HIJAS:
+        return coleccion, pipeline
+
+    # Un $match inicial solo sobre campos del día se aplica antes del $unwind
+    # para usar el índice de fecha de dias_operacion
+    prefijo = []
+    match = pipeline[0].get("$match") if pipeline else None
+    if match and set(match) <= CAMPOS_DIA:
+        prefijo = [pipeline[0]]
+        pipeline = pipeline[1:]
+    return "dias_operacion", prefijo + vista_hijos(coleccion) + pipeline
+
+def migrar_a_embebido(db, eliminar_origen: bool = False):
+    """Copia servicios y costos dentro de cada día como arreglos."""
+    def buscar_hijos(coleccion):
+        return {"$lookup": {
+            "from": coleccion,
+            "let": {"dia_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$dia_id", "$$dia_id"]}}},
+                {"$project": {"_id": 0, "fecha": 0, "sucursal": 0, "dia_id": 0}}
+            ],
+            "as": coleccion
+        }}
+
+    list(db.dias_operacion.aggregate([
+        buscar_hijos("servicios"),
+        buscar_hijos("costos"),
+        {"$project": {"servicios": 1, "costos": 1}},
+        {"$merge": {"into": "dias_operacion", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]))
+    if eliminar_origen:
+        for coleccion in COLECCIONES_HIJAS:
+            db.drop_collection(coleccion)
+
+def migrar_a_separado(db):
+    """Reconstruye las colecciones servicios y costos desde los arreglos."""
+    for coleccion in COLECCIONES_HIJAS:
+        list(db.dias_operacion.aggregate(vista_hijos(coleccion) + [{"$out": coleccion}]))
+    db.dias_operacion.update_many({}, {"$unset": {"servicios": "", "costos": ""}})
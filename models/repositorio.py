@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from models.database import mongodb
+from models.modelo_datos import pipeline_para
+from utils.metricas import duracion_agregaciones, documentos_devueltos
+
+# Resultados compartidos entre las consultas de un mismo lote de widgets
+_memo_lote = contextvars.ContextVar("memo_lote", default=None)
+
+@contextmanager
+def lote_compartido():
+    """Dentro del bloque, pipelines idénticos se ejecutan una sola vez."""
+    token = _memo_lote.set({})
+    try:
+        yield
+    finally:
+        _memo_lote.reset(token)
+
+class Repositorio:
+    """Acceso asíncrono a MongoDB para los routers.
+
+    pymongo es síncrono, así que cada operación se ejecuta en un pool de hilos
+    acotado y los handlers solo hacen `await`, sin bloquear el event loop.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("DB_MAX_WORKERS", "16"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="mongo"
+        )
+
+    async def ejecutar(self, funcion, *args, **kwargs):
+        # Ejecutar cualquier llamada bloqueante en el pool de la base de datos
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(funcion, *args, **kwargs))
+
+    async def aggregate(self, coleccion: str, pipeline: list, nombre: str = "sin_nombre"):
+        memo = _memo_lote.get()
+        if memo is None:
+            return await self._aggregate(coleccion, pipeline, nombre)
+
+        # Las tareas de asyncio.gather heredan el contexto y comparten el memo
+        clave = (coleccion, repr(pipeline))
+        if clave not in memo:
+            memo[clave] = asyncio.ensure_future(self._aggregate(coleccion, pipeline, nombre))
+        return await asyncio.shield(memo[clave])
+
+    async def _aggregate(self, coleccion: str, pipeline: list, nombre: str):
+        # En el modelo embebido, servicios/costos se leen desde dias_operacion
+        coleccion_real, pipeline_real = pipeline_para(coleccion, pipeline)
+        # Las lecturas pueden ir a un secundario; un pipeline que escribe, no
+        escribe = any("$merge" in etapa or "$out" in etapa for etapa in pipeline_real)
+        collections = mongodb.get_collections(lectura=not escribe)
+
+        def ejecutar_pipeline():
+            # Medir dentro del hilo: solo el tiempo de la base, sin la espera en cola
+            inicio = time.perf_counter()
+            resultados = list(collections[coleccion_real].aggregate(pipeline_real))
+            duracion_agregaciones.observar(time.perf_counter() - inicio, coleccion=coleccion, pipeline=nombre)
+            documentos_devueltos.inc(len(resultados), coleccion=coleccion, pipeline=nombre)
+            return resultados
+
+        return await self.ejecutar(ejecutar_pipeline)
+
+# Instancia global del repositorio
+repositorio = Repositorio()
@@ -37,6 +37,13 @@ class CostoBase(BaseModel):
 class CostoCreate(CostoBase):
     dia_id: str
 
+class TransaccionCreate(BaseModel):
+    timestamp: datetime
+    tipo_servicio: str
+    precio: float
+    sucursal: Optional[str] = None
+    cliente_id: Optional[str] = None
+
 # Schemas para responses
 class DiaOperacionResponse(DiaOperacionBase):
     id: str
@@ -47,4 +54,12 @@ class AnalyticsResponse(BaseModel):
     ingresos_por_tipo: dict
     servicios_por_dia: List[dict]
     ganancias_totales: float
-    promedio_servicios_dia: float
\ No newline at end of file
+    promedio_servicios_dia: float
+
+# Schemas para requests
+class DashboardBatchRequest(BaseModel):
+    widgets: List[str]
+    periodo: Optional[str] = None
+    fecha_inicio: Optional[str] = None
+    fecha_fin: Optional[str] = None
+    sucursal: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Dimensión de sucursal.
+
+Cada día, servicio, costo, rollup y transacción pertenece a una sucursal.
+Lo cargado antes de existir la dimensión queda en SUCURSAL_POR_DEFECTO.
+"""
+import os
+
+SUCURSAL_POR_DEFECTO = os.getenv("SUCURSAL_POR_DEFECTO", "principal")
+
+def filtro_sucursal(sucursal, campo: str = "sucursal"):
+    """Condición de $match para una sucursal; None es toda la cadena."""
+    return {campo: sucursal} if sucursal else {}
+
+def asignar_sucursal_por_defecto(db):
+    """Asigna la sucursal por defecto a los documentos que no tienen una."""
+    actualizados = {}
+    for coleccion in ("dias_operacion", "servicios", "costos"):
+        resultado = db[coleccion].update_many(
+            {"sucursal": {"$exists": False}},
+            {"$set": {"sucursal": SUCURSAL_POR_DEFECTO}}
+        )
+        actualizados[coleccion] = resultado.modified_count
+    resultado = db.transacciones.update_many(
+        {"meta.sucursal": {"$exists": False}},
+        {"$set": {"meta.sucursal": SUCURSAL_POR_DEFECTO}}
+    )
+    actualizados["transacciones"] = resultado.modified_count
+    return actualizados
+
+def listar_sucursales(db):
+    # El rollup mensual tiene pocos documentos por sucursal
+    return sorted(db.rollup_mensual.distinct("sucursal"))
@@ -1,3 +1,7 @@
 from .analytics import router as analytics_router
 from .upload import router as upload_router
-from .dashboard import router as dashboard_router
\ No newline at end of file
+from .dashboard import router as dashboard_router
+from .admin import router as admin_router
+from .transacciones import router as transacciones_router
+from .cadena import router as cadena_router
+from .tiempo_real import router as tiempo_real_router
\ No newline at end of file
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from models.database import mongodb
+from models.indices import estadisticas_indices
+from models.repositorio import repositorio
+from utils.alertas import motor_alertas
+from utils.buffer_transacciones import buffer_transacciones
+from utils.cache import cache_resultados
+from utils.difusion import difusor
+from utils.indice_prefijo import indice_prefijo
+from utils.motor_columnar import motor_columnar
+from utils.pronostico import pronostico
+from utils.respuestas import RutaRapida
+from utils.rollups import reconstruir_rollups
+from utils.singleflight import coalescencia
+from utils.version_datos import version_datos
+from typing import Optional
+import hmac
+import os
+
+# Sin ADMIN_TOKEN las rutas de administración quedan cerradas
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+async def verificar_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "Administración deshabilitada: definir ADMIN_TOKEN")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(401, "Token de administración inválido")
+
+# La migración del modelo de datos borra colecciones: no se expone por HTTP,
+# se corre con `python -m models.migracion`
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    route_class=RutaRapida,
+    dependencies=[Depends(verificar_admin)]
+)
+
+@router.get("/indices")
+async def get_indices():
+    try:
+        estadisticas = await repositorio.ejecutar(estadisticas_indices, mongodb.db)
+        return {"success": True, "data": estadisticas, "error": None}
+
+    except Exception as e:
+        raise HTTPException(500, f"Error obteniendo índices: {str(e)}")
+
+@router.post("/rollups/reconstruir")
+async def post_reconstruir_rollups():
+    try:
+        await repositorio.ejecutar(reconstruir_rollups, mongodb.db)
+        if indice_prefijo.activo:
+            await repositorio.ejecutar(indice_prefijo.construir, mongodb.db)
+        await repositorio.ejecutar(pronostico.construir, mongodb.db)
+        cache_resultados.invalidar()
+        await repositorio.ejecutar(version_datos.incrementar, mongodb.db)
+        return {"success": True, "data": {"message": "Rollups reconstruidos"}, "error": None}
+
+    except Exception as e:
+        raise HTTPException(500, f"Error reconstruyendo rollups: {str(e)}")
+
+@router.get("/indice-prefijo")
+async def get_indice_prefijo():
+    return {"success": True, "data": indice_prefijo.estadisticas(), "error": None}
+
+@router.get("/pronostico")
+async def get_pronostico_modelos():
+    return {"success": True, "data": pronostico.estadisticas(), "error": None}
+
+@router.get("/motor-columnar")
+async def get_motor_columnar():
+    return {"success": True, "data": motor_columnar.estadisticas(), "error": None}
+
+@router.post("/motor-columnar/recargar")
+async def post_recargar_motor_columnar():
+    if not motor_columnar.activo:
+        raise HTTPException(400, "El motor columnar está desactivado (MOTOR_COLUMNAR=1 para activarlo)")
+    try:
+        await repositorio.ejecutar(motor_columnar.cargar, mongodb.db)
+        cache_resultados.invalidar()
+        await repositorio.ejecutar(version_datos.incrementar, mongodb.db)
+        return {"success": True, "data": motor_columnar.estadisticas(), "error": None}
+
+    except Exception as e:
+        raise HTTPException(500, f"Error recargando motor columnar: {str(e)}")
+
+@router.get("/alertas")
+async def get_motor_alertas():
+    return {"success": True, "data": motor_alertas.estadisticas(), "error": None}
+
+@router.post("/alertas/reconstruir")
+async def post_reconstruir_alertas():
+    try:
+        await repositorio.ejecutar(motor_alertas.reconstruir, mongodb.db)
+        cache_resultados.invalidar()
+        await repositorio.ejecutar(version_datos.incrementar, mongodb.db)
+        return {"success": True, "data": motor_alertas.estadisticas(), "error": None}
+
+    except Exception as e:
+        raise HTTPException(500, f"Error reconstruyendo alertas: {str(e)}")
+
+@router.get("/transacciones")
+async def get_buffer_transacciones():
+    return {"success": True, "data": buffer_transacciones.estadisticas(), "error": None}
+
+@router.get("/version-datos")
+async def get_version_datos():
+    return {"success": True, "data": version_datos.estadisticas(), "error": None}
+
+@router.get("/tiempo-real")
+async def get_tiempo_real_estadisticas():
+    return {"success": True, "data": difusor.estadisticas(), "error": None}
+
+@router.get("/cache")
+async def get_cache():
+    data = {**cache_resultados.estadisticas(), "coalescencia": coalescencia.estadisticas()}
+    return {"success": True, "data": data, "error": None}
@@ -1,68 +1,83 @@
-from fastapi import APIRouter, HTTPException
-from models.database import mongodb
+from fastapi import APIRouter, HTTPException, Query
+from models.repositorio import repositorio
+from models.sucursales import filtro_sucursal
+from utils.cache import cacheado
+from utils.indice_prefijo import indice_prefijo
+from utils.respuestas import RutaCondicional
 from models.schemas import AnalyticsResponse
 from datetime import datetime, timedelta
-from bson import ObjectId
-import json
+from typing import Optional
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
-
-# Helper function para convertir ObjectId a string
-def convertir_objectid(obj):
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, list):
-        return [convertir_objectid(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {key: convertir_objectid(value) for key, value in obj.items()}
-    return obj
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=RutaCondicional)
 
 @router.get("/resumen-mensual", response_model=AnalyticsResponse)
-async def get_resumen_mensual():
+@cacheado("analytics/resumen-mensual")
+async def get_resumen_mensual(sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")):
     try:
-        collections = mongodb.get_collections()
-        
-        # Ingresos por tipo de servicio
+        # Ingresos por tipo de servicio (desde el rollup mensual)
         pipeline_ingresos = [
+            {"$match": filtro_sucursal(sucursal)},
+            {"$project": {"servicios": {"$objectToArray": "$servicios"}}},
+            {"$unwind": "$servicios"},
             {
                 "$group": {
-                    "_id": "$tipo_servicio",
-                    "total_ingresos": {"$sum": "$ingresos"},
-                    "total_servicios": {"$sum": "$cantidad"}
+                    "_id": "$servicios.k",
+                    "total_ingresos": {"$sum": "$servicios.v.ingresos"},
+                    "total_servicios": {"$sum": "$servicios.v.cantidad"}
                 }
             }
         ]
-        ingresos_por_tipo = list(collections["servicios"].aggregate(pipeline_ingresos))
+        ingresos_por_tipo = await repositorio.aggregate("rollup_mensual", pipeline_ingresos, "resumen_ingresos_por_tipo")
         
-        # Servicios por día
+        # Servicios por día (desde el rollup diario)
         pipeline_servicios_dia = [
+            {"$match": filtro_sucursal(sucursal)},
+            # Un documento por día sumando las sucursales
             {
                 "$group": {
-                    "_id": {"fecha": "$fecha", "dia_semana": "$dia_semana"},
+                    "_id": "$periodo",
+                    "dia_semana": {"$first": "$dia_semana"},
                     "servicios_atendidos": {"$sum": "$servicios_atendidos"},
-                    "ingresos_totales": {"$sum": "$ingresos_totales"}
+                    "ingresos_totales": {"$sum": "$ingresos"}
                 }
             },
-            {"$sort": {"_id.fecha": 1}}
+            {"$sort": {"_id": 1}},
+            {
+                "$project": {
+                    "_id": {"fecha": "$_id", "dia_semana": "$dia_semana"},
+                    "servicios_atendidos": 1,
+                    "ingresos_totales": 1
+                }
+            }
         ]
-        servicios_por_dia = list(collections["dias_operacion"].aggregate(pipeline_servicios_dia))
+        servicios_por_dia = await repositorio.aggregate("rollup_diario", pipeline_servicios_dia, "resumen_servicios_por_dia")
         
         # Ganancias totales
         pipeline_ganancias = [
+            {"$match": filtro_sucursal(sucursal)},
             {
                 "$group": {
                     "_id": None,
-                    "ganancias_totales": {"$sum": "$ganancia_neta"},
-                    "promedio_servicios": {"$avg": "$servicios_atendidos"}
+                    "ganancias_totales": {"$sum": "$utilidad"},
+                    "servicios_atendidos": {"$sum": "$servicios_atendidos"},
+                    "dias": {"$sum": "$dias"}
+                }
+            },
+            {
+                "$project": {
+                    "ganancias_totales": 1,
+                    "promedio_servicios": {
+                        "$cond": [
+                            {"$gt": ["$dias", 0]},
+                            {"$divide": ["$servicios_atendidos", "$dias"]},
+                            0
+                        ]
+                    }
                 }
             }
         ]
-        ganancias_totales = list(collections["dias_operacion"].aggregate(pipeline_ganancias))
+        ganancias_totales = await repositorio.aggregate("rollup_mensual", pipeline_ganancias, "resumen_ganancias")
         
-        # Convertir ObjectId a string
-        ingresos_por_tipo = convertir_objectid(ingresos_por_tipo)
-        servicios_por_dia = convertir_objectid(servicios_por_dia)
-        ganancias_totales = convertir_objectid(ganancias_totales)
         
         return AnalyticsResponse(
             ingresos_por_tipo={item["_id"]: item["total_ingresos"] for item in ingresos_por_tipo},
@@ -75,13 +90,13 @@ async def get_resumen_mensual():
         raise HTTPException(500, f"Error obteniendo analytics: {str(e)}")
 
 @router.get("/servicios-por-fecha")
-async def get_servicios_por_fecha(fecha_inicio: str, fecha_fin: str):
+@cacheado("analytics/servicios-por-fecha")
+async def get_servicios_por_fecha(fecha_inicio: str, fecha_fin: str, sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")):
     try:
-        collections = mongodb.get_collections()
-        
         pipeline = [
             {
                 "$match": {
+                    **filtro_sucursal(sucursal),
                     "fecha": {
                         "$gte": datetime.fromisoformat(fecha_inicio),
                         "$lte": datetime.fromisoformat(fecha_fin)
@@ -99,10 +114,12 @@ async def get_servicios_por_fecha(fecha_inicio: str, fecha_fin: str):
             {"$sort": {"_id": 1}}
         ]
         
-        resultados = list(collections["dias_operacion"].aggregate(pipeline))
-        
-        # Convertir ObjectId a string
-        resultados = convertir_objectid(resultados)
+        if not sucursal and indice_prefijo.listo():
+            resultados = indice_prefijo.servicios_por_fecha(
+                datetime.fromisoformat(fecha_inicio), datetime.fromisoformat(fecha_fin)
+            )
+        else:
+            resultados = await repositorio.aggregate("dias_operacion", pipeline, "servicios_por_fecha")
         
         return resultados
         
@@ -110,17 +127,17 @@ async def get_servicios_por_fecha(fecha_inicio: str, fecha_fin: str):
         raise HTTPException(500, f"Error obteniendo datos por fecha: {str(e)}")
 
 @router.get("/top-dias")
-async def get_top_dias(limit: int = 5):
+@cacheado("analytics/top-dias")
+async def get_top_dias(limit: int = 5, sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")):
     try:
-        collections = mongodb.get_collections()
-        
         pipeline = [
-            {"$match": {"estado": "abierto"}},
+            {"$match": {**filtro_sucursal(sucursal), "estado": "abierto"}},
             {"$sort": {"ingresos_totales": -1}},
             {"$limit": limit},
             {
                 "$project": {
                     "_id": 0,  # Excluir el _id de MongoDB
+                    "sucursal": 1,
                     "fecha": 1,
                     "dia_semana": 1,
                     "servicios_atendidos": 1,
@@ -130,10 +147,7 @@ async def get_top_dias(limit: int = 5):
             }
         ]
         
-        resultados = list(collections["dias_operacion"].aggregate(pipeline))
-        
-        # Convertir ObjectId a string (aunque excluimos _id, por si hay otros campos)
-        resultados = convertir_objectid(resultados)
+        resultados = await repositorio.aggregate("dias_operacion", pipeline, "top_dias")
         
         return resultados
         
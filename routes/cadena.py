@@ -0,0 +1,136 @@
+from fastapi import APIRouter, HTTPException, Query
+from models.database import mongodb
+from models.repositorio import repositorio
+from models.sucursales import listar_sucursales
+from routes.dashboard import calcular_cambio_porcentual, clave_periodo, formato_respuesta, get_revenue, get_services
+from utils.cache import cacheado
+from utils.respuestas import RutaCondicional
+from typing import Optional
+import asyncio
+
+router = APIRouter(prefix="/api/cadena", tags=["Cadena"], route_class=RutaCondicional)
+
+# Helper function: el mismo endpoint para cada sucursal a la vez.
+# Cada consulta usa el índice (sucursal, fecha) y pasa por el cache de esa
+# sucursal, así la latencia no crece con una sola consulta sobre toda la cadena
+async def por_sucursal(funcion, **parametros):
+    sucursales = await repositorio.ejecutar(listar_sucursales, mongodb.db_lectura)
+    respuestas = await asyncio.gather(*[
+        funcion(**parametros, sucursal=sucursal)
+        for sucursal in sucursales
+    ], return_exceptions=True)
+
+    parciales, errores = {}, {}
+    for sucursal, respuesta in zip(sucursales, respuestas):
+        if isinstance(respuesta, Exception):
+            errores[sucursal] = str(respuesta)
+        elif not respuesta.get("success"):
+            errores[sucursal] = respuesta.get("error")
+        else:
+            parciales[sucursal] = respuesta["data"]
+    return parciales, errores
+
+@router.get("/sucursales")
+async def get_sucursales():
+    try:
+        sucursales = await repositorio.ejecutar(listar_sucursales, mongodb.db_lectura)
+        return formato_respuesta(sucursales)
+
+    except Exception as e:
+        raise HTTPException(500, f"Error listando sucursales: {str(e)}")
+
+@router.get("/revenue")
+@cacheado("api/cadena/revenue", clave=clave_periodo)
+async def get_revenue_cadena(
+    periodo: str = Query("semana", description="Periodo: hoy, semana, mes"),
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None)
+):
+    try:
+        parciales, errores = await por_sucursal(
+            get_revenue, periodo=periodo, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+        )
+
+        totales = {"ingresos_totales": 0, "servicios_atendidos": 0, "ganancia_neta": 0, "dias_operacion": 0}
+        for data in parciales.values():
+            for campo in totales:
+                totales[campo] += data[campo]
+        totales["ticket_promedio"] = round(
+            totales["ingresos_totales"] / totales["servicios_atendidos"], 2
+        ) if totales["servicios_atendidos"] > 0 else 0
+
+        promedio_sucursal = totales["ingresos_totales"] / len(parciales) if parciales else 0
+        ranking = sorted(
+            (
+                {
+                    "sucursal": sucursal,
+                    "ingresos_totales": data["ingresos_totales"],
+                    "servicios_atendidos": data["servicios_atendidos"],
+                    "ticket_promedio": data["ticket_promedio"],
+                    "diferencia_vs_promedio": round(calcular_cambio_porcentual(data["ingresos_totales"], promedio_sucursal), 2)
+                }
+                for sucursal, data in parciales.items()
+            ),
+            key=lambda item: item["ingresos_totales"],
+            reverse=True
+        )
+
+        periodo_resuelto = next(iter(parciales.values()))["periodo"] if parciales else None
+        return formato_respuesta({
+            "totales": totales,
+            "sucursales": ranking,
+            "errores": errores,
+            "periodo": periodo_resuelto
+        })
+
+    except Exception as e:
+        return {"success": False, "data": None, "error": str(e)}
+
+@router.get("/services")
+@cacheado("api/cadena/services", clave=clave_periodo)
+async def get_services_cadena(
+    periodo: Optional[str] = Query("semana"),
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None)
+):
+    try:
+        parciales, errores = await por_sucursal(
+            get_services, periodo=periodo, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+        )
+
+        # Sumar las estadísticas y la distribución por tipo de cada sucursal
+        totales = {"total_servicios": 0, "total_ingresos": 0, "ganancia_neta": 0, "costos_totales": 0}
+        tipos = {}
+        for data in parciales.values():
+            for campo in totales:
+                totales[campo] += data["estadisticas_generales"][campo]
+            for servicio in data["distribucion_tipos"]:
+                tipo = tipos.setdefault(servicio["tipo_servicio"], {
+                    "tipo_servicio": servicio["tipo_servicio"],
+                    "cantidad": 0,
+                    "ingresos": 0,
+                    "veces_contratado": 0
+                })
+                for campo in ("cantidad", "ingresos", "veces_contratado"):
+                    tipo[campo] += servicio[campo]
+
+        totales["ticket_promedio"] = round(
+            totales["total_ingresos"] / totales["total_servicios"], 2
+        ) if totales["total_servicios"] > 0 else 0
+
+        distribucion_tipos = sorted(tipos.values(), key=lambda tipo: tipo["cantidad"], reverse=True)
+        for tipo in distribucion_tipos:
+            tipo["precio_promedio"] = round(tipo["ingresos"] / tipo["cantidad"], 2) if tipo["cantidad"] > 0 else 0
+
+        return formato_respuesta({
+            "estadisticas_generales": totales,
+            "distribucion_tipos": distribucion_tipos,
+            "por_sucursal": {
+                sucursal: data["estadisticas_generales"]
+                for sucursal, data in parciales.items()
+            },
+            "errores": errores
+        })
+
+    except Exception as e:
+        return {"success": False, "data": None, "error": str(e)}
@@ -1,10 +1,35 @@
 from fastapi import APIRouter, HTTPException, Query
 from models.database import mongodb
+from models.modelo_datos import es_embebido, vista_hijos
+from models.repositorio import repositorio, lote_compartido
+from models.schemas import DashboardBatchRequest
+from models.sucursales import filtro_sucursal
+from utils.cache import cacheado
+from utils.indice_prefijo import indice_prefijo
+from utils.motor_columnar import motor_columnar
+from utils.pronostico import pronostico
+from utils.respuestas import RutaCondicional
+from utils.singleflight import coalescencia
+from utils.version_datos import depende_de
 from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
+import contextvars
 import math
+import os
 
-router = APIRouter(prefix="/api", tags=["Dashboard"])
+router = APIRouter(prefix="/api", tags=["Dashboard"], route_class=RutaCondicional)
+
+# Zona horaria del local para agrupar transacciones por hora y día
+ZONA_HORARIA = os.getenv("ZONA_HORARIA", "America/Santiago")
+DIAS_SEMANA_CORTOS = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+# Insumos usados por cada tipo de servicio (unidades por auto)
+CONSUMO_POR_SERVICIO = {
+    "normal": {"shampoo": 1, "cera": 0, "panos": 2},
+    "premium": {"shampoo": 1, "cera": 1, "panos": 3},
+    "full_premium": {"shampoo": 2, "cera": 1, "panos": 4}
+}
 
 # Helper function para calcular cambios porcentuales
 def calcular_cambio_porcentual(actual, anterior):
@@ -12,75 +37,205 @@ def calcular_cambio_porcentual(actual, anterior):
         return 0
     return ((actual - anterior) / anterior) * 100
 
+# Helper function para sumar un campo solo dentro de un rango de fechas
+def suma_en_rango(campo, desde, hasta):
+    return {"$sum": {"$cond": [
+        {"$and": [{"$gte": ["$fecha", desde]}, {"$lte": ["$fecha", hasta]}]},
+        f"${campo}",
+        0
+    ]}}
+
+# Helper function para resolver el rango de fechas de un periodo
+def resolver_periodo(periodo, fecha_inicio=None, fecha_fin=None):
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    if periodo == "hoy":
+        return hoy, hoy
+    if periodo == "semana":
+        return hoy - timedelta(days=hoy.weekday()), hoy
+    if periodo == "mes":
+        return hoy.replace(day=1), hoy
+    # Usar fechas personalizadas si se proporcionan
+    if fecha_inicio and fecha_fin:
+        return datetime.fromisoformat(fecha_inicio), datetime.fromisoformat(fecha_fin)
+    return hoy - timedelta(days=7), hoy
+
+# Clave de cache con la ventana de fechas ya resuelta
+def clave_periodo(periodo="semana", fecha_inicio=None, fecha_fin=None, sucursal=None):
+    inicio, fin = resolver_periodo(periodo, fecha_inicio, fecha_fin)
+    return {
+        "periodo": periodo,
+        "fecha_inicio": inicio.date().isoformat(),
+        "fecha_fin": fin.date().isoformat(),
+        "sucursal": sucursal
+    }
+
 # Helper function para formatear respuesta
 def formato_respuesta(data):
     return {"success": True, "data": data, "error": None}
 
+# Hora de corte de las ventanas de transacciones, fijada una vez por lote
+_corte_lote = contextvars.ContextVar("corte_lote", default=None)
+
+# Helper function: fin de las ventanas de transacciones truncado a la hora.
+# Dentro de /dashboard/batch todos los paneles usan la misma hora de corte, así
+# los que piden los mismos días construyen el mismo pipeline y lote_compartido
+# hace un solo recorrido del agregado por hora
+def hora_de_corte():
+    return _corte_lote.get() or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+# Helper function: transacciones de los últimos días por fecha local, hora y tipo.
+# Lee el agregado por hora que actualiza cada vaciado, no los eventos sueltos
+# (las horas UTC coinciden con las locales en zonas de horas enteras)
+async def transacciones_por_hora(dias, sucursal=None):
+    desde = hora_de_corte() - timedelta(days=dias)
+    pipeline = [
+        {"$match": {**filtro_sucursal(sucursal), "hora": {"$gte": desde}}},
+        {"$group": {
+            "_id": {
+                "fecha": {"$dateToString": {"date": "$hora", "format": "%Y-%m-%d", "timezone": ZONA_HORARIA}},
+                "hora": {"$hour": {"date": "$hora", "timezone": ZONA_HORARIA}},
+                "tipo": "$tipo"
+            },
+            "servicios": {"$sum": "$servicios"}
+        }}
+    ]
+    return await repositorio.aggregate("transacciones_hora", pipeline, "transacciones_por_hora")
+
+# Días de operación compartidos por los paneles de /dashboard/batch
+_dias_lote = contextvars.ContextVar("dias_lote", default=None)
+
+class DiasLote:
+    """Un solo recorrido de dias_operacion para la ventana más amplia del lote.
+
+    overview, revenue, revenue-weekly y services piden rangos distintos de la
+    misma colección: el primero que los necesita lanza la lectura y los demás
+    filtran en memoria el mismo resultado.
+    """
+
+    def __init__(self, desde, hasta, sucursal):
+        self.desde = desde
+        self.hasta = hasta
+        self.sucursal = sucursal
+        self._tarea = None
+
+    async def dias(self, desde, hasta, sucursal):
+        if sucursal != self.sucursal or desde < self.desde or hasta > self.hasta:
+            return None
+        if self._tarea is None:
+            pipeline = [
+                {"$match": {**filtro_sucursal(self.sucursal), "fecha": {"$gte": self.desde, "$lte": self.hasta}}},
+                {"$project": {
+                    "_id": 0, "fecha": 1, "dia_semana": 1, "servicios_atendidos": 1,
+                    "ingresos_totales": 1, "ganancia_neta": 1, "costos_totales": 1
+                }}
+            ]
+            self._tarea = asyncio.ensure_future(repositorio.aggregate("dias_operacion", pipeline, "dias_lote"))
+        dias = await asyncio.shield(self._tarea)
+        return [dia for dia in dias if desde <= dia["fecha"] <= hasta]
+
+# Helper function: días del rango si el lote en curso ya los lee (None fuera de un lote)
+async def dias_del_lote(desde, hasta, sucursal=None):
+    lote = _dias_lote.get()
+    return await lote.dias(desde, hasta, sucursal) if lote is not None else None
+
+# Helper function: suma de un campo de los días dentro de [desde, hasta]
+def sumar_dias(dias, campo, desde, hasta):
+    return sum(dia.get(campo, 0) or 0 for dia in dias if desde <= dia["fecha"] <= hasta)
+
+# Helper function: días de operación agrupados por fecha (varias sucursales suman)
+def dias_por_fecha(dias):
+    por_fecha = {}
+    for dia in sorted(dias, key=lambda dia: dia["fecha"]):
+        fila = por_fecha.setdefault(dia["fecha"], {
+            "fecha": dia["fecha"],
+            "dia_semana": dia.get("dia_semana"),
+            "servicios_atendidos": 0,
+            "ingresos_totales": 0,
+            "ganancia_neta": 0
+        })
+        for campo in ("servicios_atendidos", "ingresos_totales", "ganancia_neta"):
+            fila[campo] += dia.get(campo, 0) or 0
+    return list(por_fecha.values())
+
+# Helper function: fechas de comparación del overview
+def ventanas_overview():
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    return {
+        "hoy": hoy,
+        "inicio_semana": inicio_semana,
+        "inicio_mes": hoy.replace(day=1),
+        "semana_anterior_inicio": inicio_semana - timedelta(days=7),
+        "semana_anterior_fin": inicio_semana - timedelta(days=1)
+    }
+
+# Helper function: servicios por tipo en un rango (services y services-popular
+# usan el mismo pipeline, así dentro de un lote se ejecuta una vez)
+async def servicios_por_tipo(fecha_inicio, fecha_fin, sucursal=None):
+    pipeline = [
+        {"$match": {**filtro_sucursal(sucursal), "fecha": {"$gte": fecha_inicio, "$lte": fecha_fin}}},
+        {"$group": {
+            "_id": "$tipo_servicio",
+            "cantidad": {"$sum": "$cantidad"},
+            "ingresos": {"$sum": "$ingresos"},
+            "veces_contratado": {"$sum": 1}
+        }},
+        {"$sort": {"cantidad": -1}}
+    ]
+    return await repositorio.aggregate("servicios", pipeline, "servicios_por_tipo")
+
 @router.get("/dashboard/overview")
-async def get_dashboard_overview():
+@cacheado("api/dashboard/overview")
+async def get_dashboard_overview(
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        collections = mongodb.get_collections()
-        hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        inicio_semana = hoy - timedelta(days=hoy.weekday())
-        inicio_mes = hoy.replace(day=1)
-        
-        # Datos de hoy
-        pipeline_hoy = [
-            {"$match": {"fecha": hoy}},
-            {"$group": {
-                "_id": None,
-                "ingresos": {"$sum": "$ingresos_totales"},
-                "clientes": {"$sum": "$servicios_atendidos"}
-            }}
-        ]
-        resultado_hoy = list(collections["dias_operacion"].aggregate(pipeline_hoy))
-        ingresos_hoy = resultado_hoy[0]["ingresos"] if resultado_hoy else 0
-        clientes_hoy = resultado_hoy[0]["clientes"] if resultado_hoy else 0
+        ventanas = ventanas_overview()
+        hoy, inicio_semana, inicio_mes = ventanas["hoy"], ventanas["inicio_semana"], ventanas["inicio_mes"]
         
-        # Datos de la semana
-        pipeline_semana = [
-            {"$match": {"fecha": {"$gte": inicio_semana, "$lte": hoy}}},
-            {"$group": {
-                "_id": None,
-                "ingresos": {"$sum": "$ingresos_totales"},
-                "clientes": {"$sum": "$servicios_atendidos"}
-            }}
-        ]
-        resultado_semana = list(collections["dias_operacion"].aggregate(pipeline_semana))
-        ingresos_semana = resultado_semana[0]["ingresos"] if resultado_semana else 0
-        clientes_semana = resultado_semana[0]["clientes"] if resultado_semana else 0
-        
-        # Datos del mes
-        pipeline_mes = [
-            {"$match": {"fecha": {"$gte": inicio_mes, "$lte": hoy}}},
-            {"$group": {
-                "_id": None,
-                "ingresos": {"$sum": "$ingresos_totales"},
-                "clientes": {"$sum": "$servicios_atendidos"}
-            }}
-        ]
-        resultado_mes = list(collections["dias_operacion"].aggregate(pipeline_mes))
-        ingresos_mes = resultado_mes[0]["ingresos"] if resultado_mes else 0
-        clientes_mes = resultado_mes[0]["clientes"] if resultado_mes else 0
+        # Datos del período anterior para comparación
+        semana_anterior_inicio = ventanas["semana_anterior_inicio"]
+        semana_anterior_fin = ventanas["semana_anterior_fin"]
+        rangos = {
+            "hoy": (hoy, hoy),
+            "semana": (inicio_semana, hoy),
+            "mes": (inicio_mes, hoy),
+            "semana_anterior": (semana_anterior_inicio, semana_anterior_fin)
+        }
+        desde = min(semana_anterior_inicio, inicio_mes)
+        
+        dias = await dias_del_lote(desde, hoy, sucursal)
+        if dias is not None:
+            # Dentro de /dashboard/batch: los días ya leídos para todo el lote
+            totales = {}
+            for nombre, (inicio, fin) in rangos.items():
+                totales[f"ingresos_{nombre}"] = sumar_dias(dias, "ingresos_totales", inicio, fin)
+                totales[f"clientes_{nombre}"] = sumar_dias(dias, "servicios_atendidos", inicio, fin)
+        else:
+            # Una sola pasada sobre la ventana más amplia con sumas condicionales
+            sumas = {}
+            for nombre, (inicio, fin) in rangos.items():
+                sumas[f"ingresos_{nombre}"] = suma_en_rango("ingresos_totales", inicio, fin)
+                sumas[f"clientes_{nombre}"] = suma_en_rango("servicios_atendidos", inicio, fin)
+            pipeline = [
+                {"$match": {**filtro_sucursal(sucursal), "fecha": {"$gte": desde, "$lte": hoy}}},
+                {"$group": {"_id": None, **sumas}}
+            ]
+            resultado = await repositorio.aggregate("dias_operacion", pipeline, "overview")
+            totales = resultado[0] if resultado else {}
+        
+        ingresos_hoy = totales.get("ingresos_hoy", 0)
+        clientes_hoy = totales.get("clientes_hoy", 0)
+        ingresos_semana = totales.get("ingresos_semana", 0)
+        clientes_semana = totales.get("clientes_semana", 0)
+        ingresos_mes = totales.get("ingresos_mes", 0)
+        clientes_mes = totales.get("clientes_mes", 0)
+        ingresos_semana_anterior = totales.get("ingresos_semana_anterior", 0)
+        clientes_semana_anterior = totales.get("clientes_semana_anterior", 0)
         
         # Ticket promedio
         ticket_promedio = ingresos_semana / clientes_semana if clientes_semana > 0 else 0
-        
-        # Datos del período anterior para comparación
-        semana_anterior_inicio = inicio_semana - timedelta(days=7)
-        semana_anterior_fin = inicio_semana - timedelta(days=1)
-        
-        pipeline_semana_anterior = [
-            {"$match": {"fecha": {"$gte": semana_anterior_inicio, "$lte": semana_anterior_fin}}},
-            {"$group": {
-                "_id": None,
-                "ingresos": {"$sum": "$ingresos_totales"},
-                "clientes": {"$sum": "$servicios_atendidos"}
-            }}
-        ]
-        resultado_semana_anterior = list(collections["dias_operacion"].aggregate(pipeline_semana_anterior))
-        ingresos_semana_anterior = resultado_semana_anterior[0]["ingresos"] if resultado_semana_anterior else 0
-        clientes_semana_anterior = resultado_semana_anterior[0]["clientes"] if resultado_semana_anterior else 0
         ticket_semana_anterior = ingresos_semana_anterior / clientes_semana_anterior if clientes_semana_anterior > 0 else 0
         
         # Cálculo de cambios porcentuales
@@ -107,35 +262,47 @@ async def get_dashboard_overview():
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/dashboard/revenue-weekly")
+@cacheado("api/dashboard/revenue-weekly")
 async def get_revenue_weekly(
     fecha_inicio: Optional[str] = Query(None),
-    fecha_fin: Optional[str] = Query(None)
+    fecha_fin: Optional[str] = Query(None),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
 ):
     try:
-        collections = mongodb.get_collections()
-        
         # Si no se proporcionan fechas, usar última semana
         if not fecha_inicio or not fecha_fin:
             hoy = datetime.now()
             fecha_fin = hoy.strftime("%Y-%m-%d")
             fecha_inicio = (hoy - timedelta(days=6)).strftime("%Y-%m-%d")
         
+        desde, hasta = datetime.fromisoformat(fecha_inicio), datetime.fromisoformat(fecha_fin)
+        dias = await dias_del_lote(desde, hasta, sucursal)
+        if dias is not None:
+            data = [
+                {"name": (dia["dia_semana"] or "")[:3], "ingresos": dia["ingresos_totales"]}
+                for dia in dias_por_fecha(dias)
+            ]
+            return formato_respuesta(data)
+        
         pipeline = [
             {"$match": {
-                "fecha": {
-                    "$gte": datetime.fromisoformat(fecha_inicio),
-                    "$lte": datetime.fromisoformat(fecha_fin)
-                }
+                **filtro_sucursal(sucursal),
+                "fecha": {"$gte": desde, "$lte": hasta}
+            }},
+            # Un punto por fecha aunque sean varias sucursales
+            {"$group": {
+                "_id": "$fecha",
+                "dia_semana": {"$first": "$dia_semana"},
+                "ingresos": {"$sum": "$ingresos_totales"}
             }},
             {"$project": {
                 "name": {"$substr": ["$dia_semana", 0, 3]},
-                "ingresos": "$ingresos_totales",
-                "fecha": 1
+                "ingresos": 1
             }},
-            {"$sort": {"fecha": 1}}
+            {"$sort": {"_id": 1}}
         ]
         
-        resultados = list(collections["dias_operacion"].aggregate(pipeline))
+        resultados = await repositorio.aggregate("dias_operacion", pipeline, "revenue_weekly")
         
         # Formatear resultados
         data = [{"name": item["name"], "ingresos": item["ingresos"]} for item in resultados]
@@ -146,35 +313,22 @@ async def get_revenue_weekly(
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/dashboard/services-popular")
+@cacheado("api/dashboard/services-popular")
 async def get_services_popular(
     fecha_inicio: Optional[str] = Query(None),
-    fecha_fin: Optional[str] = Query(None)
+    fecha_fin: Optional[str] = Query(None),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
 ):
     try:
-        collections = mongodb.get_collections()
-        
         # Si no se proporcionan fechas, usar última semana
         if not fecha_inicio or not fecha_fin:
             hoy = datetime.now()
             fecha_fin = hoy.strftime("%Y-%m-%d")
             fecha_inicio = (hoy - timedelta(days=7)).strftime("%Y-%m-%d")
         
-        pipeline = [
-            {"$match": {
-                "fecha": {
-                    "$gte": datetime.fromisoformat(fecha_inicio),
-                    "$lte": datetime.fromisoformat(fecha_fin)
-                }
-            }},
-            {"$group": {
-                "_id": "$tipo_servicio",
-                "cantidad": {"$sum": "$cantidad"},
-                "ingresos": {"$sum": "$ingresos"}
-            }},
-            {"$sort": {"cantidad": -1}}
-        ]
-        
-        resultados = list(collections["servicios"].aggregate(pipeline))
+        resultados = await servicios_por_tipo(
+            datetime.fromisoformat(fecha_inicio), datetime.fromisoformat(fecha_fin), sucursal
+        )
         
         data = []
         for item in resultados:
@@ -190,78 +344,71 @@ async def get_services_popular(
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/dashboard/alerts")
-async def get_alerts():
+@cacheado("api/dashboard/alerts")
+async def get_alerts(
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        collections = mongodb.get_collections()
-        hoy = datetime.now()
-        
-        # Alertas basadas en análisis de datos
-        alertas = []
-        
-        # Verificar días con baja actividad
-        pipeline_baja_actividad = [
-            {"$match": {
-                "fecha": {"$gte": hoy - timedelta(days=7)},
-                "servicios_atendidos": {"$lt": 5}
-            }},
-            {"$project": {
-                "fecha": 1,
-                "dia_semana": 1,
-                "servicios_atendidos": 1
-            }}
-        ]
-        
-        dias_baja = list(collections["dias_operacion"].aggregate(pipeline_baja_actividad))
-        
-        for dia in dias_baja:
-            alertas.append({
-                "id": f"baja_{dia['fecha'].strftime('%Y%m%d')}",
-                "tipo": "warning",
-                "titulo": f"Baja actividad el {dia['dia_semana']}",
-                "descripcion": f"Solo {dia['servicios_atendidos']} servicios atendidos",
-                "fecha": dia["fecha"]
-            })
-        
-        # Alertas de éxito (días con alta actividad)
-        pipeline_alta_actividad = [
+        # Las alertas se calculan al confirmar cada carga (utils/alertas.py);
+        # aquí solo se leen las de los últimos 7 días por el índice de fecha
+        pipeline = [
             {"$match": {
-                "fecha": {"$gte": hoy - timedelta(days=7)},
-                "servicios_atendidos": {"$gt": 15}
+                **filtro_sucursal(sucursal),
+                "fecha": {"$gte": datetime.now() - timedelta(days=7)}
             }},
+            {"$sort": {"fecha": -1}},
+            {"$limit": 10},  # Solo últimas 10 alertas
             {"$project": {
-                "fecha": 1,
-                "dia_semana": 1,
-                "servicios_atendidos": 1
+                "_id": 0,
+                "id": "$_id",
+                "sucursal": 1,
+                "tipo": 1,
+                "metrica": 1,
+                "titulo": 1,
+                "descripcion": 1,
+                "valor": 1,
+                "esperado": 1,
+                "z": 1,
+                "fecha": 1
             }}
         ]
+        alertas = await repositorio.aggregate("alertas", pipeline, "alertas")
         
-        dias_alta = list(collections["dias_operacion"].aggregate(pipeline_alta_actividad))
-        
-        for dia in dias_alta:
-            alertas.append({
-                "id": f"alta_{dia['fecha'].strftime('%Y%m%d')}",
-                "tipo": "success",
-                "titulo": f"Alta actividad el {dia['dia_semana']}",
-                "descripcion": f"Excelente: {dia['servicios_atendidos']} servicios atendidos",
-                "fecha": dia["fecha"]
-            })
-        
-        # Ordenar por fecha más reciente
-        alertas.sort(key=lambda x: x["fecha"], reverse=True)
-        
-        return formato_respuesta(alertas[:10])  # Solo últimas 10 alertas
+        return formato_respuesta(alertas)
         
     except Exception as e:
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/clientes/distribucion")
-async def get_clientes_distribucion():
+@depende_de("transacciones")
+async def get_clientes_distribucion(
+    dias: int = Query(30, ge=1, le=365, description="Clientes atendidos en los últimos N días"),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        # Simulación de datos de clientes (en un sistema real, esto vendría de una colección de clientes)
-        data = {
-            "nuevos": 35,  # 35% clientes nuevos
-            "recurrentes": 65  # 65% clientes recurrentes
-        }
+        desde = hora_de_corte() - timedelta(days=dias)
+        # Clientes con visitas en la ventana; nuevo = su primera visita cae en ella.
+        # Primera y última visita por cliente se mantienen en cada vaciado
+        # (sucursal None es la cadena), así no se agrupa todo el historial
+        pipeline = [
+            {"$match": {"sucursal": sucursal or None, "ultima": {"$gte": desde}}},
+            {"$group": {
+                "_id": None,
+                "nuevos": {"$sum": {"$cond": [{"$gte": ["$primera", desde]}, 1, 0]}},
+                "total": {"$sum": 1}
+            }}
+        ]
+        resultado = await repositorio.aggregate("clientes_visitas", pipeline, "clientes_distribucion")
+        
+        if resultado and resultado[0]["total"] > 0:
+            nuevos = round(resultado[0]["nuevos"] / resultado[0]["total"] * 100)
+            data = {"nuevos": nuevos, "recurrentes": 100 - nuevos}
+        else:
+            # Sin transacciones con cliente: datos simulados
+            data = {
+                "nuevos": 35,  # 35% clientes nuevos
+                "recurrentes": 65  # 65% clientes recurrentes
+            }
         
         return formato_respuesta(data)
         
@@ -286,23 +433,34 @@ async def get_clientes_satisfaccion():
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/servicios/evolucion-trimestral")
-async def get_evolucion_trimestral():
+@cacheado("api/servicios/evolucion-trimestral")
+async def get_evolucion_trimestral(
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        collections = mongodb.get_collections()
-        
+        # Leer desde el rollup mensual (un documento por mes)
         pipeline = [
+            {"$match": filtro_sucursal(sucursal)},
+            {"$project": {
+                "mes": {"$month": "$periodo"},
+                "servicios": {"$objectToArray": "$servicios"}
+            }},
+            {"$unwind": "$servicios"},
             {"$group": {
                 "_id": {
-                    "servicio": "$tipo_servicio",
-                    "mes": {"$month": "$fecha"}
+                    "servicio": "$servicios.k",
+                    "mes": "$mes"
                 },
-                "cantidad": {"$sum": "$cantidad"},
-                "ingresos": {"$sum": "$ingresos"}
+                "cantidad": {"$sum": "$servicios.v.cantidad"},
+                "ingresos": {"$sum": "$servicios.v.ingresos"}
             }},
             {"$sort": {"_id.mes": 1}}
         ]
         
-        resultados = list(collections["servicios"].aggregate(pipeline))
+        if not sucursal and motor_columnar.listo():
+            resultados = motor_columnar.evolucion_trimestral()
+        else:
+            resultados = await repositorio.aggregate("rollup_mensual", pipeline, "evolucion_trimestral")
         
         # Estructurar datos por servicio y mes
         servicios_data = {}
@@ -331,39 +489,101 @@ async def get_evolucion_trimestral():
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/servicios/demanda-horaria")
-async def get_demanda_horaria():
+@depende_de("transacciones")
+async def get_demanda_horaria(
+    dias: int = Query(28, ge=1, le=365, description="Promediar los últimos N días"),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        # Simulación de datos de demanda horaria (en un sistema real, esto necesitaría datos por hora)
-        horas = [f"{h}:00" for h in range(8, 20)]
-        demanda = [5, 8, 12, 15, 18, 22, 25, 28, 30, 25, 20, 15]
+        resultados = await transacciones_por_hora(dias, sucursal)
         
-        data = [{"hora": hora, "servicios": servicios} for hora, servicios in zip(horas, demanda)]
+        if resultados:
+            # Promedio por hora sobre los días con transacciones
+            fechas = {item["_id"]["fecha"] for item in resultados}
+            por_hora = {}
+            for item in resultados:
+                hora = item["_id"]["hora"]
+                por_hora[hora] = por_hora.get(hora, 0) + item["servicios"]
+            data = [
+                {"hora": f"{hora}:00", "servicios": round(total / len(fechas), 2)}
+                for hora, total in sorted(por_hora.items())
+            ]
+        else:
+            # Sin transacciones registradas: datos simulados
+            horas = [f"{h}:00" for h in range(8, 20)]
+            demanda = [5, 8, 12, 15, 18, 22, 25, 28, 30, 25, 20, 15]
+            data = [{"hora": hora, "servicios": servicios} for hora, servicios in zip(horas, demanda)]
         
         return formato_respuesta(data)
         
     except Exception as e:
         return {"success": False, "data": None, "error": str(e)}
 
-@router.get("/finanzas/mensual")
-async def get_finanzas_mensual():
+@router.get("/servicios/demanda-semanal")
+@depende_de("transacciones")
+async def get_demanda_semanal(
+    dias: int = Query(28, ge=7, le=365, description="Promediar los últimos N días"),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        collections = mongodb.get_collections()
+        resultados = await transacciones_por_hora(dias, sucursal)
         
+        # Mapa de calor: promedio por día de semana y hora sobre las fechas
+        # con transacciones de ese día de semana
+        fechas_por_dia = {}
+        celdas = {}
+        for item in resultados:
+            dia_semana = datetime.fromisoformat(item["_id"]["fecha"]).weekday()
+            fechas_por_dia.setdefault(dia_semana, set()).add(item["_id"]["fecha"])
+            clave = (dia_semana, item["_id"]["hora"])
+            celdas[clave] = celdas.get(clave, 0) + item["servicios"]
+        
+        data = [
+            {
+                "dia": DIAS_SEMANA_CORTOS[dia_semana],
+                "hora": f"{hora}:00",
+                "servicios": round(total / len(fechas_por_dia[dia_semana]), 2)
+            }
+            for (dia_semana, hora), total in sorted(celdas.items())
+        ]
+        
+        return formato_respuesta(data)
+        
+    except Exception as e:
+        return {"success": False, "data": None, "error": str(e)}
+
+@router.get("/finanzas/mensual")
+@cacheado("api/finanzas/mensual")
+async def get_finanzas_mensual(
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
+    try:
+        # Leer desde el rollup mensual (un documento por sucursal y mes)
         pipeline = [
+            {"$match": filtro_sucursal(sucursal)},
             {"$group": {
+                "_id": "$periodo",
+                "ingresos": {"$sum": "$ingresos"},
+                "gastos": {"$sum": "$gastos"},
+                "utilidad": {"$sum": "$utilidad"}
+            }},
+            {"$sort": {"_id": 1}},
+            {"$limit": 6},
+            {"$project": {
                 "_id": {
-                    "año": {"$year": "$fecha"},
-                    "mes": {"$month": "$fecha"}
+                    "año": {"$year": "$_id"},
+                    "mes": {"$month": "$_id"}
                 },
-                "ingresos": {"$sum": "$ingresos_totales"},
-                "gastos": {"$sum": "$costos_totales"},
-                "utilidad": {"$sum": "$ganancia_neta"}
-            }},
-            {"$sort": {"_id.año": 1, "_id.mes": 1}},
-            {"$limit": 6}
+                "ingresos": 1,
+                "gastos": 1,
+                "utilidad": 1
+            }}
         ]
         
-        resultados = list(collections["dias_operacion"].aggregate(pipeline))
+        if not sucursal and motor_columnar.listo():
+            resultados = motor_columnar.finanzas_mensual()
+        else:
+            resultados = await repositorio.aggregate("rollup_mensual", pipeline, "finanzas_mensual")
         
         meses_map = {
             1: "Ene", 2: "Feb", 3: "Mar", 4: "Abr", 5: "May", 6: "Jun",
@@ -385,19 +605,24 @@ async def get_finanzas_mensual():
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/finanzas/gastos-distribucion")
-async def get_gastos_distribucion():
+@cacheado("api/finanzas/gastos-distribucion")
+async def get_gastos_distribucion(
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        collections = mongodb.get_collections()
-        
+        # Sumar los totales por tipo de costo del rollup mensual
         pipeline = [
-            {"$match": {"monto": {"$gt": 0}}},
+            {"$match": filtro_sucursal(sucursal)},
+            {"$project": {"costos": {"$objectToArray": "$costos"}}},
+            {"$unwind": "$costos"},
+            {"$match": {"costos.v": {"$gt": 0}}},
             {"$group": {
-                "_id": "$tipo_costo",
-                "total": {"$sum": "$monto"}
+                "_id": "$costos.k",
+                "total": {"$sum": "$costos.v"}
             }}
         ]
         
-        resultados = list(collections["costos"].aggregate(pipeline))
+        resultados = await repositorio.aggregate("rollup_mensual", pipeline, "gastos_distribucion")
         
         # Mapear tipos de costo a categorías más generales
         categoria_map = {
@@ -428,6 +653,29 @@ async def get_gastos_distribucion():
     except Exception as e:
         return {"success": False, "data": None, "error": str(e)}
 
+@router.get("/pronostico")
+@cacheado("api/pronostico")
+async def get_pronostico(
+    dias: int = Query(14, ge=1, le=90, description="Días a pronosticar"),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
+    try:
+        # Los modelos se ajustan una vez (al arrancar o con la primera consulta)
+        # y después solo con los días de cada carga
+        if not pronostico.listo():
+            await coalescencia.ejecutar("pronostico", lambda: repositorio.ejecutar(pronostico.construir, mongodb.db))
+
+        data = pronostico.pronosticar(dias, sucursal)
+        if data is None:
+            return {"success": False, "data": None, "error": "No hay días suficientes para ajustar el pronóstico"}
+        for dia in data["pronostico"]:
+            dia["name"] = DIAS_SEMANA_CORTOS[dia.pop("dia_semana")]
+        
+        return formato_respuesta(data)
+        
+    except Exception as e:
+        return {"success": False, "data": None, "error": str(e)}
+
 @router.get("/inventario/stock")
 async def get_inventario_stock():
     try:
@@ -446,19 +694,40 @@ async def get_inventario_stock():
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/inventario/consumo-semanal")
-async def get_consumo_semanal():
+@depende_de("transacciones")
+async def get_consumo_semanal(
+    dias: int = Query(28, ge=7, le=365, description="Promediar los últimos N días"),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
+):
     try:
-        # Datos simulados de consumo (en un sistema real, esto se calcularía basado en servicios)
-        dias = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+        resultados = await transacciones_por_hora(dias, sucursal)
         data = []
         
-        for i, dia in enumerate(dias):
-            data.append({
-                "dia": dia,
-                "shampoo": max(5, 10 - i),  # Simulación de consumo decreciente
-                "cera": max(2, 5 - i),
-                "panos": max(8, 15 - i * 2)
-            })
+        if resultados:
+            # Consumo promedio por día de semana según los servicios realizados
+            fechas_por_dia = {}
+            consumo = {i: {"shampoo": 0, "cera": 0, "panos": 0} for i in range(7)}
+            for item in resultados:
+                dia_semana = datetime.fromisoformat(item["_id"]["fecha"]).weekday()
+                fechas_por_dia.setdefault(dia_semana, set()).add(item["_id"]["fecha"])
+                for insumo, unidades in CONSUMO_POR_SERVICIO.get(item["_id"]["tipo"], {}).items():
+                    consumo[dia_semana][insumo] += unidades * item["servicios"]
+            
+            for i, dia in enumerate(DIAS_SEMANA_CORTOS):
+                fechas = len(fechas_por_dia.get(i, ()))
+                data.append({
+                    "dia": dia,
+                    **{insumo: round(total / fechas, 2) if fechas else 0 for insumo, total in consumo[i].items()}
+                })
+        else:
+            # Sin transacciones registradas: datos simulados
+            for i, dia in enumerate(DIAS_SEMANA_CORTOS):
+                data.append({
+                    "dia": dia,
+                    "shampoo": max(5, 10 - i),  # Simulación de consumo decreciente
+                    "cera": max(2, 5 - i),
+                    "panos": max(8, 15 - i * 2)
+                })
         
         return formato_respuesta(data)
         
@@ -466,37 +735,20 @@ async def get_consumo_semanal():
         return {"success": False, "data": None, "error": str(e)}
     
 @router.get("/dashboard/revenue")
+@cacheado("api/dashboard/revenue", clave=clave_periodo)
 async def get_revenue(
     periodo: str = Query("semana", description="Periodo: hoy, semana, mes"),
     fecha_inicio: Optional[str] = Query(None),
-    fecha_fin: Optional[str] = Query(None)
+    fecha_fin: Optional[str] = Query(None),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
 ):
     try:
-        collections = mongodb.get_collections()
-        
-        hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
         # Determinar el rango de fechas según el periodo
-        if periodo == "hoy":
-            fecha_inicio = hoy
-            fecha_fin = hoy
-        elif periodo == "semana":
-            fecha_inicio = hoy - timedelta(days=hoy.weekday())
-            fecha_fin = hoy
-        elif periodo == "mes":
-            fecha_inicio = hoy.replace(day=1)
-            fecha_fin = hoy
-        else:
-            # Usar fechas personalizadas si se proporcionan
-            if fecha_inicio and fecha_fin:
-                fecha_inicio = datetime.fromisoformat(fecha_inicio)
-                fecha_fin = datetime.fromisoformat(fecha_fin)
-            else:
-                fecha_inicio = hoy - timedelta(days=7)
-                fecha_fin = hoy
+        fecha_inicio, fecha_fin = resolver_periodo(periodo, fecha_inicio, fecha_fin)
         
         pipeline = [
             {"$match": {
+                **filtro_sucursal(sucursal),
                 "fecha": {
                     "$gte": fecha_inicio,
                     "$lte": fecha_fin
@@ -511,7 +763,21 @@ async def get_revenue(
             }}
         ]
         
-        resultados = list(collections["dias_operacion"].aggregate(pipeline))
+        # El índice y el motor en memoria cubren la cadena completa
+        if not sucursal and indice_prefijo.listo():
+            resultados = indice_prefijo.revenue(fecha_inicio, fecha_fin)
+        elif not sucursal and motor_columnar.listo():
+            resultados = motor_columnar.revenue(fecha_inicio, fecha_fin)
+        elif (dias := await dias_del_lote(fecha_inicio, fecha_fin, sucursal)) is not None:
+            resultados = [{
+                "_id": None,
+                "ingresos_totales": sumar_dias(dias, "ingresos_totales", fecha_inicio, fecha_fin),
+                "servicios_atendidos": sumar_dias(dias, "servicios_atendidos", fecha_inicio, fecha_fin),
+                "ganancia_neta": sumar_dias(dias, "ganancia_neta", fecha_inicio, fecha_fin),
+                "dias_operacion": len(dias)
+            }] if dias else []
+        else:
+            resultados = await repositorio.aggregate("dias_operacion", pipeline, "revenue")
         
         if resultados:
             data = {
@@ -546,94 +812,105 @@ async def get_revenue(
         return {"success": False, "data": None, "error": str(e)}
 
 @router.get("/dashboard/services")
+@cacheado("api/dashboard/services", clave=clave_periodo)
 async def get_services(
     periodo: Optional[str] = Query("semana"),
     fecha_inicio: Optional[str] = Query(None),
-    fecha_fin: Optional[str] = Query(None)
+    fecha_fin: Optional[str] = Query(None),
+    sucursal: Optional[str] = Query(None, description="Sucursal; sin ella, toda la cadena")
 ):
     """Ruta VERDADERA - Solo datos reales de la base de datos"""
     try:
-        collections = mongodb.get_collections()
-        
-        hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
         # Determinar fechas REALES
-        if periodo == "hoy":
-            fecha_inicio_dt = hoy
-            fecha_fin_dt = hoy
-        elif periodo == "semana":
-            fecha_inicio_dt = hoy - timedelta(days=hoy.weekday())
-            fecha_fin_dt = hoy
-        elif periodo == "mes":
-            fecha_inicio_dt = hoy.replace(day=1)
-            fecha_fin_dt = hoy
-        else:
-            if fecha_inicio and fecha_fin:
-                fecha_inicio_dt = datetime.fromisoformat(fecha_inicio)
-                fecha_fin_dt = datetime.fromisoformat(fecha_fin)
-            else:
-                fecha_inicio_dt = hoy - timedelta(days=7)
-                fecha_fin_dt = hoy
+        fecha_inicio_dt, fecha_fin_dt = resolver_periodo(periodo, fecha_inicio, fecha_fin)
 
-        # 1. Obtener datos REALES de días_operacion
-        pipeline_dias = [
-            {"$match": {
-                "fecha": {
-                    "$gte": fecha_inicio_dt,
-                    "$lte": fecha_fin_dt
-                }
-            }},
-            {"$group": {
-                "_id": None,
-                "total_servicios": {"$sum": "$servicios_atendidos"},
-                "total_ingresos": {"$sum": "$ingresos_totales"},
-                "dias_operacion": {"$sum": 1},
-                "promedio_diario": {"$avg": "$servicios_atendidos"},
-                "ganancia_neta": {"$sum": "$ganancia_neta"},
-                "costos_totales": {"$sum": "$costos_totales"}
-            }}
-        ]
-        
-        resultado_dias = list(collections["dias_operacion"].aggregate(pipeline_dias))
-        
-        # 2. Obtener datos REALES de servicios
-        pipeline_servicios = [
-            {"$match": {
-                "fecha": {
-                    "$gte": fecha_inicio_dt,
-                    "$lte": fecha_fin_dt
-                }
-            }},
-            {"$group": {
-                "_id": "$tipo_servicio",
-                "cantidad": {"$sum": "$cantidad"},
-                "ingresos": {"$sum": "$ingresos"},
-                "veces_contratado": {"$sum": 1}
-            }},
-            {"$sort": {"cantidad": -1}}
-        ]
-        
-        resultado_servicios = list(collections["servicios"].aggregate(pipeline_servicios))
+        rango = {**filtro_sucursal(sucursal), "fecha": {"$gte": fecha_inicio_dt, "$lte": fecha_fin_dt}}
         
-        # 3. Obtener días REALES con datos
-        pipeline_dias_concretos = [
-            {"$match": {
-                "fecha": {
-                    "$gte": fecha_inicio_dt,
-                    "$lte": fecha_fin_dt
-                }
-            }},
-            {"$project": {
-                "fecha": 1,
-                "dia_semana": 1,
-                "servicios_atendidos": 1,
-                "ingresos_totales": 1,
-                "ganancia_neta": 1
-            }},
-            {"$sort": {"fecha": 1}}
+        if es_embebido():
+            # Los servicios vienen dentro de cada día: basta un rango de fechas
+            etapas_iniciales = [{"$match": rango}]
+            solo_dias = []
+            solo_servicios = vista_hijos("servicios")
+        else:
+            # Días del rango + servicios del rango vía $unionWith
+            etapas_iniciales = [
+                {"$match": rango},
+                {"$unionWith": {
+                    "coll": "servicios",
+                    "pipeline": [
+                        {"$match": rango},
+                        {"$set": {"_servicio": True}}
+                    ]
+                }}
+            ]
+            solo_dias = [{"$match": {"_servicio": {"$exists": False}}}]
+            solo_servicios = [{"$match": {"_servicio": True}}]
+        
+        # Una sola consulta, separada luego en tres facetas
+        pipeline = etapas_iniciales + [
+            {"$facet": {
+                # 1. Totales REALES de días_operacion
+                "dias": solo_dias + [
+                    {"$group": {
+                        "_id": None,
+                        "total_servicios": {"$sum": "$servicios_atendidos"},
+                        "total_ingresos": {"$sum": "$ingresos_totales"},
+                        "dias_operacion": {"$sum": 1},
+                        "promedio_diario": {"$avg": "$servicios_atendidos"},
+                        "ganancia_neta": {"$sum": "$ganancia_neta"},
+                        "costos_totales": {"$sum": "$costos_totales"}
+                    }}
+                ],
+                # 2. Servicios REALES por tipo
+                "servicios": solo_servicios + [
+                    {"$group": {
+                        "_id": "$tipo_servicio",
+                        "cantidad": {"$sum": "$cantidad"},
+                        "ingresos": {"$sum": "$ingresos"},
+                        "veces_contratado": {"$sum": 1}
+                    }},
+                    {"$sort": {"cantidad": -1}}
+                ],
+                # 3. Días REALES con datos (una fila por fecha aunque sean varias sucursales)
+                "dias_concretos": solo_dias + [
+                    {"$group": {
+                        "_id": "$fecha",
+                        "dia_semana": {"$first": "$dia_semana"},
+                        "servicios_atendidos": {"$sum": "$servicios_atendidos"},
+                        "ingresos_totales": {"$sum": "$ingresos_totales"},
+                        "ganancia_neta": {"$sum": "$ganancia_neta"}
+                    }},
+                    {"$set": {"fecha": "$_id"}},
+                    {"$sort": {"fecha": 1}}
+                ]
+            }}
         ]
         
-        dias_con_datos = list(collections["dias_operacion"].aggregate(pipeline_dias_concretos))
+        if not sucursal and indice_prefijo.listo():
+            facetas = indice_prefijo.services(fecha_inicio_dt, fecha_fin_dt)
+        elif not sucursal and motor_columnar.listo():
+            facetas = motor_columnar.services(fecha_inicio_dt, fecha_fin_dt)
+        elif (dias := await dias_del_lote(fecha_inicio_dt, fecha_fin_dt, sucursal)) is not None:
+            # Dentro de /dashboard/batch: días del recorrido compartido y
+            # servicios del mismo pipeline que services-popular
+            facetas = {
+                "dias": [{
+                    "_id": None,
+                    "total_servicios": sumar_dias(dias, "servicios_atendidos", fecha_inicio_dt, fecha_fin_dt),
+                    "total_ingresos": sumar_dias(dias, "ingresos_totales", fecha_inicio_dt, fecha_fin_dt),
+                    "dias_operacion": len(dias),
+                    "promedio_diario": sumar_dias(dias, "servicios_atendidos", fecha_inicio_dt, fecha_fin_dt) / len(dias),
+                    "ganancia_neta": sumar_dias(dias, "ganancia_neta", fecha_inicio_dt, fecha_fin_dt),
+                    "costos_totales": sumar_dias(dias, "costos_totales", fecha_inicio_dt, fecha_fin_dt)
+                }] if dias else [],
+                "servicios": await servicios_por_tipo(fecha_inicio_dt, fecha_fin_dt, sucursal),
+                "dias_concretos": dias_por_fecha(dias)
+            }
+        else:
+            facetas = (await repositorio.aggregate("dias_operacion", pipeline, "services"))[0]
+        resultado_dias = facetas["dias"]
+        resultado_servicios = facetas["servicios"]
+        dias_con_datos = facetas["dias_concretos"]
 
         # PROCESAR DATOS REALES - SIN INVENTAR NADA
         estadisticas_generales = {
@@ -720,4 +997,102 @@ async def get_services(
             "data": None, 
             "error": f"Error real: {str(e)}",
             "timestamp": datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+# Widgets disponibles en /dashboard/batch y cómo reciben la ventana compartida
+def _ventana(periodo, fecha_inicio, fecha_fin, sucursal):
+    return {"periodo": periodo, "fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "sucursal": sucursal}
+
+def _rango(periodo, fecha_inicio, fecha_fin, sucursal):
+    return {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "sucursal": sucursal}
+
+def _solo_sucursal(periodo, fecha_inicio, fecha_fin, sucursal):
+    return {"sucursal": sucursal}
+
+def _sin_parametros(periodo, fecha_inicio, fecha_fin, sucursal):
+    return {}
+
+def _ultimos_dias(dias):
+    # Paneles de transacciones: ventana fija de días, sin Query de FastAPI
+    return lambda periodo, fecha_inicio, fecha_fin, sucursal: {"dias": dias, "sucursal": sucursal}
+
+WIDGETS = {
+    "overview": (get_dashboard_overview, _solo_sucursal),
+    "revenue": (get_revenue, _ventana),
+    "revenue-weekly": (get_revenue_weekly, _rango),
+    "services": (get_services, _ventana),
+    "services-popular": (get_services_popular, _rango),
+    "alerts": (get_alerts, _solo_sucursal),
+    "clientes-distribucion": (get_clientes_distribucion, _ultimos_dias(30)),
+    "clientes-satisfaccion": (get_clientes_satisfaccion, _sin_parametros),
+    "evolucion-trimestral": (get_evolucion_trimestral, _solo_sucursal),
+    "demanda-horaria": (get_demanda_horaria, _ultimos_dias(28)),
+    "demanda-semanal": (get_demanda_semanal, _ultimos_dias(28)),
+    "finanzas-mensual": (get_finanzas_mensual, _solo_sucursal),
+    "gastos-distribucion": (get_gastos_distribucion, _solo_sucursal),
+    "inventario-stock": (get_inventario_stock, _sin_parametros),
+    "consumo-semanal": (get_consumo_semanal, _ultimos_dias(28)),
+}
+
+@router.post("/dashboard/batch")
+async def get_dashboard_batch(request: DashboardBatchRequest):
+    try:
+        fecha_inicio, fecha_fin = request.fecha_inicio, request.fecha_fin
+        if request.periodo:
+            periodo = request.periodo
+        elif fecha_inicio and fecha_fin:
+            # Rango propio sin periodo: no caer en la semana actual
+            periodo = "personalizado"
+        else:
+            periodo = "semana"
+        # Resolver una sola vez para que todos los paneles (también los que
+        # solo reciben fechas) usen la misma ventana
+        inicio_dt, fin_dt = resolver_periodo(periodo, fecha_inicio, fecha_fin)
+        fecha_inicio, fecha_fin = inicio_dt.strftime("%Y-%m-%d"), fin_dt.strftime("%Y-%m-%d")
+
+        nombres = list(dict.fromkeys(request.widgets))
+        desconocidos = [nombre for nombre in nombres if nombre not in WIDGETS]
+        nombres = [nombre for nombre in nombres if nombre in WIDGETS]
+
+        # Ejecutar todos los paneles a la vez; pipelines idénticos se comparten.
+        # demanda-horaria, demanda-semanal y consumo-semanal salen del mismo
+        # recorrido de transacciones porque comparten la hora de corte
+        token = _corte_lote.set(datetime.utcnow().replace(minute=0, second=0, microsecond=0))
+        # overview, revenue, revenue-weekly y services leen dias_operacion de
+        # una ventana que cubre las de todos
+        ventanas = ventanas_overview()
+        token_dias = _dias_lote.set(DiasLote(
+            min(ventanas["semana_anterior_inicio"], ventanas["inicio_mes"], inicio_dt),
+            max(ventanas["hoy"], fin_dt),
+            request.sucursal
+        ))
+        try:
+            with lote_compartido():
+                respuestas = await asyncio.gather(*[
+                    WIDGETS[nombre][0](**WIDGETS[nombre][1](periodo, fecha_inicio, fecha_fin, request.sucursal))
+                    for nombre in nombres
+                ], return_exceptions=True)
+        finally:
+            _dias_lote.reset(token_dias)
+            _corte_lote.reset(token)
+
+        paneles = {}
+        errores = {nombre: "Widget desconocido" for nombre in desconocidos}
+        for nombre, respuesta in zip(nombres, respuestas):
+            if isinstance(respuesta, Exception):
+                paneles[nombre] = None
+                errores[nombre] = str(respuesta)
+            elif not respuesta.get("success"):
+                paneles[nombre] = None
+                errores[nombre] = respuesta.get("error")
+            else:
+                paneles[nombre] = respuesta["data"]
+
+        return formato_respuesta({
+            "paneles": paneles,
+            "errores": errores,
+            "periodo": {"tipo": periodo, "fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin},
+            "sucursal": request.sucursal
+        })
+
+    except Exception as e:
+        return {"success": False, "data": None, "error": str(e)}
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from utils.difusion import difusor
+from utils.respuestas import RutaRapida
+from utils.version_datos import version_datos
+import asyncio
+import orjson
+import os
+
+router = APIRouter(prefix="/api", tags=["Tiempo real"], route_class=RutaRapida)
+
+# Comentario periódico para que proxies y balanceadores no corten la conexión
+INTERVALO_PING = float(os.getenv("TIEMPO_REAL_PING_SEGUNDOS", "15"))
+# Las conexiones se cierran a este plazo y EventSource reconecta solo: así un
+# redeploy no espera conexiones eternas y los clientes se reparten entre workers
+DURACION_MAXIMA = float(os.getenv("TIEMPO_REAL_DURACION_MAXIMA", "900"))
+
+# Helper function para formatear un evento SSE
+def evento_sse(versiones, fuente="versiones"):
+    identificador = f"{versiones['datos']}-{versiones['transacciones']}"
+    datos = orjson.dumps({"fuente": fuente, "versiones": versiones}).decode()
+    return f"id: {identificador}\nevent: {fuente}\ndata: {datos}\n\n"
+
+# Eventos del servidor: al conectar, `versiones` con el estado actual; después
+# `datos` tras cada carga confirmada y `transacciones` tras cada vaciado. El
+# cliente vuelve a pedir sus paneles con el ETag que tiene: los que no
+# cambiaron responden 304
+@router.get("/tiempo-real")
+async def get_tiempo_real(request: Request):
+    cola = difusor.suscribir()
+    if cola is None:
+        raise HTTPException(503, "Demasiadas conexiones en tiempo real; reintentar más tarde")
+
+    async def eventos():
+        loop = asyncio.get_running_loop()
+        fin = loop.time() + DURACION_MAXIMA
+        try:
+            yield "retry: 5000\n\n"
+            versiones = version_datos.actuales()
+            if versiones is not None:
+                yield evento_sse(versiones)
+
+            while loop.time() < fin:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=min(INTERVALO_PING, fin - loop.time()))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if evento is None:
+                    break
+                yield evento_sse(evento["versiones"], evento["fuente"])
+        finally:
+            difusor.desuscribir(cola)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
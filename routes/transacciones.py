@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException
+from models.schemas import TransaccionCreate
+from models.sucursales import SUCURSAL_POR_DEFECTO
+from utils.buffer_transacciones import buffer_transacciones
+from utils.respuestas import RutaRapida
+from typing import List
+
+router = APIRouter(prefix="/api", tags=["Transacciones"], route_class=RutaRapida)
+
+@router.post("/transacciones", status_code=202)
+async def post_transacciones(transacciones: List[TransaccionCreate]):
+    if not transacciones:
+        raise HTTPException(400, "No se enviaron transacciones")
+
+    documentos = []
+    for transaccion in transacciones:
+        documento = {
+            "timestamp": transaccion.timestamp,
+            "meta": {
+                "sucursal": transaccion.sucursal or SUCURSAL_POR_DEFECTO,
+                "tipo_servicio": transaccion.tipo_servicio
+            },
+            "precio": transaccion.precio
+        }
+        # cliente_id va fuera de meta: tiene demasiados valores para agrupar buckets
+        if transaccion.cliente_id:
+            documento["cliente_id"] = transaccion.cliente_id
+        documentos.append(documento)
+
+    try:
+        await buffer_transacciones.agregar(documentos)
+        return {"success": True, "data": {"aceptadas": len(documentos)}, "error": None}
+
+    except Exception as e:
+        raise HTTPException(503, f"Error registrando transacciones: {str(e)}")
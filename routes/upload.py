@@ -1,38 +1,61 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 import shutil
 import os
-from utils.exel_procesador import ExcelProcessor
+import uuid
+from typing import Optional
+from models.repositorio import repositorio
+from utils.respuestas import RutaRapida
+from utils.trabajos import MODOS_CARGA, cola_trabajos
 
-router = APIRouter(prefix="/upload", tags=["Upload"])
+router = APIRouter(prefix="/upload", tags=["Upload"], route_class=RutaRapida)
+
+def _guardar_archivo(origen, file_path):
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(origen, buffer)
+
+@router.post("/excel", status_code=202)
+async def upload_excel(
+    file: UploadFile = File(...),
+    modo: str = Query("upsert", description="Modo de carga: upsert, insertar"),
+    sucursal: Optional[str] = Query(None, description="Sucursal de las filas sin columna sucursal")
+):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(400, "Solo se permiten archivos Excel o CSV")
+    if modo not in MODOS_CARGA:
+        raise HTTPException(400, f"Modo inválido, use uno de: {', '.join(MODOS_CARGA)}")
 
-@router.post("/excel")
-async def upload_excel(file: UploadFile = File(...)):
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(400, "Solo se permiten archivos Excel")
-    
     # Crear directorio temporal si no existe
     os.makedirs("temp_uploads", exist_ok=True)
-    file_path = f"temp_uploads/{file.filename}"
-    
+    # Prefijo único: dos sucursales pueden subir archivos con el mismo nombre
+    file_path = f"temp_uploads/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+
     try:
         # Guardar archivo temporalmente
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Procesar archivo
-        processor = ExcelProcessor()
-        resultados = processor.procesar_excel(file_path)
-        
-        # Limpiar archivo temporal
-        os.remove(file_path)
-        
+        await repositorio.ejecutar(_guardar_archivo, file.file, file_path)
+
+        # Procesar en segundo plano; el cliente consulta el estado con el id
+        trabajo_id = await repositorio.ejecutar(cola_trabajos.encolar, file_path, file.filename, modo, sucursal)
+
         return {
-            "message": "Archivo procesado exitosamente",
-            "resultados": resultados
+            "message": "Archivo recibido, procesando en segundo plano",
+            "trabajo_id": trabajo_id,
+            "estado_url": f"/upload/trabajos/{trabajo_id}"
         }
-        
+
     except Exception as e:
         # Limpiar en caso de error
         if os.path.exists(file_path):
             os.remove(file_path)
-        raise HTTPException(500, f"Error procesando archivo: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Error procesando archivo: {str(e)}")
+
+@router.get("/trabajos")
+async def get_trabajos():
+    trabajos = await repositorio.ejecutar(cola_trabajos.listar)
+    return {"success": True, "data": trabajos, "error": None}
+
+@router.get("/trabajos/{trabajo_id}")
+async def get_trabajo(trabajo_id: str):
+    trabajo = await repositorio.ejecutar(cola_trabajos.obtener, trabajo_id)
+    if not trabajo:
+        raise HTTPException(404, "Trabajo no encontrado")
+    return {"success": True, "data": trabajo, "error": None}
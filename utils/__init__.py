@@ -1 +1,7 @@
-from .exel_procesador import ExcelProcessor
\ No newline at end of file
+# ExcelProcessor se importa a pedido: arrastra pandas y openpyxl, que solo
+# hacen falta al procesar una carga
+def __getattr__(nombre):
+    if nombre == "ExcelProcessor":
+        from .exel_procesador import ExcelProcessor
+        return ExcelProcessor
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
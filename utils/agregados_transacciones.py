@@ -0,0 +1,96 @@
+"""Agregados de la serie de transacciones, actualizados en cada vaciado.
+
+- `transacciones_hora`: un documento por sucursal, hora y tipo de servicio
+  con la cantidad atendida. Los paneles de demanda y consumo leen a lo más
+  24 documentos por día, sucursal y tipo en vez de cada evento.
+- `clientes_visitas`: primera y última visita de cada cliente por sucursal
+  y para la cadena (`sucursal: None`). La distribución nuevos/recurrentes
+  cuenta los clientes con visitas en la ventana sin agrupar el historial.
+
+Las horas tocadas por un vaciado se recalculan desde la serie con $merge y
+las visitas se actualizan con $min/$max: aplicar dos veces el mismo lote no
+cambia los agregados, así un vaciado que falló se puede reintentar.
+"""
+from datetime import timedelta
+from pymongo import UpdateOne
+from utils.version_datos import version_datos
+
+HORAS = "transacciones_hora"
+VISITAS = "clientes_visitas"
+
+def _pipeline_horas(match):
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "sucursal": "$meta.sucursal",
+                "hora": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+                "tipo": "$meta.tipo_servicio"
+            },
+            "servicios": {"$sum": 1}
+        }},
+        {"$set": {"sucursal": "$_id.sucursal", "hora": "$_id.hora", "tipo": "$_id.tipo"}},
+        {"$merge": {"into": HORAS, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+def actualizar_agregados(db, documentos):
+    """Incorpora a los agregados las transacciones ya escritas en la serie."""
+    if not documentos:
+        return
+    # Recalcular completas las horas tocadas, de todas sus transacciones
+    horas = [documento["timestamp"].replace(minute=0, second=0, microsecond=0) for documento in documentos]
+    sucursales = sorted({documento["meta"]["sucursal"] for documento in documentos})
+    list(db.transacciones.aggregate(_pipeline_horas({
+        "meta.sucursal": {"$in": sucursales},
+        "timestamp": {"$gte": min(horas), "$lt": max(horas) + timedelta(hours=1)}
+    })))
+
+    visitas = {}
+    for documento in documentos:
+        cliente_id = documento.get("cliente_id")
+        if not cliente_id:
+            continue
+        for sucursal in (documento["meta"]["sucursal"], None):
+            primera, ultima = visitas.get((cliente_id, sucursal), (documento["timestamp"], documento["timestamp"]))
+            visitas[(cliente_id, sucursal)] = (min(primera, documento["timestamp"]), max(ultima, documento["timestamp"]))
+    if visitas:
+        db[VISITAS].bulk_write([
+            UpdateOne(
+                {"_id": {"cliente_id": cliente_id, "sucursal": sucursal}},
+                {
+                    "$min": {"primera": primera},
+                    "$max": {"ultima": ultima},
+                    "$setOnInsert": {"cliente_id": cliente_id, "sucursal": sucursal}
+                },
+                upsert=True
+            )
+            for (cliente_id, sucursal), (primera, ultima) in visitas.items()
+        ], ordered=False)
+
+def reconstruir_agregados(db):
+    """Recalcula los agregados desde toda la serie de transacciones."""
+    db[HORAS].delete_many({})
+    list(db.transacciones.aggregate(_pipeline_horas({})))
+
+    db[VISITAS].delete_many({})
+    for clave in ("$meta.sucursal", None):
+        list(db.transacciones.aggregate([
+            {"$match": {"cliente_id": {"$exists": True}}},
+            {"$group": {
+                "_id": {"cliente_id": "$cliente_id", "sucursal": clave},
+                "primera": {"$min": "$timestamp"},
+                "ultima": {"$max": "$timestamp"}
+            }},
+            {"$set": {"cliente_id": "$_id.cliente_id", "sucursal": "$_id.sucursal"}},
+            {"$merge": {"into": VISITAS, "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ], allowDiskUse=True))
+
+def inicializar_agregados(db):
+    """Construye los agregados si hay transacciones anteriores a ellos."""
+    if db[HORAS].estimated_document_count() == 0 and db.transacciones.find_one({}, {"_id": 1}):
+        reconstruir_agregados(db)
+        # Corre después de abrir el puerto: lo respondido sin agregados no
+        # debe quedar validado por el ETag
+        version_datos.incrementar(db, "transacciones")
+        return True
+    return False
@@ -0,0 +1,200 @@
+"""Alertas por anomalías respecto de líneas base por sucursal y día de semana.
+
+Para cada sucursal y día de la semana se guarda en `lineas_base` una media y
+una varianza con decaimiento exponencial (EWMA) de servicios, ingresos,
+ticket promedio y proporción de costos. Cada día nuevo del rollup diario se
+compara con la línea base de su día de semana *antes* de sumarse a ella:
+si se aleja más de `umbral_z` desvíos, queda una alerta en `alertas`. Así
+el umbral se adapta al tamaño de cada sucursal y al patrón de la semana.
+
+Al confirmar una carga solo se procesan los días nuevos (O(1) por día y
+métrica). Si la carga corrige días anteriores al último procesado, la
+sucursal se recalcula completa, porque la EWMA depende del orden.
+"""
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from models.database import mongodb
+from utils.cache import cache_resultados
+from utils.eventos import al_confirmar_ingesta
+from utils.version_datos import version_datos
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+# Métrica: (título si baja, tipo si baja, título si sube, tipo si sube, formato del valor)
+METRICAS = {
+    "servicios": ("Baja actividad", "warning", "Alta actividad", "success", "{:.0f} servicios"),
+    "ingresos": ("Ingresos bajos", "warning", "Ingresos altos", "success", "${:,.0f}"),
+    "ticket": ("Ticket promedio bajo", "warning", "Ticket promedio alto", "success", "${:,.0f} por servicio"),
+    "ratio_costos": ("Costos bajos", "success", "Costos altos", "warning", "{:.0%} de los ingresos")
+}
+
+def valores_dia(dia):
+    """Métricas de un documento de rollup_diario (None si no aplica)."""
+    servicios = dia.get("servicios_atendidos", 0)
+    ingresos = dia.get("ingresos", 0)
+    return {
+        "servicios": servicios,
+        "ingresos": ingresos,
+        "ticket": ingresos / servicios if servicios else None,
+        "ratio_costos": dia.get("gastos", 0) / ingresos if ingresos else None
+    }
+
+class MotorAlertas:
+    def __init__(self, alfa: float = 0.2, umbral_z: float = 2.5, min_muestras: int = 4):
+        self.alfa = alfa
+        self.umbral_z = umbral_z
+        self.min_muestras = min_muestras
+        self._lock = threading.Lock()
+        self.dias_evaluados = 0
+        self.alertas_generadas = 0
+        self.reconstrucciones = 0
+
+    def _linea_vacia(self, sucursal):
+        return {
+            "_id": sucursal,
+            "sucursal": sucursal,
+            "ultima_fecha": None,
+            "dias": {str(dia): {} for dia in range(7)}
+        }
+
+    def _evaluar(self, linea, dia):
+        """Compara un día con su línea base, la actualiza y devuelve sus alertas."""
+        fecha = dia["periodo"]
+        base = linea["dias"][str(fecha.weekday())]
+        alertas = []
+        for metrica, valor in valores_dia(dia).items():
+            if valor is None:
+                continue
+            estado = base.get(metrica)
+            if estado is None:
+                base[metrica] = {"media": valor, "varianza": 0.0, "n": 1}
+                continue
+
+            if estado["n"] >= self.min_muestras:
+                # Piso del desvío: una serie casi constante no alerta por centavos
+                desvio = max(math.sqrt(estado["varianza"]), abs(estado["media"]) * 0.05, 1e-9)
+                z = (valor - estado["media"]) / desvio
+                if abs(z) >= self.umbral_z:
+                    alertas.append(self._alerta(linea["sucursal"], fecha, metrica, valor, estado["media"], z))
+
+            # EWMA de media y varianza (actualización incremental)
+            diferencia = valor - estado["media"]
+            incremento = self.alfa * diferencia
+            estado["media"] += incremento
+            estado["varianza"] = (1 - self.alfa) * (estado["varianza"] + diferencia * incremento)
+            estado["n"] += 1
+
+        linea["ultima_fecha"] = fecha
+        self.dias_evaluados += 1
+        return alertas
+
+    def _alerta(self, sucursal, fecha, metrica, valor, esperado, z):
+        titulo_bajo, tipo_bajo, titulo_alto, tipo_alto, formato = METRICAS[metrica]
+        titulo, tipo = (titulo_alto, tipo_alto) if z > 0 else (titulo_bajo, tipo_bajo)
+        return {
+            "_id": f"{metrica}_{sucursal}_{fecha.strftime('%Y%m%d')}",
+            "sucursal": sucursal,
+            "tipo": tipo,
+            "metrica": metrica,
+            "titulo": f"{titulo} el {DIAS_SEMANA[fecha.weekday()]}",
+            "descripcion": f"{formato.format(valor)}; lo habitual es {formato.format(esperado)}",
+            "valor": round(valor, 4),
+            "esperado": round(esperado, 4),
+            "z": round(z, 2),
+            "fecha": fecha
+        }
+
+    def _reconstruir_sucursal(self, db, sucursal):
+        linea = self._linea_vacia(sucursal)
+        alertas = []
+        for dia in db.rollup_diario.find({"sucursal": sucursal}).sort("periodo", 1):
+            alertas += self._evaluar(linea, dia)
+        db.alertas.delete_many({"sucursal": sucursal})
+        if alertas:
+            db.alertas.insert_many(alertas)
+        db.lineas_base.replace_one({"_id": sucursal}, linea, upsert=True)
+        self.alertas_generadas += len(alertas)
+        self.reconstrucciones += 1
+
+    def reconstruir(self, db):
+        """Recalcula las líneas base y las alertas de todas las sucursales."""
+        with self._lock:
+            db.lineas_base.delete_many({})
+            db.alertas.delete_many({})
+            for sucursal in db.rollup_diario.distinct("sucursal"):
+                self._reconstruir_sucursal(db, sucursal)
+
+    def actualizar(self, db, fecha_min: datetime, fecha_max: datetime, sucursales=None):
+        """Evalúa los días cargados en [fecha_min, fecha_max] de las sucursales cargadas.
+
+        Sin `sucursales` se evalúan todas las que tengan días en el rango.
+        """
+        inicio = fecha_min.replace(hour=0, minute=0, second=0, microsecond=0)
+        fin = fecha_max.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        filtro = {"periodo": {"$gte": inicio, "$lt": fin}}
+        if sucursales:
+            # Las demás sucursales no cambiaron: releerlas las haría recalcular
+            # completas, porque su último día procesado cae dentro del rango
+            filtro["sucursal"] = {"$in": list(sucursales)}
+        with self._lock:
+            por_sucursal = {}
+            for dia in db.rollup_diario.find(filtro).sort("periodo", 1):
+                por_sucursal.setdefault(dia["sucursal"], []).append(dia)
+
+            for sucursal, dias in por_sucursal.items():
+                linea = db.lineas_base.find_one({"_id": sucursal})
+                if linea is not None and linea["ultima_fecha"] is not None and dias[0]["periodo"] <= linea["ultima_fecha"]:
+                    # Corrige días ya sumados a la EWMA: recalcular en orden
+                    self._reconstruir_sucursal(db, sucursal)
+                    continue
+
+                linea = linea or self._linea_vacia(sucursal)
+                alertas = []
+                for dia in dias:
+                    alertas += self._evaluar(linea, dia)
+                if alertas:
+                    db.alertas.bulk_write([ReplaceOne({"_id": alerta["_id"]}, alerta, upsert=True) for alerta in alertas])
+                db.lineas_base.replace_one({"_id": sucursal}, linea, upsert=True)
+                self.alertas_generadas += len(alertas)
+
+    def inicializar(self, db):
+        """Construye las líneas base si hay rollups pero todavía no hay líneas base."""
+        if db.lineas_base.estimated_document_count() == 0 and db.rollup_diario.find_one({}, {"_id": 1}):
+            self.reconstruir(db)
+            # Corre después de abrir el puerto: lo ya respondido sin alertas
+            # no debe quedar en el cache ni validado por el ETag
+            cache_resultados.invalidar()
+            version_datos.incrementar(db)
+            return True
+        return False
+
+    def estadisticas(self):
+        return {
+            "alfa": self.alfa,
+            "umbral_z": self.umbral_z,
+            "min_muestras": self.min_muestras,
+            "dias_evaluados": self.dias_evaluados,
+            "alertas_generadas": self.alertas_generadas,
+            "reconstrucciones": self.reconstrucciones
+        }
+
+# Instancia global del motor de alertas
+motor_alertas = MotorAlertas(
+    alfa=float(os.getenv("ALERTAS_ALFA", "0.2")),
+    umbral_z=float(os.getenv("ALERTAS_UMBRAL_Z", "2.5")),
+    min_muestras=int(os.getenv("ALERTAS_MIN_MUESTRAS", "4"))
+)
+
+@al_confirmar_ingesta
+def _evaluar_ingesta(resultados):
+    if resultados.get("fecha_min"):
+        motor_alertas.actualizar(
+            mongodb.db, resultados["fecha_min"], resultados["fecha_max"], resultados.get("sucursales")
+        )
+    else:
+        motor_alertas.reconstruir(mongodb.db)
+    # Lo cacheado mientras se evaluaba no incluye las alertas nuevas
+    cache_resultados.invalidar()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from pymongo.errors import BulkWriteError
+from models.database import mongodb
+from models.repositorio import repositorio
+from utils.agregados_transacciones import actualizar_agregados
+from utils.version_datos import version_datos
+
+class BufferTransacciones:
+    """Escritura agrupada de transacciones en la serie de tiempo.
+
+    Las cajas envían ráfagas de pocas transacciones; cada petición solo las
+    deja en memoria y un vaciado periódico (o al llenarse un lote) las
+    escribe con un insert_many por lote. Si la base se atrasa, al superar
+    `max_pendientes` la petición espera el vaciado en vez de seguir
+    acumulando memoria.
+    """
+
+    def __init__(self, tamano_lote: int = 500, intervalo: float = 1.0, max_pendientes: int = 50000):
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self._pendientes = []
+        # Escritas en la serie pero todavía no en los agregados
+        self._sin_agregar = []
+        self._lock = asyncio.Lock()
+        self._ciclo_tarea = None
+        self._vaciado_tarea = None
+        self.recibidas = 0
+        self.escritas = 0
+        self.vaciados = 0
+        self.errores = 0
+
+    async def agregar(self, documentos: list):
+        if len(self._pendientes) >= self.max_pendientes:
+            await self.vaciar()
+        self._pendientes.extend(documentos)
+        self.recibidas += len(documentos)
+        if len(self._pendientes) >= self.tamano_lote and (self._vaciado_tarea is None or self._vaciado_tarea.done()):
+            self._vaciado_tarea = asyncio.ensure_future(self.vaciar())
+
+    async def vaciar(self):
+        async with self._lock:
+            lote, self._pendientes = self._pendientes, []
+            escritas = []
+            try:
+                for inicio in range(0, len(lote), self.tamano_lote):
+                    parte = lote[inicio:inicio + self.tamano_lote]
+                    try:
+                        await repositorio.ejecutar(mongodb.get_collections()["transacciones"].insert_many, parte, ordered=False)
+                    except BulkWriteError as e:
+                        # Con ordered=False el resto de la parte sí se escribió y la
+                        # serie de tiempo no rechaza un _id repetido: devolver solo
+                        # las que fallaron (y las partes siguientes)
+                        indices = {error["index"] for error in e.details.get("writeErrors", [])}
+                        self._pendientes[:0] = [parte[i] for i in sorted(indices)] + lote[inicio + len(parte):]
+                        escritas += [documento for i, documento in enumerate(parte) if i not in indices]
+                        self.errores += 1
+                        raise
+                    except Exception:
+                        # Devolver lo no escrito al frente para el próximo vaciado
+                        self._pendientes[:0] = lote[inicio:]
+                        self.errores += 1
+                        raise
+                    escritas += parte
+            finally:
+                self.escritas += len(escritas)
+                await self._agregar_escritas(escritas)
+                if escritas:
+                    self.vaciados += 1
+                    try:
+                        await repositorio.ejecutar(version_datos.incrementar, mongodb.db, "transacciones")
+                    except Exception as e:
+                        # Ya quedaron escritas: no reportar el lote como fallido
+                        print(f"❌ Error actualizando versión de transacciones: {e}")
+            return len(lote)
+
+    async def _agregar_escritas(self, escritas):
+        # Los agregados son idempotentes: lo que no se pudo agregar se reintenta
+        # con el próximo vaciado sin contar dos veces
+        documentos, self._sin_agregar = self._sin_agregar + escritas, []
+        try:
+            await repositorio.ejecutar(actualizar_agregados, mongodb.db, documentos)
+        except Exception as e:
+            self._sin_agregar = documentos
+            print(f"❌ Error actualizando agregados de transacciones: {e}")
+
+    async def _ciclo(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.vaciar()
+            except Exception as e:
+                print(f"❌ Error escribiendo transacciones: {e}")
+
+    def iniciar(self):
+        if self._ciclo_tarea is None:
+            self._ciclo_tarea = asyncio.create_task(self._ciclo())
+
+    async def detener(self):
+        if self._ciclo_tarea is not None:
+            self._ciclo_tarea.cancel()
+            self._ciclo_tarea = None
+        # No perder lo que quedó en memoria al apagar
+        await self.vaciar()
+
+    def estadisticas(self):
+        return {
+            "pendientes": len(self._pendientes),
+            "sin_agregar": len(self._sin_agregar),
+            "recibidas": self.recibidas,
+            "escritas": self.escritas,
+            "vaciados": self.vaciados,
+            "errores": self.errores,
+            "tamano_lote": self.tamano_lote,
+            "intervalo_segundos": self.intervalo
+        }
+
+# Instancia global del buffer
+buffer_transacciones = BufferTransacciones(
+    tamano_lote=int(os.getenv("TRANSACCIONES_LOTE", "500")),
+    intervalo=float(os.getenv("TRANSACCIONES_INTERVALO", "1.0")),
+    max_pendientes=int(os.getenv("TRANSACCIONES_MAX_PENDIENTES", "50000"))
+)
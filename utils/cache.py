@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from utils.eventos import al_confirmar_ingesta
+from utils.singleflight import coalescencia
+
+class CacheResultados:
+    """Cache LRU con TTL para respuestas de endpoints.
+
+    Los datos solo cambian al confirmar una carga, así que el cache se vacía
+    completo en cada ingesta; el TTL es solo un límite de seguridad.
+    """
+
+    def __init__(self, max_entradas: int = 256, ttl_segundos: float = 300):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        # Cada invalidación cambia la generación; un cálculo iniciado antes
+        # de una carga no debe guardarse después de ella
+        self.generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._entradas[clave]
+                self.fallos += 1
+                return False, None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return True, entrada[1]
+
+    def guardar(self, clave, valor, generacion: int):
+        with self._lock:
+            if generacion != self.generacion:
+                return
+            self._entradas[clave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.generacion += 1
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones
+            }
+
+# Instancia global del cache
+cache_resultados = CacheResultados(
+    max_entradas=int(os.getenv("CACHE_MAX_ENTRADAS", "256")),
+    ttl_segundos=float(os.getenv("CACHE_TTL_SEGUNDOS", "300"))
+)
+
+@al_confirmar_ingesta
+def _invalidar_cache(resultados):
+    cache_resultados.invalidar()
+
+def cacheado(nombre: str, clave=None):
+    """Cachea la respuesta de un endpoint por nombre + parámetros normalizados.
+
+    `clave` recibe los parámetros del endpoint y devuelve su forma normalizada
+    (por ejemplo, el periodo ya resuelto a fechas). La fecha del día siempre
+    forma parte de la clave porque varios endpoints dependen de "hoy".
+    En un fallo, las peticiones concurrentes con la misma clave comparten un
+    único cálculo (single-flight).
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        async def envoltura(**kwargs):
+            try:
+                parametros = clave(**kwargs) if clave else kwargs
+                clave_cache = (nombre, date.today().isoformat(), tuple(sorted(parametros.items())))
+            except Exception:
+                # Parámetros inválidos: que el endpoint reporte el error
+                return await funcion(**kwargs)
+
+            encontrado, valor = cache_resultados.obtener(clave_cache)
+            if encontrado:
+                return valor
+
+            # La generación va en la clave: tras una carga no se comparte un
+            # cálculo iniciado con los datos anteriores
+            generacion = cache_resultados.generacion
+            valor = await coalescencia.ejecutar((generacion, clave_cache), lambda: funcion(**kwargs))
+            # No cachear respuestas de error
+            if not (isinstance(valor, dict) and valor.get("success") is False):
+                cache_resultados.guardar(clave_cache, valor, generacion)
+            return valor
+        return envoltura
+    return decorador
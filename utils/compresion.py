@@ -0,0 +1,127 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ("application/json", "text/")
+
+class CompresionMiddleware:
+    """Comprime respuestas con brotli o gzip según Accept-Encoding.
+
+    Solo se comprimen respuestas de un único cuerpo (las de los endpoints
+    JSON) desde `minimo_bytes`; las respuestas en streaming, como los
+    eventos del servidor, pasan sin tocar para no retener mensajes.
+    """
+
+    def __init__(self, app, minimo_bytes: int = 1024, nivel_gzip: int = 6, calidad_brotli: int = 4):
+        self.app = app
+        self.minimo_bytes = minimo_bytes
+        self.nivel_gzip = nivel_gzip
+        self.calidad_brotli = calidad_brotli
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = self._negociar(scope)
+        inicio = None
+
+        async def enviar(mensaje):
+            nonlocal inicio
+            if mensaje["type"] == "http.response.start":
+                if codificacion is None:
+                    # Sin compresión para este cliente, pero la misma URL sí se
+                    # comprime para otros: las caches deben distinguirlas
+                    await send(self._con_vary(mensaje))
+                    return
+                # Esperar el cuerpo para decidir si se comprime
+                inicio = mensaje
+                return
+            if inicio is None or mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            respuesta, inicio = inicio, None
+            cuerpo = mensaje.get("body", b"")
+            if mensaje.get("more_body", False) or not self._comprimible(respuesta, cuerpo):
+                await send(self._con_vary(respuesta))
+                await send(mensaje)
+                return
+
+            cuerpo = self._comprimir(cuerpo, codificacion)
+            encabezados = [
+                (nombre, valor) for nombre, valor in self._con_vary(respuesta)["headers"]
+                if nombre.lower() != b"content-length"
+            ]
+            encabezados += [
+                (b"content-encoding", codificacion.encode()),
+                (b"content-length", str(len(cuerpo)).encode())
+            ]
+            await send({**respuesta, "headers": encabezados})
+            await send({"type": "http.response.body", "body": cuerpo})
+
+        await self.app(scope, receive, enviar)
+
+    def _negociar(self, scope):
+        for nombre, valor in scope["headers"]:
+            if nombre == b"accept-encoding":
+                calidades = self._calidades(valor.decode("latin-1"))
+                ofrecidas = ("br", "gzip") if brotli is not None else ("gzip",)
+                # La de mayor q que el cliente no rechace (q=0); a igual q, brotli
+                calidad, codificacion = max(
+                    (calidades.get(oferta, calidades.get("*", 0)), -orden, oferta)
+                    for orden, oferta in enumerate(ofrecidas)
+                )[0::2]
+                return codificacion if calidad > 0 else None
+        return None
+
+    def _calidades(self, valor):
+        # "gzip;q=0.8, br, *;q=0" -> {"gzip": 0.8, "br": 1.0, "*": 0.0}
+        calidades = {}
+        for parte in valor.split(","):
+            nombre, *parametros = [trozo.strip() for trozo in parte.split(";")]
+            if not nombre:
+                continue
+            calidad = 1.0
+            for parametro in parametros:
+                clave, _, numero = parametro.partition("=")
+                if clave.strip().lower() == "q":
+                    try:
+                        calidad = float(numero)
+                    except ValueError:
+                        calidad = 0.0
+            calidades[nombre.lower()] = calidad
+        return calidades
+
+    def _con_vary(self, respuesta):
+        # Vary: Accept-Encoding en toda respuesta de un tipo que se comprime,
+        # conservando lo que ya traía (por ejemplo Origin de CORS)
+        encabezados = {nombre.lower(): valor for nombre, valor in respuesta["headers"]}
+        tipo = encabezados.get(b"content-type", b"").decode("latin-1")
+        if b"content-encoding" in encabezados or not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return respuesta
+        vary = [
+            campo.strip() for nombre, valor in respuesta["headers"] if nombre.lower() == b"vary"
+            for campo in valor.decode("latin-1").split(",") if campo.strip()
+        ]
+        if "*" in vary or "accept-encoding" in (campo.lower() for campo in vary):
+            return respuesta
+        otros = [(nombre, valor) for nombre, valor in respuesta["headers"] if nombre.lower() != b"vary"]
+        return {**respuesta, "headers": otros + [(b"vary", ", ".join(vary + ["Accept-Encoding"]).encode("latin-1"))]}
+
+    def _comprimible(self, respuesta, cuerpo):
+        if len(cuerpo) < self.minimo_bytes:
+            return False
+        encabezados = {nombre.lower(): valor for nombre, valor in respuesta["headers"]}
+        if b"content-encoding" in encabezados:
+            return False
+        tipo = encabezados.get(b"content-type", b"").decode("latin-1")
+        return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+    def _comprimir(self, cuerpo, codificacion):
+        if codificacion == "br":
+            return brotli.compress(cuerpo, quality=self.calidad_brotli)
+        return gzip.compress(cuerpo, compresslevel=self.nivel_gzip)
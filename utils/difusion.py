@@ -0,0 +1,76 @@
+"""Difusión de cambios de versión a los suscriptores en tiempo real.
+
+Cada conexión de /api/tiempo-real tiene su propia cola de asyncio. Cuando
+cambia una versión de datos (una carga confirmada, un vaciado de
+transacciones o un cambio visto en otro worker), el evento se entrega una
+sola vez al event loop con `call_soon_threadsafe` y desde ahí se copia a
+todas las colas: repartir cuesta un `put_nowait` por suscriptor, sin
+consultas. Las colas son cortas; a un cliente lento se le descarta el
+evento más antiguo, porque la versión más reciente ya lo reemplaza.
+"""
+import asyncio
+import os
+from utils.version_datos import version_datos
+
+class Difusor:
+    def __init__(self, max_suscriptores: int = 1000, tamano_cola: int = 8):
+        self.max_suscriptores = max_suscriptores
+        self.tamano_cola = tamano_cola
+        self._loop = None
+        self._colas = set()
+        self.publicados = 0
+        self.descartados = 0
+        self.rechazados = 0
+
+    def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+
+    def suscribir(self):
+        """Cola nueva para una conexión; None si se llegó al máximo."""
+        if len(self._colas) >= self.max_suscriptores:
+            self.rechazados += 1
+            return None
+        cola = asyncio.Queue(maxsize=self.tamano_cola)
+        self._colas.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        self._colas.discard(cola)
+
+    def publicar(self, evento):
+        """Encola `evento` para todos los suscriptores; se puede llamar desde cualquier hilo."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._colas:
+            return
+        loop.call_soon_threadsafe(self._repartir, evento)
+
+    def _repartir(self, evento):
+        for cola in list(self._colas):
+            if cola.full():
+                cola.get_nowait()
+                self.descartados += 1
+            cola.put_nowait(evento)
+        self.publicados += 1
+
+    def cerrar(self):
+        # None indica a cada conexión que termine
+        self._repartir(None)
+
+    def estadisticas(self):
+        return {
+            "suscriptores": len(self._colas),
+            "max_suscriptores": self.max_suscriptores,
+            "publicados": self.publicados,
+            "descartados": self.descartados,
+            "rechazados": self.rechazados
+        }
+
+# Instancia global del difusor
+difusor = Difusor(
+    max_suscriptores=int(os.getenv("TIEMPO_REAL_MAX_SUSCRIPTORES", "1000")),
+    tamano_cola=int(os.getenv("TIEMPO_REAL_TAMANO_COLA", "8"))
+)
+
+@version_datos.al_cambiar
+def _publicar_version(fuente, versiones):
+    difusor.publicar({"fuente": fuente, "versiones": versiones})
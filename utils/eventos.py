@@ -0,0 +1,19 @@
+"""Notificaciones internas cuando una carga confirma datos nuevos.
+
+Los suscriptores (cache, etc.) se registran con `al_confirmar_ingesta` y
+ExcelProcessor llama a `notificar_ingesta` al terminar de escribir. Los
+callbacks se ejecutan en el hilo que procesó la carga.
+"""
+
+_suscriptores = []
+
+def al_confirmar_ingesta(callback):
+    _suscriptores.append(callback)
+    return callback
+
+def notificar_ingesta(resultados: dict):
+    for callback in list(_suscriptores):
+        try:
+            callback(resultados)
+        except Exception as e:
+            print(f"Error notificando ingesta a {getattr(callback, '__name__', callback)}: {e}")
@@ -1,134 +1,481 @@
+import hashlib
+import os
+import time
+import numpy as np
+import openpyxl
 import pandas as pd
+from bson import ObjectId
 from datetime import datetime
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
 from models.database import mongodb
-from models.schemas import DiaOperacionCreate, ServicioCreate, CostoCreate
+from models.modelo_datos import es_embebido
+from models.sucursales import SUCURSAL_POR_DEFECTO
+from utils.eventos import notificar_ingesta
+from utils.metricas import duracion_ingesta, filas_ingestadas, filas_por_segundo
+from utils.rollups import actualizar_rollups
+from utils.trabajos import MODOS_CARGA
+from utils.version_datos import version_datos
+
+# Mapeo de tipos de servicio: (columna cantidad, columna ingresos, tipo, precio)
+SERVICIOS_MAP = [
+    ('servicios_normal', 'ingresos_normal', 'normal', 15000),
+    ('servicios_premium', 'ingresos_premium', 'premium', 25000),
+    ('servicios_full_premium', 'ingresos_full_premium', 'full_premium', 35000)
+]
+
+# Mapeo de costos: (columna, tipo, descripción)
+COSTOS_MAP = [
+    ('costo_materia_prima', 'materia_prima', 'Costo de materia prima del día'),
+    ('insumos_basicos', 'insumos_basicos', 'Insumos básicos del día'),
+    ('costo_sueldos', 'sueldos', 'Costos de personal'),
+    ('arriendo_pagado', 'arriendo', 'Arriendo del local')
+]
+
+# Límite de errores por fila que se guardan para reportar
+MAX_ERRORES = 1000
+# Códigos de MongoDB para una clave repetida en un índice único y para un
+# reemplazo que cambiaría el _id de un documento existente
+CLAVE_DUPLICADA = 11000
+ID_INMUTABLE = 66
 
 class ExcelProcessor:
-    def __init__(self):
+    def __init__(self, chunk_size: int = None, progreso=None):
         self.collections = mongodb.get_collections()
-    
-    def procesar_excel(self, file_path: str):
+        # Cantidad de documentos por cada insert_many
+        self.chunk_size = chunk_size or int(os.getenv("INGESTA_CHUNK_SIZE", "1000"))
+        # Callback opcional progreso(filas_procesadas, filas_totales)
+        self.progreso = progreso
+        self.sucursal = SUCURSAL_POR_DEFECTO
+        self.filas_totales = 0
+        self.filas_procesadas = 0
+        self.errores = []
+
+    def procesar_excel(self, file_path: str, modo: str = "upsert", nombre_archivo: str = None, sucursal: str = None):
         try:
-            # Leer el archivo Excel
-            df = pd.read_excel(file_path)
+            if modo not in MODOS_CARGA:
+                raise ValueError(f"Modo de carga inválido: {modo}")
+            # Sucursal de las filas sin columna `sucursal` propia
+            self.sucursal = sucursal or SUCURSAL_POR_DEFECTO
+
+            # Registro de archivos cargados. No evita el procesamiento: después de
+            # cargar A, B (corrige los mismos días) y otra vez A, la base tiene
+            # los valores de B. El hash_fila de cada día ya evita las escrituras
+            # de un archivo idéntico, con una lectura por bloque
+            hash_archivo = self._hash_archivo(file_path)
+            if sucursal:
+                hash_archivo = f"{hash_archivo}:{sucursal}"
+
+            inicio = time.perf_counter()
             resultados = {
                 "dias_insertados": 0,
                 "servicios_insertados": 0,
                 "costos_insertados": 0
             }
-            
-            for index, row in df.iterrows():
-                # Procesar cada fila
-                dia_result = self._procesar_dia(row)
-                if dia_result:
-                    resultados["dias_insertados"] += 1
-                    dia_id = dia_result
-                    
-                    # Procesar servicios
-                    servicios_ids = self._procesar_servicios(row, dia_id)
-                    resultados["servicios_insertados"] += len(servicios_ids)
-                    
-                    # Procesar costos
-                    costos_ids = self._procesar_costos(row, dia_id)
-                    resultados["costos_insertados"] += len(costos_ids)
-            
+            self._fecha_min = self._fecha_max = None
+            self._sucursales = set()
+
+            # Leer el archivo por bloques y escribir cada bloque de inmediato,
+            # así la memoria no depende del tamaño del archivo
+            try:
+                for bloque in self._leer_en_bloques(file_path):
+                    # Construir todos los documentos por columnas, sin iterar filas
+                    dias_df = self._preparar_dias(bloque)
+                    if modo == "upsert":
+                        parcial = self._upsert(dias_df)
+                    else:
+                        parcial = self._insertar(dias_df)
+                    for clave, valor in parcial.items():
+                        resultados[clave] = resultados.get(clave, 0) + valor
+            except Exception:
+                # Los bloques anteriores ya están en dias_operacion: sin esto un
+                # reintento los encuentra sin cambios y sus períodos no se
+                # reagregan nunca
+                try:
+                    self._propagar_escrituras(resultados)
+                except Exception as e:
+                    print(f"❌ Error actualizando rollups de una carga incompleta: {e}")
+                raise
+            self._propagar_escrituras(resultados)
+
+            duracion = time.perf_counter() - inicio
+            filas_ingestadas.inc(self.filas_procesadas, modo=modo)
+            duracion_ingesta.observar(duracion, modo=modo)
+            filas_por_segundo.fijar(round(self.filas_procesadas / duracion, 2) if duracion > 0 else 0, modo=modo)
+
+            self.collections["archivos_cargados"].replace_one(
+                {"_id": hash_archivo},
+                {
+                    "_id": hash_archivo,
+                    "nombre": nombre_archivo or os.path.basename(file_path),
+                    "fecha_carga": datetime.now(),
+                    "modo": modo,
+                    "sucursal": sucursal,
+                    "resultados": resultados
+                },
+                upsert=True
+            )
             return resultados
-            
+
         except Exception as e:
             raise Exception(f"Error procesando Excel: {str(e)}")
-    
-    def _procesar_dia(self, row):
-        try:
-            # Determinar estado y horario
-            if row['hora_apertura'] == 'Cerrado':
-                estado = 'cerrado'
-                horario = {"apertura": "Cerrado", "cierre": "Cerrado"}
+
+    def _propagar_escrituras(self, resultados):
+        """Reagrega los períodos escritos y avisa a los suscriptores (cache, etc.)."""
+        if self._fecha_min is None:
+            return
+        # Solo los períodos que contienen fechas escritas
+        actualizar_rollups(mongodb.db, self._fecha_min, self._fecha_max)
+        # Con el rango de fechas y las sucursales tocadas para las
+        # actualizaciones incrementales
+        notificar_ingesta({
+            **resultados,
+            "fecha_min": self._fecha_min,
+            "fecha_max": self._fecha_max,
+            "sucursales": sorted(self._sucursales)
+        })
+        # La versión sube después de que los suscriptores descartaron
+        # lo cacheado: un ETag nuevo nunca acompaña datos viejos
+        version_datos.incrementar(mongodb.db)
+
+    def _insertar(self, dias_df):
+        dias = self._documentos_dias(dias_df)
+        servicios = self._documentos_servicios(dias_df)
+        costos = self._documentos_costos(dias_df)
+
+        if es_embebido():
+            # Los hijos viajan dentro de cada día: una sola escritura
+            self._embeber_hijos(dias, servicios, costos)
+            self._registrar_fechas(dias_df)
+            omitidos = self._insertar_dias_nuevos(dias)
+            insertados = [dia for dia in dias if dia['_id'] not in omitidos]
+            return {
+                "dias_insertados": len(insertados),
+                "dias_omitidos": len(omitidos),
+                "servicios_insertados": sum(len(dia['servicios']) for dia in insertados),
+                "costos_insertados": sum(len(dia['costos']) for dia in insertados)
+            }
+
+        # Insertar en lotes (los días primero, los hijos referencian dia_id)
+        self._registrar_fechas(dias_df)
+        omitidos = {str(dia_id) for dia_id in self._insertar_dias_nuevos(dias)}
+        if omitidos:
+            # Los hijos de un día que ya existía no se agregan a los suyos
+            servicios = [servicio for servicio in servicios if servicio['dia_id'] not in omitidos]
+            costos = [costo for costo in costos if costo['dia_id'] not in omitidos]
+        resultados = {
+            "dias_insertados": len(dias) - len(omitidos),
+            "dias_omitidos": len(omitidos),
+            "servicios_insertados": self._insertar_en_lotes("servicios", servicios),
+            "costos_insertados": self._insertar_en_lotes("costos", costos)
+        }
+        return resultados
+
+    def _insertar_dias_nuevos(self, dias):
+        """Inserta los días; los que ya existen (índice único sucursal + fecha) se omiten.
+
+        Devuelve los _id de los días omitidos.
+        """
+        omitidos = set()
+        for inicio in range(0, len(dias), self.chunk_size):
+            lote = dias[inicio:inicio + self.chunk_size]
+            try:
+                self.collections["dias_operacion"].insert_many(lote, ordered=False)
+            except BulkWriteError as e:
+                errores = e.details.get("writeErrors", [])
+                if any(error["code"] != CLAVE_DUPLICADA for error in errores):
+                    raise
+                omitidos.update(lote[error["index"]]["_id"] for error in errores)
+            self._avanzar(len(lote))
+        return omitidos
+
+    def _upsert(self, dias_df, reintentar=True):
+        # Si la planilla repite una fecha de una sucursal, gana la última fila
+        filas = len(dias_df)
+        dias_df = dias_df.drop_duplicates(subset=['sucursal', 'fecha'], keep='last').reset_index(drop=True)
+        self._avanzar(filas - len(dias_df))
+
+        existentes = self._dias_existentes(dias_df)
+        claves = pd.Series(list(zip(dias_df['sucursal'], dias_df['fecha'])), index=dias_df.index, dtype=object)
+        hash_existente = claves.map(lambda clave: existentes.get(clave, {}).get('hash_fila'))
+        sin_cambios = dias_df['hash_fila'] == hash_existente
+        cambiados = dias_df[~sin_cambios].reset_index(drop=True)
+
+        resultados = {
+            "dias_insertados": 0,
+            "dias_actualizados": 0,
+            "dias_sin_cambios": int(sin_cambios.sum()),
+            "servicios_insertados": 0,
+            "costos_insertados": 0
+        }
+        self._avanzar(resultados["dias_sin_cambios"])
+        if cambiados.empty:
+            return resultados
+        # Antes de escribir: si el bloque falla a medias, sus fechas se reagregan igual
+        self._registrar_fechas(cambiados)
+
+        # Conservar el _id de los días que ya existen para mantener dia_id estable
+        claves = pd.Series(list(zip(cambiados['sucursal'], cambiados['fecha'])), index=cambiados.index, dtype=object)
+        ids_existentes = claves.map(lambda clave: existentes.get(clave, {}).get('_id'))
+        cambiados['_id'] = ids_existentes.where(ids_existentes.notna(), cambiados['_id'])
+        cambiados['dia_id'] = cambiados['_id'].astype(str)
+        embebido = es_embebido()
+
+        # Eliminar duplicados de cargas anteriores y los hijos a reemplazar
+        for sucursal, grupo in cambiados.groupby('sucursal', sort=False):
+            fechas = grupo['fecha'].tolist()
+            ids = grupo['_id'].tolist()
+            for inicio in range(0, len(fechas), self.chunk_size):
+                lote_fechas = fechas[inicio:inicio + self.chunk_size]
+                self.collections["dias_operacion"].delete_many({
+                    "sucursal": sucursal,
+                    "fecha": {"$in": lote_fechas},
+                    "_id": {"$nin": ids[inicio:inicio + self.chunk_size]}
+                })
+                if not embebido:
+                    self.collections["servicios"].delete_many({"sucursal": sucursal, "fecha": {"$in": lote_fechas}})
+                    self.collections["costos"].delete_many({"sucursal": sucursal, "fecha": {"$in": lote_fechas}})
+
+        dias = self._documentos_dias(cambiados)
+        servicios = self._documentos_servicios(cambiados)
+        costos = self._documentos_costos(cambiados)
+        if embebido:
+            # Reemplazar el día reemplaza también sus arreglos de hijos
+            resultados.update(self._embeber_hijos(dias, servicios, costos))
+            servicios, costos = [], []
+
+        conflictos = set()
+        for inicio in range(0, len(dias), self.chunk_size):
+            lote = dias[inicio:inicio + self.chunk_size]
+            try:
+                result = self.collections["dias_operacion"].bulk_write(
+                    [ReplaceOne({"sucursal": dia["sucursal"], "fecha": dia["fecha"]}, dia, upsert=True) for dia in lote],
+                    ordered=False
+                )
+                resultados["dias_insertados"] += result.upserted_count
+                resultados["dias_actualizados"] += result.matched_count
+            except BulkWriteError as e:
+                # Otra carga escribió el mismo día entre la lectura y el reemplazo:
+                # el índice único lo rechaza y el día se vuelve a procesar abajo
+                errores = e.details.get("writeErrors", [])
+                if not reintentar or any(error["code"] not in (CLAVE_DUPLICADA, ID_INMUTABLE) for error in errores):
+                    raise
+                conflictos.update(str(lote[error["index"]]["_id"]) for error in errores)
+                resultados["dias_insertados"] += e.details.get("nUpserted", 0)
+                resultados["dias_actualizados"] += e.details.get("nMatched", 0)
+            self._avanzar(len(lote))
+
+        if not embebido:
+            if conflictos:
+                servicios = [servicio for servicio in servicios if servicio['dia_id'] not in conflictos]
+                costos = [costo for costo in costos if costo['dia_id'] not in conflictos]
+            resultados["servicios_insertados"] = self._insertar_en_lotes("servicios", servicios)
+            resultados["costos_insertados"] = self._insertar_en_lotes("costos", costos)
+
+        if conflictos:
+            # Releer los días en conflicto toma el _id que guardó la otra carga
+            reintento = cambiados[cambiados['dia_id'].isin(conflictos)]
+            self.filas_procesadas -= len(reintento)
+            for clave, valor in self._upsert(reintento, reintentar=False).items():
+                resultados[clave] = resultados.get(clave, 0) + valor
+        return resultados
+
+    def _registrar_fechas(self, dias_df):
+        # Rango de fechas y sucursales a escribir, para actualizar los rollups al final
+        if dias_df.empty:
+            return
+        self._sucursales.update(dias_df['sucursal'].unique().tolist())
+        fecha_min = dias_df['fecha'].min().to_pydatetime()
+        fecha_max = dias_df['fecha'].max().to_pydatetime()
+        self._fecha_min = fecha_min if self._fecha_min is None else min(self._fecha_min, fecha_min)
+        self._fecha_max = fecha_max if self._fecha_max is None else max(self._fecha_max, fecha_max)
+
+    def _leer_en_bloques(self, file_path):
+        """Entrega el archivo en DataFrames de a lo más chunk_size filas."""
+        extension = os.path.splitext(file_path)[1].lower()
+
+        if extension == '.csv':
+            # El total de filas no se conoce sin leer el archivo completo
+            yield from pd.read_csv(file_path, chunksize=self.chunk_size)
+
+        elif extension == '.xlsx':
+            # openpyxl en modo solo lectura recorre las filas sin cargar la hoja
+            libro = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                hoja = libro.active
+                filas = hoja.iter_rows(values_only=True)
+                encabezado = next(filas, None)
+                if encabezado is None:
+                    return
+                self.filas_totales = max(0, (hoja.max_row or 1) - 1)
+                self._avanzar(0)
+
+                lote, inicio = [], 0
+                for fila in filas:
+                    lote.append(fila)
+                    if len(lote) == self.chunk_size:
+                        yield pd.DataFrame(lote, columns=encabezado, index=range(inicio, inicio + len(lote)))
+                        inicio += len(lote)
+                        lote = []
+                if lote:
+                    yield pd.DataFrame(lote, columns=encabezado, index=range(inicio, inicio + len(lote)))
+            finally:
+                libro.close()
+
+        else:
+            # .xls no tiene lector por filas; se lee completo y se escribe por bloques
+            df = pd.read_excel(file_path)
+            self.filas_totales = len(df)
+            self._avanzar(0)
+            for inicio in range(0, len(df), self.chunk_size):
+                yield df.iloc[inicio:inicio + self.chunk_size]
+
+    def _dias_existentes(self, dias_df):
+        """Días ya guardados, por (sucursal, fecha)."""
+        existentes = {}
+        for sucursal, grupo in dias_df.groupby('sucursal', sort=False):
+            fechas = grupo['fecha'].tolist()
+            for inicio in range(0, len(fechas), self.chunk_size):
+                cursor = self.collections["dias_operacion"].find(
+                    {"sucursal": sucursal, "fecha": {"$in": fechas[inicio:inicio + self.chunk_size]}},
+                    {"fecha": 1, "hash_fila": 1}
+                )
+                for dia in cursor:
+                    existentes.setdefault((sucursal, pd.Timestamp(dia["fecha"])), dia)
+        return existentes
+
+    def _hash_archivo(self, file_path):
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def _preparar_dias(self, df):
+        df = df.copy()
+        df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
+
+        columnas_numericas = ['servicios_atendidos', 'ingresos_servicios', 'ganancia_neta']
+        columnas_numericas += [col for col, _, _, _ in SERVICIOS_MAP]
+        columnas_numericas += [col for _, col, _, _ in SERVICIOS_MAP]
+        for col in columnas_numericas:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        # La columna sucursal es opcional: sin ella (o vacía) va la de la carga
+        if 'sucursal' in df:
+            df['sucursal'] = df['sucursal'].where(df['sucursal'].notna(), self.sucursal).astype(str)
+        else:
+            df['sucursal'] = self.sucursal
+
+        # Los costos son opcionales en la planilla
+        for col, _, _ in COSTOS_MAP:
+            if col in df:
+                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
             else:
-                estado = 'abierto'
-                horario = {"apertura": row['hora_apertura'], "cierre": row['hora_cierre']}
-            
-            # Calcular costos totales
-            costos_totales = (
-                row.get('costo_materia_prima', 0) + 
-                row.get('insumos_basicos', 0) + 
-                row.get('costo_sueldos', 0) + 
-                row.get('arriendo_pagado', 0)
-            )
-            
-            dia_data = DiaOperacionCreate(
-                fecha=row['fecha'],
-                dia_semana=row['dia_semana'],
-                horario=horario,
-                estado=estado,
-                servicios_atendidos=row['servicios_atendidos'],
-                ingresos_totales=row['ingresos_servicios'],
-                ganancia_neta=row['ganancia_neta'],
-                costos_totales=costos_totales
-            )
-            
-            # Insertar en MongoDB
-            result = self.collections["dias_operacion"].insert_one(dia_data.dict())
-            return str(result.inserted_id)
-            
-        except Exception as e:
-            print(f"Error procesando día: {e}")
-            return None
-    
-    def _procesar_servicios(self, row, dia_id):
-        servicios_ids = []
-        try:
-            # Mapeo de tipos de servicio
-            servicios_map = [
-                ('servicios_normal', 'ingresos_normal', 'normal', 15000),
-                ('servicios_premium', 'ingresos_premium', 'premium', 25000),
-                ('servicios_full_premium', 'ingresos_full_premium', 'full_premium', 35000)
-            ]
-            
-            for servicio_col, ingreso_col, tipo, precio in servicios_map:
-                cantidad = row[servicio_col]
-                if cantidad > 0:
-                    servicio_data = ServicioCreate(
-                        dia_id=dia_id,
-                        fecha=row['fecha'],
-                        tipo_servicio=tipo,
-                        cantidad=cantidad,
-                        ingresos=row[ingreso_col],
-                        precio_unitario=precio
-                    )
-                    
-                    result = self.collections["servicios"].insert_one(servicio_data.dict())
-                    servicios_ids.append(str(result.inserted_id))
-                    
-        except Exception as e:
-            print(f"Error procesando servicios: {e}")
-        
-        return servicios_ids
-    
-    def _procesar_costos(self, row, dia_id):
-        costos_ids = []
-        try:
-            costos_map = [
-                ('costo_materia_prima', 'materia_prima', 'Costo de materia prima del día'),
-                ('insumos_basicos', 'insumos_basicos', 'Insumos básicos del día'),
-                ('costo_sueldos', 'sueldos', 'Costos de personal'),
-                ('arriendo_pagado', 'arriendo', 'Arriendo del local')
-            ]
-            
-            for costo_col, tipo, descripcion in costos_map:
-                monto = row.get(costo_col, 0)
-                if monto > 0:
-                    costo_data = CostoCreate(
-                        dia_id=dia_id,
-                        fecha=row['fecha'],
-                        tipo_costo=tipo,
-                        monto=monto,
-                        descripcion=descripcion
-                    )
-                    
-                    result = self.collections["costos"].insert_one(costo_data.dict())
-                    costos_ids.append(str(result.inserted_id))
-                    
-        except Exception as e:
-            print(f"Error procesando costos: {e}")
-        
-        return costos_ids
\ No newline at end of file
+                df[col] = 0
+
+        # Descartar filas incompletas (antes fallaba la validación fila a fila)
+        requeridas = ['fecha', 'dia_semana', 'servicios_atendidos', 'ingresos_servicios', 'ganancia_neta']
+        faltantes = df[requeridas].isna()
+        descartadas = faltantes.any(axis=1)
+        for indice in df.index[descartadas]:
+            columnas = [col for col in requeridas if faltantes.at[indice, col]]
+            # +2: encabezado y numeración desde 1 en la planilla
+            self._registrar_error(int(indice) + 2, f"Datos incompletos o inválidos: {', '.join(columnas)}")
+        self._avanzar(int(descartadas.sum()))
+        df = df[~descartadas].reset_index(drop=True)
+
+        # Hash del contenido de cada fila para detectar cambios en recargas
+        columnas_hash = ['sucursal', 'fecha', 'dia_semana', 'hora_apertura', 'hora_cierre'] + columnas_numericas
+        columnas_hash += [col for col, _, _ in COSTOS_MAP]
+        hashes = pd.util.hash_pandas_object(df[columnas_hash].astype(str), index=False)
+        df['hash_fila'] = hashes.map('{:016x}'.format)
+
+        df['_id'] = [ObjectId() for _ in range(len(df))]
+        df['dia_id'] = df['_id'].astype(str)
+        return df
+
+    def _documentos_dias(self, df):
+        cerrado = df['hora_apertura'] == 'Cerrado'
+        apertura = df['hora_apertura'].astype(str)
+        cierre = df['hora_cierre'].astype(str).where(~cerrado, 'Cerrado')
+
+        dias = pd.DataFrame({
+            '_id': df['_id'],
+            'sucursal': df['sucursal'],
+            'fecha': df['fecha'],
+            'dia_semana': df['dia_semana'].astype(str),
+            'servicios_atendidos': df['servicios_atendidos'].astype(int),
+            'ingresos_totales': df['ingresos_servicios'].astype(float),
+            'ganancia_neta': df['ganancia_neta'].astype(float),
+            'costos_totales': df[[col for col, _, _ in COSTOS_MAP]].sum(axis=1).astype(float),
+            'horario': [{"apertura": a, "cierre": c} for a, c in zip(apertura, cierre)],
+            'estado': np.where(cerrado, 'cerrado', 'abierto'),
+            'hash_fila': df['hash_fila']
+        })
+        return dias.to_dict('records')
+
+    def _documentos_servicios(self, df):
+        partes = []
+        for servicio_col, ingreso_col, tipo, precio in SERVICIOS_MAP:
+            con_servicio = df[df[servicio_col] > 0]
+            partes.append(pd.DataFrame({
+                'sucursal': con_servicio['sucursal'],
+                'fecha': con_servicio['fecha'],
+                'tipo_servicio': tipo,
+                'cantidad': con_servicio[servicio_col].astype(int),
+                'ingresos': con_servicio[ingreso_col].fillna(0).astype(float),
+                'precio_unitario': float(precio),
+                'dia_id': con_servicio['dia_id']
+            }))
+        return pd.concat(partes, ignore_index=True).to_dict('records')
+
+    def _documentos_costos(self, df):
+        partes = []
+        for costo_col, tipo, descripcion in COSTOS_MAP:
+            con_costo = df[df[costo_col] > 0]
+            partes.append(pd.DataFrame({
+                'sucursal': con_costo['sucursal'],
+                'fecha': con_costo['fecha'],
+                'tipo_costo': tipo,
+                'monto': con_costo[costo_col].astype(float),
+                'descripcion': descripcion,
+                'dia_id': con_costo['dia_id']
+            }))
+        return pd.concat(partes, ignore_index=True).to_dict('records')
+
+    def _embeber_hijos(self, dias, servicios, costos):
+        """Agrega a cada día sus arreglos `servicios` y `costos` (modelo embebido)."""
+        por_dia = {str(dia['_id']): dia for dia in dias}
+        for dia in dias:
+            dia['servicios'] = []
+            dia['costos'] = []
+        for coleccion, documentos in (("servicios", servicios), ("costos", costos)):
+            for documento in documentos:
+                dia = por_dia[documento.pop('dia_id')]
+                documento.pop('fecha')
+                documento.pop('sucursal')
+                dia[coleccion].append(documento)
+        return {
+            "servicios_insertados": len(servicios),
+            "costos_insertados": len(costos)
+        }
+
+    def _insertar_en_lotes(self, coleccion, documentos, avance=False):
+        insertados = 0
+        for inicio in range(0, len(documentos), self.chunk_size):
+            lote = documentos[inicio:inicio + self.chunk_size]
+            result = self.collections[coleccion].insert_many(lote, ordered=False)
+            insertados += len(result.inserted_ids)
+            if avance:
+                self._avanzar(len(lote))
+        return insertados
+
+    def _avanzar(self, filas):
+        self.filas_procesadas += filas
+        if self.progreso:
+            self.progreso(self.filas_procesadas, self.filas_totales)
+
+    def _registrar_error(self, fila, mensaje):
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({"fila": fila, "error": mensaje})
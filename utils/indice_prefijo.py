@@ -0,0 +1,263 @@
+"""Índice de sumas prefijas sobre el rollup diario.
+
+Por cada métrica se guarda el acumulado por ordinal de día (`toordinal()`):
+la suma de un rango [a, b] es `acumulado[b + 1] - acumulado[a]`, dos
+lecturas sin importar el largo del rango, y un promedio es el cociente de
+dos sumas. Se construye desde rollup_diario al arrancar; tras cada ingesta
+solo se releen los días cargados y el acumulado se recalcula desde el
+primero de ellos; las cargas de otros workers lo descartan y se reconstruye
+en un hilo aparte. Cubre la cadena completa: los rollups de las sucursales
+de un mismo día se suman.
+"""
+import os
+import threading
+from datetime import datetime
+from models.database import mongodb
+from utils.cache import cache_resultados
+from utils.eventos import al_confirmar_ingesta
+from utils.version_datos import recargar_en_hilo, version_datos
+
+# Métrica del índice -> campo del rollup diario
+METRICAS = {
+    "dias": "dias",
+    "servicios": "servicios_atendidos",
+    "ingresos": "ingresos",
+    "costos": "gastos",
+    "ganancia": "utilidad"
+}
+# Campos por tipo de servicio; la métrica es "<tipo>.<campo>"
+CAMPOS_SERVICIO = ("cantidad", "ingresos", "registros")
+
+class Estado:
+    """Arreglos del índice; se reemplazan completos en cada actualización."""
+
+    def __init__(self, origen, diarios, dia_semana):
+        import numpy as np
+
+        self.origen = origen
+        self.diarios = diarios
+        self.dia_semana = dia_semana
+        self.acumulados = {
+            metrica: np.concatenate(([0.0], np.cumsum(valores)))
+            for metrica, valores in diarios.items()
+        }
+        self.tipos_servicio = sorted({metrica.split(".")[0] for metrica in diarios if "." in metrica})
+
+    @property
+    def dias(self):
+        return len(self.dia_semana)
+
+class IndicePrefijo:
+    def __init__(self, activo: bool = True):
+        self.activo = activo
+        self._estado = None
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.actualizaciones = 0
+
+    def listo(self):
+        return self.activo and self._estado is not None
+
+    def descartar(self):
+        """Deja de servir el índice hasta la próxima construcción."""
+        self._generacion += 1
+        self._estado = None
+
+    def construir(self, db):
+        """Arma el índice completo desde rollup_diario."""
+        with self._lock:
+            generacion = self._generacion
+            estado = self._con_dias(None, list(db.rollup_diario.find().sort("periodo", 1)))
+            if generacion != self._generacion:
+                # Se descartó durante la lectura: la construcción siguiente lo reemplaza
+                return
+            self._estado = estado
+            self.actualizaciones += 1
+
+    def actualizar(self, db, fecha_min: datetime, fecha_max: datetime):
+        """Relee solo los días [fecha_min, fecha_max] y recalcula desde ahí."""
+        inicio = fecha_min.replace(hour=0, minute=0, second=0, microsecond=0)
+        fin = fecha_max.replace(hour=0, minute=0, second=0, microsecond=0)
+        with self._lock:
+            if self._estado is not None:
+                documentos = list(db.rollup_diario.find({"periodo": {"$gte": inicio, "$lte": fin}}).sort("periodo", 1))
+                self._estado = self._con_dias(self._estado, documentos, inicio, fin)
+                self.actualizaciones += 1
+                return
+        # Descartado por una carga en otro worker: solo sirve uno completo
+        self.construir(db)
+
+    def _con_dias(self, estado, documentos, inicio=None, fin=None):
+        import numpy as np
+
+        if estado is not None and not estado.dias:
+            estado = None
+        ordinales = [documento["periodo"].toordinal() for documento in documentos]
+        limites = ordinales + [fecha.toordinal() for fecha in (inicio, fin) if fecha]
+        if estado is not None:
+            limites += [estado.origen, estado.origen + estado.dias - 1]
+        if not limites:
+            return Estado(0, {metrica: np.zeros(0) for metrica in METRICAS}, np.array([], dtype=object))
+        origen = min(limites)
+        largo = max(limites) - origen + 1
+
+        # Copiar el estado anterior desplazado al nuevo origen
+        desplazamiento = estado.origen - origen if estado is not None else 0
+        diarios = {}
+        dia_semana = np.full(largo, None, dtype=object)
+        if estado is not None:
+            for metrica, valores in estado.diarios.items():
+                diarios[metrica] = np.zeros(largo)
+                diarios[metrica][desplazamiento:desplazamiento + estado.dias] = valores
+            dia_semana[desplazamiento:desplazamiento + estado.dias] = estado.dia_semana
+
+        # Los días releídos reemplazan por completo a los anteriores
+        if inicio is not None:
+            desde, hasta = inicio.toordinal() - origen, fin.toordinal() - origen + 1
+            for valores in diarios.values():
+                valores[desde:hasta] = 0
+            dia_semana[desde:hasta] = None
+
+        # Varias sucursales el mismo día: se suman
+        for ordinal, documento in zip(ordinales, documentos):
+            posicion = ordinal - origen
+            for metrica, campo in METRICAS.items():
+                diarios.setdefault(metrica, np.zeros(largo))[posicion] += documento.get(campo, 0) or 0
+            for tipo, valores in (documento.get("servicios") or {}).items():
+                for campo in CAMPOS_SERVICIO:
+                    diarios.setdefault(f"{tipo}.{campo}", np.zeros(largo))[posicion] += valores.get(campo, 0) or 0
+            dia_semana[posicion] = documento.get("dia_semana")
+
+        for metrica in METRICAS:
+            diarios.setdefault(metrica, np.zeros(largo))
+        return Estado(origen, diarios, dia_semana)
+
+    def _posiciones(self, estado, fecha_inicio: datetime, fecha_fin: datetime):
+        desde = min(max(fecha_inicio.toordinal() - estado.origen, 0), estado.dias)
+        hasta = min(max(fecha_fin.toordinal() - estado.origen + 1, 0), estado.dias)
+        return desde, max(desde, hasta)
+
+    def suma(self, metrica: str, fecha_inicio: datetime, fecha_fin: datetime, estado=None):
+        estado = estado or self._estado
+        acumulado = estado.acumulados.get(metrica)
+        if acumulado is None:
+            return 0.0
+        desde, hasta = self._posiciones(estado, fecha_inicio, fecha_fin)
+        return float(acumulado[hasta] - acumulado[desde])
+
+    def promedio(self, metrica: str, fecha_inicio: datetime, fecha_fin: datetime):
+        """Promedio por día con datos dentro del rango."""
+        estado = self._estado
+        dias = self.suma("dias", fecha_inicio, fecha_fin, estado)
+        return self.suma(metrica, fecha_inicio, fecha_fin, estado) / dias if dias else 0
+
+    def _dias_con_datos(self, estado, fecha_inicio, fecha_fin):
+        desde, hasta = self._posiciones(estado, fecha_inicio, fecha_fin)
+        for posicion in estado.diarios["dias"][desde:hasta].nonzero()[0] + desde:
+            yield int(posicion), datetime.fromordinal(estado.origen + int(posicion))
+
+    # Consultas con la misma forma que los pipelines de los routers
+
+    def revenue(self, fecha_inicio: datetime, fecha_fin: datetime):
+        estado = self._estado
+        dias = int(self.suma("dias", fecha_inicio, fecha_fin, estado))
+        if not dias:
+            return []
+        return [{
+            "_id": None,
+            "ingresos_totales": self.suma("ingresos", fecha_inicio, fecha_fin, estado),
+            "servicios_atendidos": int(self.suma("servicios", fecha_inicio, fecha_fin, estado)),
+            "ganancia_neta": self.suma("ganancia", fecha_inicio, fecha_fin, estado),
+            "dias_operacion": dias
+        }]
+
+    def services(self, fecha_inicio: datetime, fecha_fin: datetime):
+        estado = self._estado
+        totales = []
+        dias = int(self.suma("dias", fecha_inicio, fecha_fin, estado))
+        if dias:
+            total_servicios = int(self.suma("servicios", fecha_inicio, fecha_fin, estado))
+            totales.append({
+                "_id": None,
+                "total_servicios": total_servicios,
+                "total_ingresos": self.suma("ingresos", fecha_inicio, fecha_fin, estado),
+                "dias_operacion": dias,
+                "promedio_diario": total_servicios / dias,
+                "ganancia_neta": self.suma("ganancia", fecha_inicio, fecha_fin, estado),
+                "costos_totales": self.suma("costos", fecha_inicio, fecha_fin, estado)
+            })
+
+        servicios = []
+        for tipo in estado.tipos_servicio:
+            registros = int(self.suma(f"{tipo}.registros", fecha_inicio, fecha_fin, estado))
+            if registros:
+                servicios.append({
+                    "_id": tipo,
+                    "cantidad": int(self.suma(f"{tipo}.cantidad", fecha_inicio, fecha_fin, estado)),
+                    "ingresos": self.suma(f"{tipo}.ingresos", fecha_inicio, fecha_fin, estado),
+                    "veces_contratado": registros
+                })
+        servicios.sort(key=lambda servicio: servicio["cantidad"], reverse=True)
+
+        dias_concretos = [
+            {
+                "fecha": fecha,
+                "dia_semana": estado.dia_semana[posicion],
+                "servicios_atendidos": int(estado.diarios["servicios"][posicion]),
+                "ingresos_totales": float(estado.diarios["ingresos"][posicion]),
+                "ganancia_neta": float(estado.diarios["ganancia"][posicion])
+            }
+            for posicion, fecha in self._dias_con_datos(estado, fecha_inicio, fecha_fin)
+        ]
+        return {"dias": totales, "servicios": servicios, "dias_concretos": dias_concretos}
+
+    def servicios_por_fecha(self, fecha_inicio: datetime, fecha_fin: datetime):
+        estado = self._estado
+        return [
+            {
+                "_id": fecha,
+                "total_servicios": int(estado.diarios["servicios"][posicion]),
+                "ingresos_totales": float(estado.diarios["ingresos"][posicion]),
+                "ganancia_neta": float(estado.diarios["ganancia"][posicion])
+            }
+            for posicion, fecha in self._dias_con_datos(estado, fecha_inicio, fecha_fin)
+        ]
+
+    def estadisticas(self):
+        estado = self._estado
+        data = {"activo": self.activo, "listo": self.listo(), "actualizaciones": self.actualizaciones}
+        if estado is not None and estado.dias:
+            data.update({
+                "desde": datetime.fromordinal(estado.origen).date().isoformat(),
+                "hasta": datetime.fromordinal(estado.origen + estado.dias - 1).date().isoformat(),
+                "dias": estado.dias,
+                "metricas": len(estado.acumulados),
+                "memoria_bytes": int(sum(valores.nbytes for valores in estado.acumulados.values()))
+            })
+        return data
+
+# Instancia global del índice
+indice_prefijo = IndicePrefijo(activo=os.getenv("INDICE_PREFIJO", "1").lower() in ("1", "true"))
+
+@al_confirmar_ingesta
+def _actualizar_indice(resultados):
+    if not indice_prefijo.activo:
+        return
+    if indice_prefijo.listo() and resultados.get("fecha_min"):
+        indice_prefijo.actualizar(mongodb.db, resultados["fecha_min"], resultados["fecha_max"])
+    else:
+        indice_prefijo.construir(mongodb.db)
+    # Igual que el motor columnar: descartar lo cacheado durante la actualización
+    cache_resultados.invalidar()
+
+@version_datos.al_cambio_externo
+def _reconstruir_indice_externo(versiones):
+    if not indice_prefijo.activo:
+        return
+    # Hasta reconstruirlo, listo() es False y las consultas van a MongoDB
+    indice_prefijo.descartar()
+
+    def reconstruir():
+        indice_prefijo.construir(mongodb.db)
+        cache_resultados.invalidar()
+    recargar_en_hilo("Índice de sumas prefijas", reconstruir)
@@ -0,0 +1,110 @@
+"""Métricas en formato de exposición de texto de Prometheus.
+
+Implementación mínima (contadores, medidores e histogramas con etiquetas)
+para no sumar dependencias; se publica en GET /metrics.
+"""
+import threading
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    pares = [f'{nombre}="{str(valor).replace(chr(34), chr(39))}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas=()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(etiquetas.get(nombre, "") for nombre in self.etiquetas)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            for clave, valor in self._valores.items():
+                lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+class Medidor(Metrica):
+    tipo = "gauge"
+
+    def fijar(self, valor: float, **etiquetas):
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, descripcion, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            conteos, suma, total = self._valores.get(clave, ([0] * len(self.buckets), 0.0, 0))
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    conteos[i] += 1
+            self._valores[clave] = (conteos, suma + valor, total + 1)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            for clave, (conteos, suma, total) in self._valores.items():
+                for limite, conteo in zip(self.buckets, conteos):
+                    etiquetas = _formatear_etiquetas(self.etiquetas, clave, f'le="{limite}"')
+                    lineas.append(f"{self.nombre}_bucket{etiquetas} {conteo}")
+                etiquetas = _formatear_etiquetas(self.etiquetas, clave, 'le="+Inf"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {total}")
+                lineas.append(f"{self.nombre}_sum{_formatear_etiquetas(self.etiquetas, clave)} {suma}")
+                lineas.append(f"{self.nombre}_count{_formatear_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+# Métricas de la API
+duracion_peticiones = Histograma(
+    "http_request_duration_seconds", "Latencia de peticiones HTTP por ruta",
+    ("metodo", "ruta", "estado")
+)
+duracion_agregaciones = Histograma(
+    "mongo_aggregation_duration_seconds", "Duración de cada pipeline de agregación",
+    ("coleccion", "pipeline")
+)
+documentos_devueltos = Contador(
+    "mongo_aggregation_documents_total", "Documentos devueltos por pipeline",
+    ("coleccion", "pipeline")
+)
+filas_ingestadas = Contador("ingesta_filas_total", "Filas procesadas por ExcelProcessor", ("modo",))
+duracion_ingesta = Histograma(
+    "ingesta_duration_seconds", "Duración de cada carga de archivo", ("modo",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600)
+)
+filas_por_segundo = Medidor("ingesta_filas_por_segundo", "Filas por segundo de la última carga", ("modo",))
+pool_conexiones = Medidor("mongo_pool_connections", "Conexiones del pool de MongoDB por estado", ("estado",))
+
+METRICAS = [
+    duracion_peticiones, duracion_agregaciones, documentos_devueltos,
+    filas_ingestadas, duracion_ingesta, filas_por_segundo, pool_conexiones
+]
+
+def exponer_metricas():
+    lineas = []
+    for metrica in METRICAS:
+        lineas.extend(metrica.exponer())
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,200 @@
+"""Motor analítico en memoria sobre una instantánea columnar de los datos.
+
+Un lavadero acumula pocos miles de días, así que `dias_operacion`,
+`servicios` y `costos` caben completos en DataFrames indexados por fecha.
+Con MOTOR_COLUMNAR=1 se cargan al arrancar y se recargan tras cada ingesta;
+los endpoints que lo soportan responden con group-bys vectorizados en vez de
+ir a MongoDB, que sigue siendo la fuente de verdad.
+
+Cada consulta devuelve los mismos documentos que el pipeline homónimo del
+router, para que el post-proceso del endpoint no cambie. La instantánea
+cubre la cadena completa; las consultas de una sucursal van a MongoDB.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from models.database import mongodb
+from models.modelo_datos import pipeline_para
+from utils.cache import cache_resultados
+from utils.eventos import al_confirmar_ingesta
+from utils.version_datos import recargar_en_hilo, version_datos
+
+COLUMNAS_DIAS = ["fecha", "dia_semana", "servicios_atendidos", "ingresos_totales", "ganancia_neta", "costos_totales"]
+COLUMNAS_SERVICIOS = ["fecha", "tipo_servicio", "cantidad", "ingresos"]
+COLUMNAS_COSTOS = ["fecha", "tipo_costo", "monto"]
+
+def _cargar_coleccion(db, coleccion, columnas):
+    import pandas as pd
+
+    proyeccion = {"$project": {"_id": 0, **{columna: 1 for columna in columnas}}}
+    coleccion_real, pipeline = pipeline_para(coleccion, [proyeccion])
+    df = pd.DataFrame(list(db[coleccion_real].aggregate(pipeline)), columns=columnas)
+    df["fecha"] = pd.to_datetime(df["fecha"])
+    # Índice de fecha ordenado: un rango es una búsqueda binaria, no un escaneo
+    return df.set_index("fecha").sort_index(kind="stable")
+
+class Instantanea:
+    def __init__(self, dias, servicios, costos):
+        self.dias = dias
+        self.servicios = servicios
+        self.costos = costos
+        self.cargada_en = datetime.now()
+
+class MotorColumnar:
+    def __init__(self, activo: bool = False):
+        self.activo = activo
+        self._instantanea = None
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.cargas = 0
+        self.duracion_ultima_carga = None
+
+    def listo(self):
+        return self.activo and self._instantanea is not None
+
+    def descartar(self):
+        """Deja de servir la instantánea hasta la próxima carga."""
+        self._generacion += 1
+        self._instantanea = None
+
+    def cargar(self, db):
+        """Lee las tres colecciones y reemplaza la instantánea de una vez."""
+        with self._lock:
+            generacion = self._generacion
+            inicio = time.perf_counter()
+            dias = _cargar_coleccion(db, "dias_operacion", COLUMNAS_DIAS)
+            dias = dias.astype({
+                "servicios_atendidos": "int64",
+                "ingresos_totales": "float64",
+                "ganancia_neta": "float64",
+                "costos_totales": "float64"
+            })
+            servicios = _cargar_coleccion(db, "servicios", COLUMNAS_SERVICIOS)
+            servicios = servicios.astype({"tipo_servicio": "category", "cantidad": "int64", "ingresos": "float64"})
+            costos = _cargar_coleccion(db, "costos", COLUMNAS_COSTOS)
+            costos = costos.astype({"tipo_costo": "category", "monto": "float64"})
+
+            if generacion != self._generacion:
+                # Se descartó durante la lectura: la carga siguiente la reemplaza
+                return
+            # Los lectores toman la referencia una vez: nunca ven una mezcla
+            self._instantanea = Instantanea(dias, servicios, costos)
+            self.cargas += 1
+            self.duracion_ultima_carga = time.perf_counter() - inicio
+
+    def revenue(self, fecha_inicio: datetime, fecha_fin: datetime):
+        dias = self._instantanea.dias.loc[fecha_inicio:fecha_fin]
+        if dias.empty:
+            return []
+        return [{
+            "_id": None,
+            "ingresos_totales": float(dias["ingresos_totales"].sum()),
+            "servicios_atendidos": int(dias["servicios_atendidos"].sum()),
+            "ganancia_neta": float(dias["ganancia_neta"].sum()),
+            "dias_operacion": len(dias)
+        }]
+
+    def services(self, fecha_inicio: datetime, fecha_fin: datetime):
+        instantanea = self._instantanea
+        dias = instantanea.dias.loc[fecha_inicio:fecha_fin]
+        servicios = instantanea.servicios.loc[fecha_inicio:fecha_fin]
+
+        totales = []
+        if not dias.empty:
+            totales.append({
+                "_id": None,
+                "total_servicios": int(dias["servicios_atendidos"].sum()),
+                "total_ingresos": float(dias["ingresos_totales"].sum()),
+                "dias_operacion": len(dias),
+                "promedio_diario": float(dias["servicios_atendidos"].mean()),
+                "ganancia_neta": float(dias["ganancia_neta"].sum()),
+                "costos_totales": float(dias["costos_totales"].sum())
+            })
+
+        por_tipo = (
+            servicios.groupby("tipo_servicio", observed=True)
+            .agg(cantidad=("cantidad", "sum"), ingresos=("ingresos", "sum"), veces_contratado=("cantidad", "size"))
+            .sort_values("cantidad", ascending=False, kind="stable")
+        )
+        # Una fila por fecha aunque sean varias sucursales
+        dias_concretos = dias.groupby(level="fecha").agg(
+            dia_semana=("dia_semana", "first"),
+            servicios_atendidos=("servicios_atendidos", "sum"),
+            ingresos_totales=("ingresos_totales", "sum"),
+            ganancia_neta=("ganancia_neta", "sum")
+        ).reset_index()
+
+        return {
+            "dias": totales,
+            "servicios": [{"_id": tipo, **valores} for tipo, valores in por_tipo.to_dict("index").items()],
+            "dias_concretos": dias_concretos.to_dict("records")
+        }
+
+    def finanzas_mensual(self):
+        dias = self._instantanea.dias
+        meses = dias.groupby(dias.index.to_period("M")).agg(
+            ingresos=("ingresos_totales", "sum"),
+            gastos=("costos_totales", "sum"),
+            utilidad=("ganancia_neta", "sum")
+        ).head(6)
+        return [
+            {"_id": {"año": mes.year, "mes": mes.month}, **valores}
+            for mes, valores in meses.to_dict("index").items()
+        ]
+
+    def evolucion_trimestral(self):
+        servicios = self._instantanea.servicios
+        por_mes = (
+            servicios.groupby([servicios["tipo_servicio"], servicios.index.month.rename("mes")], observed=True)
+            .agg(cantidad=("cantidad", "sum"), ingresos=("ingresos", "sum"))
+            .sort_index(level="mes", kind="stable")
+        )
+        return [
+            {"_id": {"servicio": servicio, "mes": int(mes)}, **valores}
+            for (servicio, mes), valores in por_mes.to_dict("index").items()
+        ]
+
+    def estadisticas(self):
+        instantanea = self._instantanea
+        data = {
+            "activo": self.activo,
+            "listo": self.listo(),
+            "cargas": self.cargas,
+            "duracion_ultima_carga": round(self.duracion_ultima_carga, 4) if self.duracion_ultima_carga else None
+        }
+        if instantanea is not None:
+            data.update({
+                "cargada_en": instantanea.cargada_en.isoformat(),
+                "filas": {
+                    "dias_operacion": len(instantanea.dias),
+                    "servicios": len(instantanea.servicios),
+                    "costos": len(instantanea.costos)
+                },
+                "memoria_bytes": int(sum(
+                    df.memory_usage(deep=True).sum()
+                    for df in (instantanea.dias, instantanea.servicios, instantanea.costos)
+                ))
+            })
+        return data
+
+# Instancia global del motor
+motor_columnar = MotorColumnar(activo=os.getenv("MOTOR_COLUMNAR", "0").lower() in ("1", "true"))
+
+@al_confirmar_ingesta
+def _recargar_motor(resultados):
+    if motor_columnar.activo:
+        motor_columnar.cargar(mongodb.db)
+        # Invalidar de nuevo: una respuesta calculada con la instantánea
+        # anterior mientras se recargaba no debe quedar en el cache
+        cache_resultados.invalidar()
+
+@version_datos.al_cambio_externo
+def _recargar_motor_externo(versiones):
+    if motor_columnar.activo:
+        motor_columnar.descartar()
+
+        def recargar():
+            motor_columnar.cargar(mongodb.db)
+            cache_resultados.invalidar()
+        recargar_en_hilo("Motor columnar", recargar)
@@ -0,0 +1,300 @@
+"""Pronóstico diario de servicios e ingresos por tipo de servicio.
+
+Cada serie (totales y cada tipo de servicio) se modela por mínimos cuadrados
+sobre los últimos `ventana_dias` días del rollup diario:
+
+    y = b0 + b1 * años + c_martes + ... + c_domingo
+
+es decir, una tendencia lineal más la estacionalidad del día de semana. Por
+sucursal y para la cadena (suma de las sucursales) se mantienen X'X, X'y y
+y'y: al confirmar una carga solo se restan las filas de los días releídos o
+que salen de la ventana y se suman las nuevas, y se resuelve un sistema de
+8x8. El endpoint solo multiplica la matriz de los días pedidos por los
+coeficientes ya ajustados.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from models.database import mongodb
+from utils.cache import cache_resultados
+from utils.eventos import al_confirmar_ingesta
+from utils.version_datos import version_datos
+
+# Intercepto, tendencia y un indicador por día de semana (el lunes es la base)
+PARAMETROS = 8
+# Mínimo de días en la ventana para ajustar un modelo
+MIN_DIAS = 21
+CADENA = None
+
+def _fila(ordinal, origen):
+    import numpy as np
+
+    fila = np.zeros(PARAMETROS)
+    fila[0] = 1.0
+    # Tendencia en años desde el origen: mantiene X'X bien condicionada
+    fila[1] = (ordinal - origen) / 365.0
+    dia = datetime.fromordinal(ordinal).weekday()
+    if dia:
+        fila[1 + dia] = 1.0
+    return fila
+
+class Ajuste:
+    """Coeficientes de un modelo ya resuelto; se reemplaza completo al reajustar."""
+
+    def __init__(self, coeficientes, desvio, dias_con_datos, dias, ultimo):
+        self.coeficientes = coeficientes
+        self.desvio = desvio
+        self.dias_con_datos = dias_con_datos
+        self.dias = dias
+        self.ultimo = ultimo
+
+class Modelo:
+    """Acumuladores de las ecuaciones normales de una sucursal (o la cadena)."""
+
+    def __init__(self, origen, series):
+        import numpy as np
+
+        self.origen = origen
+        # Nombres de las columnas de y: "servicios", "ingresos", "<tipo>.cantidad", ...
+        self.series = series
+        self.valores = {}
+        self.incluidos = set()
+        self.xtx = np.zeros((PARAMETROS, PARAMETROS))
+        self.xty = np.zeros((PARAMETROS, len(series)))
+        self.yty = np.zeros(len(series))
+        self.ajuste = None
+
+    def _sumar(self, ordinal, signo):
+        import numpy as np
+
+        fila = _fila(ordinal, self.origen)
+        valores = self.valores[ordinal]
+        self.xtx += signo * np.outer(fila, fila)
+        self.xty += signo * np.outer(fila, valores)
+        self.yty += signo * valores * valores
+        if signo > 0:
+            self.incluidos.add(ordinal)
+        else:
+            self.incluidos.discard(ordinal)
+
+    def aplicar(self, cambios, ventana_dias):
+        """Reemplaza los días de `cambios` y desplaza la ventana al último día."""
+        for ordinal, valores in cambios.items():
+            if ordinal in self.incluidos:
+                self._sumar(ordinal, -1)
+            self.valores[ordinal] = valores
+
+        # Los días que salen de la ventana se restan y se olvidan
+        limite = max(self.valores) - ventana_dias + 1
+        for ordinal in [ordinal for ordinal in self.valores if ordinal < limite]:
+            if ordinal in self.incluidos:
+                self._sumar(ordinal, -1)
+            del self.valores[ordinal]
+        for ordinal in cambios:
+            if ordinal >= limite and ordinal not in self.incluidos:
+                self._sumar(ordinal, 1)
+        self.ajuste = self._resolver()
+
+    def _resolver(self):
+        import numpy as np
+
+        dias = len(self.incluidos)
+        if dias < MIN_DIAS:
+            return None
+        # lstsq tolera días de semana sin datos (columna en cero)
+        coeficientes = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        residuo = (
+            self.yty
+            - 2 * np.sum(coeficientes * self.xty, axis=0)
+            + np.sum(coeficientes * (self.xtx @ coeficientes), axis=0)
+        )
+        desvio = np.sqrt(np.maximum(residuo, 0) / max(dias - PARAMETROS, 1))
+        # Días observados por día de semana: los que nunca abren se pronostican en 0
+        por_dia = np.diag(self.xtx)[2:]
+        dias_con_datos = np.concatenate(([dias - por_dia.sum()], por_dia)) > 0
+        return Ajuste(coeficientes, desvio, dias_con_datos, dias, max(self.incluidos))
+
+class Pronostico:
+    def __init__(self, ventana_dias: int = 365):
+        self.ventana_dias = ventana_dias
+        self._modelos = None
+        self._series = None
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.ajustes = 0
+
+    def listo(self):
+        return self._modelos is not None
+
+    def descartar(self):
+        """Deja de servir los modelos hasta el próximo ajuste completo."""
+        self._generacion += 1
+        self._modelos = None
+
+    def _vectores(self, documentos, series):
+        """Valores por sucursal y día (y su suma para la cadena)."""
+        import numpy as np
+
+        indices = {serie: posicion for posicion, serie in enumerate(series)}
+        vectores = {}
+        for documento in documentos:
+            valores = np.zeros(len(series))
+            valores[indices["servicios"]] = documento.get("servicios_atendidos", 0) or 0
+            valores[indices["ingresos"]] = documento.get("ingresos", 0) or 0
+            for tipo, datos in (documento.get("servicios") or {}).items():
+                valores[indices[f"{tipo}.cantidad"]] = datos.get("cantidad", 0) or 0
+                valores[indices[f"{tipo}.ingresos"]] = datos.get("ingresos", 0) or 0
+
+            ordinal = documento["periodo"].toordinal()
+            vectores.setdefault(documento["sucursal"], {})[ordinal] = valores
+            cadena = vectores.setdefault(CADENA, {})
+            cadena[ordinal] = cadena.get(ordinal, 0) + valores
+        return vectores
+
+    @staticmethod
+    def _tipos(documentos):
+        return sorted({tipo for documento in documentos for tipo in (documento.get("servicios") or {})})
+
+    def construir(self, db):
+        """Ajusta los modelos de todas las sucursales desde rollup_diario."""
+        with self._lock:
+            while True:
+                generacion = self._generacion
+                documentos = list(db.rollup_diario.find().sort("periodo", 1))
+                tipos = self._tipos(documentos)
+                series = ["servicios", "ingresos"] + [f"{tipo}.{campo}" for tipo in tipos for campo in ("cantidad", "ingresos")]
+                modelos = {}
+                if documentos:
+                    origen = documentos[0]["periodo"].toordinal()
+                    for clave, cambios in self._vectores(documentos, series).items():
+                        modelos[clave] = Modelo(origen, series)
+                        modelos[clave].aplicar(cambios, self.ventana_dias)
+                # Descartados durante el ajuste: el rollup leído puede ser anterior
+                if generacion == self._generacion:
+                    break
+            self._series, self._modelos = series, modelos
+            self.ajustes += 1
+
+    def actualizar(self, db, fecha_min: datetime, fecha_max: datetime):
+        """Reajusta solo con los días [fecha_min, fecha_max] releídos del rollup."""
+        inicio = fecha_min.replace(hour=0, minute=0, second=0, microsecond=0)
+        fin = fecha_max.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        documentos = list(db.rollup_diario.find({"periodo": {"$gte": inicio, "$lt": fin}}).sort("periodo", 1))
+        if not self.listo() or not self._modelos or not set(self._tipos(documentos)) <= {
+            serie.split(".")[0] for serie in self._series if "." in serie
+        }:
+            # Sin modelos previos o con un tipo de servicio nuevo: ajuste completo
+            self.construir(db)
+            return
+
+        with self._lock:
+            if not self._modelos:
+                # Descartados mientras se leía el rollup
+                return
+            origen = next(iter(self._modelos.values())).origen
+            for clave, cambios in self._vectores(documentos, self._series).items():
+                modelo = self._modelos.get(clave) or Modelo(origen, self._series)
+                modelo.aplicar(cambios, self.ventana_dias)
+                self._modelos[clave] = modelo
+            self.ajustes += 1
+
+    def pronosticar(self, dias: int, sucursal=None, hoy: datetime = None):
+        """Pronóstico de `dias` días desde el día siguiente al último cargado (o hoy)."""
+        import numpy as np
+
+        modelo = (self._modelos or {}).get(sucursal or CADENA)
+        ajuste = modelo.ajuste if modelo is not None else None
+        if ajuste is None:
+            return None
+
+        hoy = (hoy or datetime.now()).toordinal()
+        desde = max(ajuste.ultimo + 1, hoy)
+        ordinales = np.arange(desde, desde + dias)
+        dias_semana = np.array([datetime.fromordinal(int(ordinal)).weekday() for ordinal in ordinales])
+
+        # Matriz de diseño de todos los días pedidos de una vez
+        x = np.zeros((dias, PARAMETROS))
+        x[:, 0] = 1.0
+        x[:, 1] = (ordinales - modelo.origen) / 365.0
+        con_indicador = dias_semana > 0
+        x[np.flatnonzero(con_indicador), 1 + dias_semana[con_indicador]] = 1.0
+        abierto = ajuste.dias_con_datos[dias_semana]
+        predicciones = np.maximum(x @ ajuste.coeficientes, 0) * abierto[:, None]
+        margen = 1.96 * ajuste.desvio * abierto[:, None]
+
+        # Las series del modelo, no las actuales: un ajuste completo puede cambiarlas
+        indices = {serie: posicion for posicion, serie in enumerate(modelo.series)}
+        tipos = [serie.split(".")[0] for serie in modelo.series if serie.endswith(".cantidad")]
+        pronostico = []
+        for fila, (ordinal, prediccion) in enumerate(zip(ordinales, predicciones)):
+            servicios, ingresos = prediccion[indices["servicios"]], prediccion[indices["ingresos"]]
+            pronostico.append({
+                "fecha": datetime.fromordinal(int(ordinal)),
+                "dia_semana": int(dias_semana[fila]),
+                "servicios": round(float(servicios), 1),
+                "servicios_intervalo": [
+                    round(max(float(servicios - margen[fila, indices["servicios"]]), 0), 1),
+                    round(float(servicios + margen[fila, indices["servicios"]]), 1)
+                ],
+                "ingresos": round(float(ingresos), 2),
+                "ingresos_intervalo": [
+                    round(max(float(ingresos - margen[fila, indices["ingresos"]]), 0), 2),
+                    round(float(ingresos + margen[fila, indices["ingresos"]]), 2)
+                ],
+                "por_tipo": {
+                    tipo: {
+                        "cantidad": round(float(prediccion[indices[f"{tipo}.cantidad"]]), 1),
+                        "ingresos": round(float(prediccion[indices[f"{tipo}.ingresos"]]), 2)
+                    }
+                    for tipo in tipos
+                }
+            })
+
+        return {
+            "modelo": {
+                "dias_ajuste": ajuste.dias,
+                "ultimo_dia": datetime.fromordinal(ajuste.ultimo),
+                # Coeficiente de tendencia: cambio por año de un día típico
+                "tendencia_anual": {
+                    "servicios": round(float(ajuste.coeficientes[1, indices["servicios"]]), 2),
+                    "ingresos": round(float(ajuste.coeficientes[1, indices["ingresos"]]), 2)
+                }
+            },
+            "pronostico": pronostico
+        }
+
+    def estadisticas(self):
+        modelos = self._modelos or {}
+        return {
+            "listo": self.listo(),
+            "ventana_dias": self.ventana_dias,
+            "ajustes": self.ajustes,
+            "series": self._series,
+            "modelos": {
+                str(clave or "cadena"): {
+                    "dias_ajuste": modelo.ajuste.dias if modelo.ajuste else 0,
+                    "desvio_ingresos": round(float(modelo.ajuste.desvio[1]), 2) if modelo.ajuste else None
+                }
+                for clave, modelo in modelos.items()
+            }
+        }
+
+# Instancia global del pronóstico
+pronostico = Pronostico(ventana_dias=int(os.getenv("PRONOSTICO_VENTANA_DIAS", "365")))
+
+@al_confirmar_ingesta
+def _actualizar_pronostico(resultados):
+    if not pronostico.listo():
+        # Se ajusta completo con la primera consulta o al arrancar
+        return
+    if resultados.get("fecha_min"):
+        pronostico.actualizar(mongodb.db, resultados["fecha_min"], resultados["fecha_max"])
+    else:
+        pronostico.construir(mongodb.db)
+    # Igual que el índice de sumas prefijas: descartar lo cacheado durante el ajuste
+    cache_resultados.invalidar()
+
+@version_datos.al_cambio_externo
+def _descartar_pronostico(versiones):
+    # Otro worker cargó datos: la próxima consulta ajusta de nuevo (coalescida)
+    pronostico.descartar()
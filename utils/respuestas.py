@@ -0,0 +1,87 @@
+"""Serialización rápida de respuestas JSON.
+
+`RespuestaRapida` usa orjson, que serializa datetime, numpy y dicts grandes
+en C; ObjectId y modelos pydantic se resuelven en `_por_defecto`, sin el
+recorrido recursivo previo de `jsonable_encoder`. `RutaRapida` hace que los
+endpoints sin response_model devuelvan su dict directo como RespuestaRapida,
+y `RutaCondicional` le agrega ETag y respuestas 304 a los GET.
+"""
+from functools import wraps
+from bson import ObjectId
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+import asyncio
+import orjson
+from utils.version_datos import coincide_etag, version_datos
+
+def _por_defecto(valor):
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, BaseModel):
+        return valor.model_dump()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+class RespuestaRapida(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_por_defecto,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+class RutaRapida(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        sin_modelo = response_model is None or isinstance(response_model, DefaultPlaceholder)
+        # Con response_model, FastAPI debe validar la salida: no se toca
+        if sin_modelo and asyncio.iscoroutinefunction(endpoint):
+            endpoint = self._responder_directo(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _responder_directo(endpoint, status_code):
+        @wraps(endpoint)
+        async def envoltura(*args, **kwargs):
+            resultado = await endpoint(*args, **kwargs)
+            if isinstance(resultado, (dict, list)):
+                return RespuestaRapida(resultado, status_code=status_code)
+            return resultado
+        return envoltura
+
+class RutaCondicional(RutaRapida):
+    """GET con ETag según la versión de los datos que lee el endpoint.
+
+    Un `If-None-Match` vigente se contesta con 304 antes de ejecutar el
+    endpoint, sin pasar por el cache ni por MongoDB.
+    """
+
+    def get_route_handler(self):
+        manejador = super().get_route_handler()
+        fuentes = getattr(self.endpoint, "fuentes_datos", ("datos",))
+
+        async def manejador_condicional(request):
+            if request.method != "GET":
+                return await manejador(request)
+            # El ETag se calcula antes de leer: si llega una carga mientras
+            # tanto, el cliente ve una versión vieja y vuelve a pedir
+            etag = version_datos.etag(fuentes, request.url.path, request.url.query)
+            if etag is None:
+                return await manejador(request)
+            encabezados = {"ETag": etag, "Cache-Control": "no-cache"}
+            if coincide_etag(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=encabezados)
+
+            respuesta = await manejador(request)
+            if respuesta.status_code == 200 and not _es_error(respuesta):
+                respuesta.headers.update(encabezados)
+            return respuesta
+        return manejador_condicional
+
+def _es_error(respuesta):
+    # Los endpoints informan errores como {"success": false, ...} con 200;
+    # esas respuestas no deben quedar fijas en el cliente
+    return getattr(respuesta, "body", b"").startswith(b'{"success":false')
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from models.modelo_datos import pipeline_para
+
+# Granularidades de rollup: colección destino y unidad de $dateTrunc
+GRANULARIDADES = {
+    "diario": {"coleccion": "rollup_diario", "unidad": "day"},
+    "semanal": {"coleccion": "rollup_semanal", "unidad": "week"},
+    "mensual": {"coleccion": "rollup_mensual", "unidad": "month"}
+}
+
+def _truncar(unidad):
+    expresion = {"date": "$fecha", "unit": unidad}
+    if unidad == "week":
+        # Semana ISO: comienza el lunes
+        expresion["startOfWeek"] = "monday"
+    return {"$dateTrunc": expresion}
+
+def _rango_periodos(unidad, fecha_min, fecha_max):
+    """Inicio del primer período y comienzo del período siguiente al último."""
+    fecha_min = fecha_min.replace(hour=0, minute=0, second=0, microsecond=0)
+    fecha_max = fecha_max.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unidad == "day":
+        return fecha_min, fecha_max + timedelta(days=1)
+    if unidad == "week":
+        inicio = fecha_min - timedelta(days=fecha_min.weekday())
+        fin = fecha_max - timedelta(days=fecha_max.weekday()) + timedelta(days=7)
+        return inicio, fin
+    inicio = fecha_min.replace(day=1)
+    siguiente_mes = fecha_max.replace(day=28) + timedelta(days=4)
+    return inicio, siguiente_mes.replace(day=1)
+
+def _pipelines(granularidad, inicio, fin):
+    config = GRANULARIDADES[granularidad]
+    periodo = _truncar(config["unidad"])
+    match = {"$match": {"fecha": {"$gte": inicio, "$lt": fin}}}
+    # Un documento por sucursal y período; los campos sueltos se indexan
+    clave = {"sucursal": "$sucursal", "periodo": periodo}
+    campos_clave = {"$set": {"sucursal": "$_id.sucursal", "periodo": "$_id.periodo"}}
+    merge = {"$merge": {"into": config["coleccion"], "whenMatched": "merge", "whenNotMatched": "insert"}}
+
+    totales = {
+        "_id": clave,
+        "dias": {"$sum": 1},
+        "servicios_atendidos": {"$sum": "$servicios_atendidos"},
+        "ingresos": {"$sum": "$ingresos_totales"},
+        "gastos": {"$sum": "$costos_totales"},
+        "utilidad": {"$sum": "$ganancia_neta"}
+    }
+    if granularidad == "diario":
+        totales["dia_semana"] = {"$first": "$dia_semana"}
+
+    return {
+        "dias_operacion": [match, {"$group": totales}, campos_clave, merge],
+        "servicios": [
+            match,
+            {"$group": {
+                "_id": {**clave, "tipo": "$tipo_servicio"},
+                "cantidad": {"$sum": "$cantidad"},
+                "ingresos": {"$sum": "$ingresos"},
+                "registros": {"$sum": 1}
+            }},
+            {"$group": {
+                "_id": {"sucursal": "$_id.sucursal", "periodo": "$_id.periodo"},
+                "servicios": {"$push": {
+                    "k": "$_id.tipo",
+                    "v": {"cantidad": "$cantidad", "ingresos": "$ingresos", "registros": "$registros"}
+                }}
+            }},
+            {"$project": {"servicios": {"$arrayToObject": "$servicios"}}},
+            campos_clave,
+            merge
+        ],
+        "costos": [
+            match,
+            {"$group": {
+                "_id": {**clave, "tipo": "$tipo_costo"},
+                "monto": {"$sum": "$monto"}
+            }},
+            {"$group": {
+                "_id": {"sucursal": "$_id.sucursal", "periodo": "$_id.periodo"},
+                "costos": {"$push": {"k": "$_id.tipo", "v": "$monto"}}
+            }},
+            {"$project": {"costos": {"$arrayToObject": "$costos"}}},
+            campos_clave,
+            merge
+        ]
+    }
+
+def actualizar_rollups(db, fecha_min: datetime, fecha_max: datetime):
+    """Recalcula los rollups de los períodos que tocan [fecha_min, fecha_max].
+
+    Solo se reagregan los días, semanas y meses afectados por la carga, así el
+    costo depende del tamaño del archivo y no del historial completo.
+    """
+    for granularidad, config in GRANULARIDADES.items():
+        inicio, fin = _rango_periodos(config["unidad"], fecha_min, fecha_max)
+
+        # Borrar los períodos afectados para no dejar tipos que ya no existen
+        db[config["coleccion"]].delete_many({"periodo": {"$gte": inicio, "$lt": fin}})
+
+        for coleccion, pipeline in _pipelines(granularidad, inicio, fin).items():
+            coleccion, pipeline = pipeline_para(coleccion, pipeline)
+            # $merge no devuelve documentos; consumir el cursor ejecuta la etapa
+            list(db[coleccion].aggregate(pipeline))
+
+def reconstruir_rollups(db):
+    """Reconstruye todos los rollups a partir del historial completo."""
+    limites = list(db.dias_operacion.aggregate([
+        {"$group": {"_id": None, "minimo": {"$min": "$fecha"}, "maximo": {"$max": "$fecha"}}}
+    ]))
+    for config in GRANULARIDADES.values():
+        db[config["coleccion"]].delete_many({})
+    if limites:
+        actualizar_rollups(db, limites[0]["minimo"], limites[0]["maximo"])
+
+def inicializar_rollups(db):
+    """Construye los rollups si hay datos sin agregar o con el formato sin sucursal."""
+    sin_rollups = db.rollup_mensual.estimated_document_count() == 0
+    formato_anterior = db.rollup_mensual.find_one({"periodo": {"$exists": False}}, {"_id": 1})
+    if (sin_rollups or formato_anterior) and db.dias_operacion.find_one({}, {"_id": 1}):
+        reconstruir_rollups(db)
+        return True
+    return False
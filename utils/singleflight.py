@@ -0,0 +1,40 @@
+import asyncio
+
+class SingleFlight:
+    """Coalescencia de peticiones idénticas concurrentes.
+
+    La primera petición con una clave lanza el cálculo como tarea; las que
+    llegan mientras sigue en vuelo esperan esa misma tarea en vez de repetir
+    la consulta. La tarea se protege con `shield` para que cancelar a un
+    cliente no cancele el resultado de los demás.
+    """
+
+    def __init__(self):
+        self._en_vuelo = {}
+        self.ejecuciones = 0
+        self.compartidas = 0
+
+    async def ejecutar(self, clave, funcion):
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(funcion())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda _: self._liberar(clave, tarea))
+            self.ejecuciones += 1
+        else:
+            self.compartidas += 1
+        return await asyncio.shield(tarea)
+
+    def _liberar(self, clave, tarea):
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+
+    def estadisticas(self):
+        return {
+            "en_vuelo": len(self._en_vuelo),
+            "ejecuciones": self.ejecuciones,
+            "compartidas": self.compartidas
+        }
+
+# Instancia global para los endpoints del dashboard
+coalescencia = SingleFlight()
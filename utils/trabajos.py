@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pymongo import DESCENDING
+from models.database import mongodb
+
+# Modos de carga aceptados por ExcelProcessor.procesar_excel. Viven aquí y no
+# en utils.exel_procesador para validar la petición sin importar pandas
+MODOS_CARGA = ("upsert", "insertar")
+
+class ColaTrabajos:
+    """Cola de cargas de Excel procesadas en segundo plano.
+
+    Cada carga es un trabajo con id propio; un pool de hilos separado del de
+    la base de datos procesa varias a la vez sin bloquear la API. El estado
+    de cada trabajo se guarda en la colección `trabajos`: cualquier worker
+    responde por él y sobrevive a un reinicio. El worker que lo procesa
+    guarda además una copia local, que es la que actualiza el progreso.
+    """
+
+    def __init__(self, max_workers: int = 2, max_historial: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingesta")
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        # Un lock por sucursal: dos cargas de la misma sucursal no leen y
+        # reemplazan los mismos días a la vez (entre workers lo impide el
+        # índice único sucursal + fecha)
+        self._locks_sucursal = {}
+        self.max_historial = max_historial
+
+    def encolar(self, file_path: str, nombre_archivo: str, modo: str, sucursal: str = None):
+        trabajo_id = uuid.uuid4().hex
+        trabajo = {
+            "id": trabajo_id,
+            "archivo": nombre_archivo,
+            "modo": modo,
+            "sucursal": sucursal,
+            "estado": "pendiente",
+            "filas_totales": 0,
+            "filas_procesadas": 0,
+            "filas_por_segundo": 0,
+            "creado": datetime.now(),
+            "iniciado": None,
+            "finalizado": None,
+            "resultados": None,
+            "errores": [],
+            "error": None
+        }
+        mongodb.db.trabajos.insert_one({"_id": trabajo_id, **trabajo})
+        with self._lock:
+            self._trabajos[trabajo_id] = trabajo
+            self._limpiar_historial()
+        self._executor.submit(self._ejecutar, trabajo_id, file_path, nombre_archivo, modo, sucursal)
+        return trabajo_id
+
+    def obtener(self, trabajo_id: str):
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo:
+                return dict(trabajo)
+        # Encolado en otro worker o antes de un reinicio
+        trabajo = mongodb.db.trabajos.find_one({"_id": trabajo_id}, {"_id": 0})
+        return trabajo
+
+    def listar(self):
+        cursor = mongodb.db.trabajos.find({}, {"_id": 0, "errores": 0})
+        return list(cursor.sort("creado", DESCENDING).limit(self.max_historial))
+
+    def _actualizar(self, trabajo_id, **campos):
+        with self._lock:
+            self._trabajos[trabajo_id].update(campos)
+        try:
+            mongodb.db.trabajos.update_one({"_id": trabajo_id}, {"$set": campos})
+        except Exception as e:
+            # La carga sigue aunque no se pueda guardar su progreso
+            print(f"❌ Error guardando estado del trabajo {trabajo_id}: {e}")
+
+    def cerrar(self):
+        """Marca como interrumpidos los trabajos de este worker que no terminaron."""
+        with self._lock:
+            pendientes = [
+                trabajo_id for trabajo_id, trabajo in self._trabajos.items()
+                if trabajo["estado"] in ("pendiente", "procesando")
+            ]
+        for trabajo_id in pendientes:
+            self._actualizar(trabajo_id, estado="error", error="Interrumpido por un reinicio del servidor", finalizado=datetime.now())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _lock_sucursal(self, sucursal):
+        with self._lock:
+            return self._locks_sucursal.setdefault(sucursal, threading.Lock())
+
+    def _ejecutar(self, trabajo_id, file_path, nombre_archivo, modo, sucursal):
+        inicio = time.perf_counter()
+        self._actualizar(trabajo_id, estado="procesando", iniciado=datetime.now())
+
+        def progreso(filas_procesadas, filas_totales):
+            duracion = time.perf_counter() - inicio
+            self._actualizar(
+                trabajo_id,
+                filas_procesadas=filas_procesadas,
+                filas_totales=filas_totales,
+                filas_por_segundo=round(filas_procesadas / duracion, 2) if duracion > 0 else 0
+            )
+
+        processor = None
+        try:
+            # pandas y openpyxl se cargan con la primera carga, no al arrancar
+            from utils.exel_procesador import ExcelProcessor
+
+            processor = ExcelProcessor(progreso=progreso)
+            with self._lock_sucursal(sucursal):
+                resultados = processor.procesar_excel(file_path, modo, nombre_archivo, sucursal)
+            self._actualizar(trabajo_id, estado="completado", resultados=resultados)
+        except Exception as e:
+            self._actualizar(trabajo_id, estado="error", error=str(e))
+        finally:
+            # Si falló el import o el constructor no hay errores por fila
+            errores = processor.errores if processor is not None else []
+            self._actualizar(trabajo_id, finalizado=datetime.now(), errores=errores)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _limpiar_historial(self):
+        # Descartar de la copia local los trabajos terminados más antiguos
+        terminados = [
+            trabajo_id for trabajo_id, trabajo in self._trabajos.items()
+            if trabajo["estado"] in ("completado", "error")
+        ]
+        for trabajo_id in terminados[:max(0, len(self._trabajos) - self.max_historial)]:
+            del self._trabajos[trabajo_id]
+
+# Instancia global de la cola de cargas
+cola_trabajos = ColaTrabajos(max_workers=int(os.getenv("INGESTA_MAX_WORKERS", "2")))
@@ -0,0 +1,181 @@
+"""Versión de los datos para los GET condicionales.
+
+Cada fuente lleva un contador en el documento `versiones` de `metadatos`:
+"datos" cambia en cada carga confirmada (y en reconstrucciones de admin) y
+"transacciones" en cada vaciado del buffer. El ETag de una respuesta sale
+de las versiones de las fuentes que lee el endpoint, su ruta, sus
+parámetros y la fecha del día; se calcula en memoria, así un
+`If-None-Match` vigente se responde con 304 sin consultar MongoDB.
+
+Con varios workers, cada uno consulta el documento cada `intervalo`
+segundos para enterarse de las cargas hechas en los demás. Ante una carga
+ajena se avisa primero a los motores en memoria (`al_cambio_externo`), que
+dejan de responder hasta recargarse: la versión nueva nunca se sirve con
+un estado anterior.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from datetime import date
+from urllib.parse import parse_qsl
+from pymongo import ReturnDocument
+from models.database import mongodb
+from models.repositorio import repositorio
+from utils.cache import cache_resultados
+
+FUENTES = ("datos", "transacciones")
+ID_VERSIONES = "versiones"
+
+class VersionDatos:
+    def __init__(self, intervalo: float = 5.0):
+        self.intervalo = intervalo
+        self._versiones = None
+        self._lock = threading.Lock()
+        self._ciclo_tarea = None
+        self._oyentes = []
+        self._oyentes_externos = []
+        self.incrementos = 0
+        self.cambios_externos = 0
+
+    def listo(self):
+        return self._versiones is not None
+
+    @staticmethod
+    def _combinar(documento, anteriores):
+        # Los contadores solo suben: una lectura anterior a un incremento
+        # local no debe hacer retroceder la versión
+        return {
+            fuente: max(documento.get(fuente, 0), (anteriores or {}).get(fuente, 0))
+            for fuente in FUENTES
+        }
+
+    def cargar(self, db):
+        documento = db.metadatos.find_one({"_id": ID_VERSIONES}) or {}
+        anteriores = self._versiones
+        versiones = self._combinar(documento, anteriores)
+        if anteriores is not None and anteriores["datos"] != versiones["datos"]:
+            # Otro worker confirmó una carga: el estado en memoria de este deja
+            # de servirse antes de adoptar la versión nueva, y lo cacheado ya
+            # no corresponde
+            self._notificar_externo(versiones)
+            cache_resultados.invalidar()
+            self.cambios_externos += 1
+        with self._lock:
+            # Un incremento local pudo llegar mientras se avisaba
+            self._versiones = versiones = self._combinar(documento, self._versiones)
+        if anteriores is not None:
+            for fuente in FUENTES:
+                if anteriores[fuente] != versiones[fuente]:
+                    self._notificar(fuente, versiones)
+        return versiones
+
+    def incrementar(self, db, fuente: str = "datos"):
+        documento = db.metadatos.find_one_and_update(
+            {"_id": ID_VERSIONES},
+            {"$inc": {fuente: 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        with self._lock:
+            self._versiones = versiones = {f: documento.get(f, 0) for f in FUENTES}
+            self.incrementos += 1
+        self._notificar(fuente, versiones)
+        return versiones[fuente]
+
+    def al_cambiar(self, callback):
+        """Registra callback(fuente, versiones); se llama desde el hilo que cambió la versión."""
+        self._oyentes.append(callback)
+        return callback
+
+    def al_cambio_externo(self, callback):
+        """Registra callback(versiones) para las cargas confirmadas en otro worker.
+
+        Se llama antes de adoptar la versión nueva, desde el hilo del sondeo:
+        debe dejar de servir su estado en memoria y recargarlo fuera del hilo.
+        """
+        self._oyentes_externos.append(callback)
+        return callback
+
+    def _notificar_externo(self, versiones):
+        for callback in list(self._oyentes_externos):
+            try:
+                callback(dict(versiones))
+            except Exception as e:
+                print(f"Error notificando cambio externo a {getattr(callback, '__name__', callback)}: {e}")
+
+    def _notificar(self, fuente, versiones):
+        for callback in list(self._oyentes):
+            try:
+                callback(fuente, dict(versiones))
+            except Exception as e:
+                print(f"Error notificando versión a {getattr(callback, '__name__', callback)}: {e}")
+
+    def etag(self, fuentes, ruta: str, query: str):
+        """ETag débil de una respuesta; None si las versiones no están cargadas."""
+        versiones = self._versiones
+        if versiones is None:
+            return None
+        parametros = sorted(parse_qsl(query, keep_blank_values=True))
+        firma = "|".join([
+            ",".join(f"{fuente}={versiones[fuente]}" for fuente in fuentes),
+            ruta,
+            repr(parametros),
+            date.today().isoformat()
+        ])
+        return f'W/"{hashlib.sha1(firma.encode()).hexdigest()[:20]}"'
+
+    async def _ciclo(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await repositorio.ejecutar(self.cargar, mongodb.db)
+            except Exception as e:
+                print(f"❌ Error consultando versión de datos: {e}")
+
+    def iniciar(self):
+        if self._ciclo_tarea is None and self.intervalo > 0:
+            self._ciclo_tarea = asyncio.create_task(self._ciclo())
+
+    def detener(self):
+        if self._ciclo_tarea is not None:
+            self._ciclo_tarea.cancel()
+            self._ciclo_tarea = None
+
+    def actuales(self):
+        return dict(self._versiones) if self._versiones is not None else None
+
+    def estadisticas(self):
+        return {
+            "versiones": self._versiones,
+            "incrementos": self.incrementos,
+            "cambios_externos": self.cambios_externos,
+            "intervalo_segundos": self.intervalo
+        }
+
+# Instancia global de la versión
+version_datos = VersionDatos(intervalo=float(os.getenv("VERSION_DATOS_INTERVALO", "5")))
+
+def depende_de(*fuentes):
+    """Marca las fuentes que lee un endpoint (por defecto solo "datos")."""
+    def decorador(funcion):
+        funcion.fuentes_datos = fuentes
+        return funcion
+    return decorador
+
+def recargar_en_hilo(nombre: str, funcion):
+    """Corre `funcion` en un hilo propio, fuera del event loop y del sondeo."""
+    def ejecutar():
+        try:
+            funcion()
+            print(f"✅ {nombre} recargado tras una carga en otro worker")
+        except Exception as e:
+            print(f"❌ Error recargando {nombre}: {e}")
+    threading.Thread(target=ejecutar, name=f"recarga-{nombre}", daemon=True).start()
+
+def coincide_etag(if_none_match, etag: str):
+    if not if_none_match:
+        return False
+    # Comparación débil: W/"x" equivale a "x"
+    etiquetas = {parte.strip().removeprefix("W/") for parte in if_none_match.split(",")}
+    return "*" in etiquetas or etag.removeprefix("W/") in etiquetas